@@ -6,10 +6,8 @@ RAG 技术栈 - 实战练习参考答案
 2. 手写余弦相似度搜索
 3. 模拟 RAG 完整流程
 """
-========================
 import numpy as np
 from typing import List, Dict, Tuple
-import heapq
 import time
 
 # ============================================================================
@@ -96,13 +94,19 @@ class SimpleEmbedding:
 class VectorSearch:
     """简化的向量搜索引擎（完整答案）"""
 
+    # 批量检索时每次处理的查询数量（控制分数矩阵的内存：query_batch × 文档数 × 4 字节）
+    QUERY_BATCH_SIZE = 32
+
     def __init__(self, vectors: np.ndarray, metadata: List[str] = None):
-        """初始化搜索引擎"""
-        self.vectors = vectors
+        """初始化搜索引擎（向量统一存为 float32，内存和计算量减半）"""
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
         self.normalized_vectors = None
         self.metadata = metadata or [f"Doc_{i}" for i in range(len(vectors))]
         self.normalize_vectors()
 
+        # 预先计算 ‖x‖²，L2 距离展开为 ‖x‖² - 2x·q + ‖q‖²，用矩阵乘法批量计算
+        self.squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
     def normalize_vectors(self):
         """归一化向量（答案）"""
         # 计算 L2 范数
@@ -131,63 +135,182 @@ class VectorSearch:
         return dot_product / (query_norm * doc_norm)
 
     def cosine_similarity_optimized(self, query: np.ndarray) -> np.ndarray:
-        """优化的批量余弦相似度计算（答案）"""
+        """优化的批量余弦相似度计算（答案，query 可以是单个向量或 (q, dim) 矩阵）"""
+        queries = np.atleast_2d(np.asarray(query, dtype=np.float32))
+
         # 归一化查询向量
-        query_norm = query / np.linalg.norm(query)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
 
         # 矩阵乘法（归一化后，余弦相似度 = 点积）
-        scores = np.dot(self.normalized_vectors, query_norm)
+        scores = queries @ self.normalized_vectors.T
 
-        return scores
+        return scores[0] if np.ndim(query) == 1 else scores
 
     def l2_distance(self, query: np.ndarray, doc: np.ndarray) -> float:
         """计算 L2 距离（答案）"""
         return np.linalg.norm(query - doc)
 
-    def search(
+    def l2_distance_optimized(self, query: np.ndarray) -> np.ndarray:
+        """优化的批量 L2 距离计算（答案，query 可以是单个向量或 (q, dim) 矩阵）"""
+        queries = np.atleast_2d(np.asarray(query, dtype=np.float32))
+
+        # ‖x - q‖² = ‖x‖² - 2x·q + ‖q‖²（浮点误差可能产生极小的负数，截断为 0）
+        squared = self.squared_norms - 2 * (queries @ self.vectors.T)
+        squared += np.einsum("ij,ij->i", queries, queries)[:, None]
+        distances = np.sqrt(np.maximum(squared, 0))
+
+        return distances[0] if np.ndim(query) == 1 else distances
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int, largest: bool = True) -> np.ndarray:
+        """
+        每行取 Top-K 的下标（答案）
+
+        argpartition 在 O(n) 内找出前 k 个，只对这 k 个排序，
+        比对全部分数 argsort（O(n log n)）快得多。
+        """
+        k = min(k, scores.shape[1])
+        keys = -scores if largest else scores
+        if k < scores.shape[1]:
+            candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        order = np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def search_batch(
         self,
-        query: np.ndarray,
+        queries: np.ndarray,
         k: int = 3,
         metric: str = "cosine"
-    ) -> List[Tuple[int, float, str]]:
-        """Top-K 检索（答案）"""
+    ) -> List[List[Tuple[int, float, str]]]:
+        """批量 Top-K 检索（答案，每个查询返回一个结果列表）"""
         if metric == "cosine":
-            # 使用优化的余弦相似度
-            all_scores = self.cosine_similarity_optimized(query)
+            score_fn, largest = self.cosine_similarity_optimized, True
+        elif metric == "l2":
+            score_fn, largest = self.l2_distance_optimized, False
+        else:
+            raise ValueError(f"不支持的度量: {metric}")
 
-            # Top-K（降序）
-            top_k_indices = np.argsort(all_scores)[::-1][:k]
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        results = []
+
+        # 分批计算，避免一次生成 (查询数 × 文档数) 的超大分数矩阵
+        for start in range(0, len(queries), self.QUERY_BATCH_SIZE):
+            scores = score_fn(queries[start:start + self.QUERY_BATCH_SIZE])
+            indices = self.top_k(scores, k, largest=largest)
 
             # 构建结果
-            results = [
-                (idx, all_scores[idx], self.metadata[idx])
-                for idx in top_k_indices
-            ]
+            for row, row_indices in enumerate(indices):
+                results.append([
+                    (int(idx), float(scores[row, idx]), self.metadata[idx])
+                    for idx in row_indices
+                ])
 
-        elif metric == "l2":
-            # 计算所有 L2 距离
-            all_distances = [
-                self.l2_distance(query, doc)
-                for doc in self.vectors
-            ]
-
-            # Top-K（升序，距离越小越好）
-            top_k_indices = heapq.nsmallest(
-                k,
-                range(len(all_distances)),
-                key=lambda i: all_distances[i]
-            )
+        return results
 
-            # 构建结果
-            results = [
-                (idx, all_distances[idx], self.metadata[idx])
-                for idx in top_k_indices
-            ]
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 3,
+        metric: str = "cosine"
+    ) -> List[Tuple[int, float, str]]:
+        """Top-K 检索（答案）"""
+        return self.search_batch(np.asarray(query)[None, :], k=k, metric=metric)[0]
+
+
+class PQVectorSearch:
+    """
+    乘积量化（PQ）压缩索引（完整答案）
+
+    向量切成 m 段，每段用 k-means 训练 256 个中心，每个向量只存 m 个 uint8 编号：
+    384 维 float32 向量从 1536 字节压缩到 m 字节（m=48 压缩 32 倍，m=192 压缩 8 倍）。
+    查询时用非对称距离（ADC）：先算查询每段到 256 个中心的距离表，再查表求和。
+    """
+
+    def __init__(self, engine: VectorSearch, m: int = 48, iterations: int = 15, seed: int = 42):
+        """从已有的 VectorSearch 构建压缩索引（原始向量仅用于可选的精排）"""
+        dim = engine.vectors.shape[1]
+        if dim % m:
+            raise ValueError(f"子空间数量 {m} 不能整除向量维度 {dim}")
+
+        self.engine = engine
+        self.m = m
+        self.dsub = dim // m
+        self.codebooks, self.codes = self.train_and_encode(engine.vectors, iterations, seed)
+
+    def train_and_encode(self, vectors: np.ndarray, iterations: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+        """每个子空间训练 k-means 中心并编码（答案）"""
+        rng = np.random.default_rng(seed)
+        n = len(vectors)
+        sample = vectors[rng.choice(n, min(n, 256 * 64), replace=False)]
+
+        codebooks = np.zeros((self.m, 256, self.dsub), dtype=np.float32)
+        codes = np.zeros((n, self.m), dtype=np.uint8)
+
+        for sub in range(self.m):
+            columns = slice(sub * self.dsub, (sub + 1) * self.dsub)
+            points = np.ascontiguousarray(sample[:, columns])
+            centroids = points[rng.choice(len(points), 256, replace=len(points) < 256)].copy()
+
+            for _ in range(iterations):
+                labels = self.assign(points, centroids)
+                counts = np.bincount(labels, minlength=256)
+                for d in range(self.dsub):
+                    sums = np.bincount(labels, weights=points[:, d], minlength=256)
+                    centroids[counts > 0, d] = sums[counts > 0] / counts[counts > 0]
+
+            codebooks[sub] = centroids
+            codes[:, sub] = self.assign(np.ascontiguousarray(vectors[:, columns]), centroids)
+
+        return codebooks, codes
+
+    @staticmethod
+    def assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """最近中心编号（省略与中心无关的 ‖x‖²）"""
+        distances = np.einsum("ij,ij->i", centroids, centroids) - 2 * (points @ centroids.T)
+        return np.argmin(distances, axis=1)
+
+    def adc_distances(self, query: np.ndarray) -> np.ndarray:
+        """非对称距离：查询不量化，查表求和得到与所有编码向量的近似 L2 距离平方（答案）"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, 1, self.dsub)
+        table = ((self.codebooks - query) ** 2).sum(axis=2).ravel()   # (m × 256,)
+        offsets = np.arange(self.m) * 256
+        return table[self.codes + offsets].sum(axis=1)
+
+    def search(self, query: np.ndarray, k: int = 3, rerank: int = 0) -> List[Tuple[int, float, str]]:
+        """
+        L2 Top-K 检索（答案）
 
-        else:
-            raise ValueError(f"不支持的度量: {metric}")
+        rerank > 0 时先按近似距离取 rerank 个候选，再用原始向量计算精确距离重排。
+        """
+        distances = self.adc_distances(query)
+        n_candidates = min(max(k, rerank), len(distances))
+        candidates = VectorSearch.top_k(distances[None, :], n_candidates, largest=False)[0]
+
+        if rerank:
+            exact = np.linalg.norm(self.engine.vectors[candidates] - query.astype(np.float32), axis=1)
+            order = np.argsort(exact)[:k]
+            return [(int(candidates[i]), float(exact[i]), self.engine.metadata[candidates[i]]) for i in order]
+
+        return [
+            (int(idx), float(np.sqrt(distances[idx])), self.engine.metadata[idx])
+            for idx in candidates[:k]
+        ]
 
-        return results
+    def recall(self, queries: np.ndarray, k: int = 10, rerank: int = 0) -> float:
+        """以 VectorSearch.search 的精确结果为准计算 recall@k（答案）"""
+        exact = self.engine.search_batch(queries, k=k, metric="l2")
+        hits = 0
+        for query, truth in zip(queries, exact):
+            found = {idx for idx, _, _ in self.search(query, k=k, rerank=rerank)}
+            hits += len(found & {idx for idx, _, _ in truth})
+        return hits / (len(queries) * k)
+
+    def bytes_per_vector(self) -> int:
+        """每个向量在内存中占用的字节数"""
+        return self.codes.shape[1] * self.codes.itemsize
 
 
 # ============================================================================
@@ -468,6 +591,33 @@ def test_exercise_2():
     print(f"优化法 (100次): {t_opt:.4f}s")
     print(f"加速比: {t_brute / t_opt:.2f}x")
 
+    # 批量检索：多个查询一次矩阵乘法 + argpartition 取 Top-K
+    print("\n=== 批量检索 ===")
+    big_engine = VectorSearch(np.random.randn(100000, 384))
+    queries = np.random.randn(64, 384)
+
+    start = time.time()
+    batch_results = big_engine.search_batch(queries, k=10, metric="l2")
+    t_batch = time.time() - start
+
+    # 与逐条暴力计算的结果对比
+    for query, results in zip(queries[:3], batch_results[:3]):
+        distances = np.linalg.norm(big_engine.vectors - query.astype(np.float32), axis=1)
+        assert [idx for idx, _, _ in results] == list(np.argsort(distances)[:10])
+    print(f"100000 × 384 向量，64 个查询 (L2, k=10): {t_batch:.4f}s")
+
+    # 乘积量化：每个向量只存 m 个字节，召回率以 VectorSearch 的精确结果为准
+    print("\n=== 乘积量化（PQ）===")
+    centers = np.random.randn(200, 384)
+    pq_engine = VectorSearch(centers[np.random.randint(0, 200, 20000)] + 0.3 * np.random.randn(20000, 384))
+    pq_queries = (centers[np.random.randint(0, 200, 20)] + 0.3 * np.random.randn(20, 384)).astype(np.float32)
+    for m in (48, 192):
+        pq = PQVectorSearch(pq_engine, m=m)
+        ratio = pq_engine.vectors.shape[1] * 4 / pq.bytes_per_vector()
+        print(f"m={m}: {pq.bytes_per_vector()} 字节/向量（压缩 {ratio:.0f} 倍），"
+              f"recall@10 = {pq.recall(pq_queries, k=10):.2f}，"
+              f"精排 100 个候选后 = {pq.recall(pq_queries, k=10, rerank=100):.2f}")
+
     print("\n✅ 练习 2 测试通过！")
 
 
@@ -1,15 +1,46 @@
 """PDF 聊天机器人 - 基于 RAG 的文档问答系统"""
-
-from .config import Config
-from .document_loader import DocumentProcessor
-from .vector_store import VectorStoreManager
-from .qa_chain import QASystem
+from typing import TYPE_CHECKING
 
 __version__ = "0.1.0"
 
-__all__ = [
-    "Config",
-    "DocumentProcessor",
-    "VectorStoreManager",
-    "QASystem",
-]
+# 导出名称 -> 所在子模块
+# 子模块在第一次访问时才导入（LangChain、Chroma 等依赖较重），
+# import pdf_chatbot 和只用到 Config 的命令不需要加载它们
+_EXPORTS = {
+    "Config": "config",
+    "DocumentProcessor": "document_loader",
+    "VectorStoreManager": "vector_store",
+    "QASystem": "qa_chain",
+    "SearchFilter": "search_filter",
+    "ingest_pdfs": "ingest",
+    "ingest_pdf_stream": "ingest",
+    "ChatbotService": "server",
+    "create_server": "server",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .config import Config
+    from .document_loader import DocumentProcessor
+    from .vector_store import VectorStoreManager
+    from .qa_chain import QASystem
+    from .search_filter import SearchFilter
+    from .ingest import ingest_pdfs, ingest_pdf_stream
+    from .server import ChatbotService, create_server
+
+
+def __getattr__(name: str):
+    """按需导入导出的类和函数"""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,306 @@
+"""BM25 倒排索引模块（关键词检索，补足向量检索对编号、错误码的召回）"""
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+
+# 连续的中日韩字符
+_CJK_RUN_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+# 英文单词、数字以及零件号 / 错误码（如 E-1234、v2.1、ABC_12）
+_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+# 零件号内部的分隔符（同时索引拆开后的片段）
+_WORD_SPLIT_PATTERN = re.compile(r"[._\-/]")
+
+
+def _cjk_bigrams(run: str) -> List[str]:
+    """把连续中文切成二元组（单字时保留单字）"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str, tokenizer: str = "bigram") -> List[str]:
+    """
+    分词（中英文混合）
+
+    规则:
+        - 英文和数字转小写；零件号等带分隔符的词同时保留整体和拆开后的片段
+        - 中文按二元组切分（bigram），或使用 jieba 搜索引擎模式分词（jieba）
+
+    参数:
+        text: 文本
+        tokenizer: 中文分词方式（bigram / jieba）
+
+    返回:
+        词列表
+    """
+    text = text.lower()
+    tokens = []
+
+    for word in _WORD_PATTERN.findall(text):
+        tokens.append(word)
+        parts = _WORD_SPLIT_PATTERN.split(word)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+
+    if tokenizer == "jieba":
+        import jieba
+        for run in _CJK_RUN_PATTERN.findall(text):
+            tokens.extend(jieba.lcut_for_search(run))
+    else:
+        for run in _CJK_RUN_PATTERN.findall(text):
+            tokens.extend(_cjk_bigrams(run))
+
+    return tokens
+
+
+class BM25Index:
+    """
+    持久化的 BM25 倒排索引
+
+    功能:
+        - 以文档块 ID（compute_chunk_id）为键，支持增量添加和删除
+        - 保存到 JSON 文件（文档内容、元数据和词频），加载时重建倒排表
+        - 分词方式变化时自动按新方式重建
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: str, tokenizer: str = "bigram", k1: float = 1.5, b: float = 0.75):
+        """
+        初始化索引（文件存在时自动加载）
+
+        参数:
+            path: 索引文件路径
+            tokenizer: 中文分词方式（bigram / jieba）
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+        """
+        if tokenizer not in ("bigram", "jieba"):
+            raise ValueError(f"不支持的分词方式: {tokenizer}（可选: bigram / jieba）")
+        if tokenizer == "jieba":
+            try:
+                import jieba  # noqa: F401
+            except ImportError:
+                raise ImportError("使用 jieba 分词需要先安装: pip install jieba")
+
+        self.path = path
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._docs = {}        # 文档块 ID -> {"content", "metadata", "tf", "length"}
+        self._postings = {}    # 词 -> {文档块 ID: 词频}
+        self._total_length = 0
+        self._dirty = False
+
+        if os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._docs
+
+    def _index(self, chunk_id: str, entry: dict):
+        """把一个文档块加入倒排表"""
+        self._docs[chunk_id] = entry
+        self._total_length += entry["length"]
+        for term, count in entry["tf"].items():
+            self._postings.setdefault(term, {})[chunk_id] = count
+
+    def _load(self):
+        """从文件加载索引"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️  BM25 索引损坏，将重新创建: {str(e)}")
+            return
+
+        retokenize = data.get("tokenizer") != self.tokenizer
+        for chunk_id, entry in data.get("docs", {}).items():
+            if retokenize:
+                entry = self._make_entry(entry["content"], entry["metadata"])
+            self._index(chunk_id, entry)
+
+        if retokenize:
+            self._dirty = True
+
+    def _make_entry(self, content: str, metadata: dict) -> dict:
+        """分词并统计词频"""
+        tf = Counter(tokenize(content, self.tokenizer))
+        return {
+            "content": content,
+            "metadata": metadata,
+            "tf": dict(tf),
+            "length": sum(tf.values()),
+        }
+
+    def add(self, chunk_id: str, document: Document):
+        """
+        添加文档块（已存在的 ID 会被覆盖，内容和元数据相同时跳过）
+
+        参数:
+            chunk_id: 文档块 ID
+            document: 文档块
+        """
+        with self._lock:
+            existing = self._docs.get(chunk_id)
+            # 内容和元数据都没变时不修改索引（重复导入不触发保存）
+            if (
+                existing is not None
+                and existing["content"] == document.page_content
+                and existing["metadata"] == document.metadata
+            ):
+                return
+        entry = self._make_entry(document.page_content, dict(document.metadata))
+        with self._lock:
+            if chunk_id in self._docs:
+                self._remove(chunk_id)
+            self._index(chunk_id, entry)
+            self._dirty = True
+
+    def add_documents(self, chunk_ids: List[str], documents: List[Document]):
+        """批量添加文档块"""
+        for chunk_id, document in zip(chunk_ids, documents):
+            self.add(chunk_id, document)
+
+    def _remove(self, chunk_id: str):
+        entry = self._docs.pop(chunk_id)
+        self._total_length -= entry["length"]
+        for term in entry["tf"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def remove(self, chunk_ids: List[str]) -> int:
+        """
+        删除文档块
+
+        返回:
+            实际删除的数量
+        """
+        removed = 0
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if chunk_id in self._docs:
+                    self._remove(chunk_id)
+                    removed += 1
+            if removed:
+                self._dirty = True
+        return removed
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._docs = {}
+            self._postings = {}
+            self._total_length = 0
+            self._dirty = True
+
+    def save(self):
+        """保存到文件（先写临时文件再替换，避免写到一半时损坏）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "format": self.FORMAT_VERSION,
+                "tokenizer": self.tokenizer,
+                "docs": self._docs,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        where: Optional[Callable[[dict], bool]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        BM25 检索
+
+        参数:
+            query: 查询问题
+            k: 返回结果数量
+            where: 可选，按 metadata 过滤文档块的函数（不满足条件的文档块不参与打分）
+
+        返回:
+            (Document, score) 元组列表（分数越大越相关，没有命中任何词的文档不返回）
+        """
+        terms = set(tokenize(query, self.tokenizer))
+
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count or not terms:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores: Dict[str, float] = {}
+            allowed: Dict[str, bool] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, count in postings.items():
+                    if where is not None:
+                        if chunk_id not in allowed:
+                            allowed[chunk_id] = where(self._docs[chunk_id]["metadata"])
+                        if not allowed[chunk_id]:
+                            continue
+                    length = self._docs[chunk_id]["length"]
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [
+                (
+                    Document(
+                        page_content=self._docs[chunk_id]["content"],
+                        metadata=dict(self._docs[chunk_id]["metadata"])
+                    ),
+                    score
+                )
+                for chunk_id, score in top
+            ]
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[str]],
+    k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合（RRF）
+
+    每个结果的融合分数 = Σ 1 / (k + 排名)，排名从 1 开始。
+    只使用排名，不需要把向量距离和 BM25 分数换算到同一尺度。
+
+    参数:
+        ranked_lists: 多路检索结果（每路为按相关度排序的 ID 列表）
+        k: 平滑参数（通常取 60）
+
+    返回:
+        按融合分数从高到低排序的 (ID, 分数) 列表
+    """
+    scores: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, item_id in enumerate(ranked, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -14,6 +14,7 @@ class Config:
 
     # OpenAI 配置
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")  # 可选，自定义接口地址（代理或本地测试服务）
 
     # 通义千问配置
     DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
@@ -34,12 +35,137 @@ class Config:
     # OpenAI Embedding 配置
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 
+    # 分批向量化配置（OpenAI Embedding）
+    try:
+        EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    except ValueError:
+        print("⚠️  EMBEDDING_BATCH_SIZE 配置错误，使用默认值 64")
+        EMBEDDING_BATCH_SIZE = 64
+
+    try:
+        EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8000"))
+    except ValueError:
+        print("⚠️  EMBEDDING_BATCH_TOKENS 配置错误，使用默认值 8000")
+        EMBEDDING_BATCH_TOKENS = 8000
+
+    try:
+        EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    except ValueError:
+        print("⚠️  EMBEDDING_CONCURRENCY 配置错误，使用默认值 4")
+        EMBEDDING_CONCURRENCY = 4
+
+    try:
+        EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+    except ValueError:
+        print("⚠️  EMBEDDING_MAX_RETRIES 配置错误，使用默认值 5")
+        EMBEDDING_MAX_RETRIES = 5
+
     # 本地 Embedding 配置
     LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "BAAI/bge-small-zh-v1.5")
+    # 推理后端：torch（sentence-transformers）或 onnx（ONNX Runtime，需先导出模型）
+    LOCAL_EMBEDDING_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch").lower()
+    LOCAL_EMBEDDING_ONNX_DIR = os.getenv("LOCAL_EMBEDDING_ONNX_DIR", "./models/bge-small-zh-v1.5-onnx")
+    # ONNX 后端使用动态 int8 量化模型（首次使用时生成，需要 onnx 包）
+    LOCAL_EMBEDDING_QUANTIZE = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "false").lower() == "true"
+
+    try:
+        LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+    except ValueError:
+        print("⚠️  LOCAL_EMBEDDING_BATCH_SIZE 配置错误，使用默认值 32")
+        LOCAL_EMBEDDING_BATCH_SIZE = 32
+
+    # 推理线程数（0 表示使用推理框架的默认值）
+    try:
+        LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+    except ValueError:
+        print("⚠️  LOCAL_EMBEDDING_THREADS 配置错误，使用默认值 0")
+        LOCAL_EMBEDDING_THREADS = 0
+
+    # 多进程向量化：工作进程数（0 表示在当前进程中向量化），每个进程加载一次模型
+    try:
+        EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+    except ValueError:
+        print("⚠️  EMBEDDING_WORKERS 配置错误，使用默认值 0")
+        EMBEDDING_WORKERS = 0
+    # 把工作进程绑定到各自的 CPU 核（仅 Linux 生效）
+    EMBEDDING_PIN_CPUS = os.getenv("EMBEDDING_PIN_CPUS", "true").lower() == "true"
+
+    # 启动时预热模型（第一个请求不再承担初始化开销）
+    LOCAL_EMBEDDING_WARMUP = os.getenv("LOCAL_EMBEDDING_WARMUP", "true").lower() == "true"
+
+    # 基准测试允许的最大向量偏差（1 - 余弦相似度，ONNX / 量化模型与原模型对比）
+    try:
+        EMBEDDING_DRIFT_THRESHOLD = float(os.getenv("EMBEDDING_DRIFT_THRESHOLD", "0.02"))
+    except ValueError:
+        print("⚠️  EMBEDDING_DRIFT_THRESHOLD 配置错误，使用默认值 0.02")
+        EMBEDDING_DRIFT_THRESHOLD = 0.02
+
+    # Embedding 磁盘缓存配置
+    EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+    try:
+        EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+    except ValueError:
+        print("⚠️  EMBEDDING_CACHE_MAX_MB 配置错误，使用默认值 512")
+        EMBEDDING_CACHE_MAX_MB = 512
 
     # 向量数据库配置
     CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
 
+    # 命名集合（每个产品线 / 租户一个集合）的根目录，集合保存在 COLLECTIONS_DIR/<名称>
+    COLLECTIONS_DIR = os.getenv("COLLECTIONS_DIR", "./collections")
+
+    # 同时打开的命名集合数量上限（超出时关闭最久未使用的集合）
+    try:
+        MAX_OPEN_COLLECTIONS = int(os.getenv("MAX_OPEN_COLLECTIONS", "8"))
+    except ValueError:
+        print("⚠️  MAX_OPEN_COLLECTIONS 配置错误，使用默认值 8")
+        MAX_OPEN_COLLECTIONS = 8
+
+    # 向量索引后端：chroma（Chroma 数据库）或 local（进程内索引，查询不经过 SQLite）
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    # 进程内索引类型：flat（内存映射矩阵精确检索）、hnsw（近似检索）、pq（乘积量化压缩）
+    # 或 auto（按文档块数量在 flat / hnsw 之间自动选择）
+    LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "auto").lower()
+
+    try:
+        HNSW_MIN_CHUNKS = int(os.getenv("HNSW_MIN_CHUNKS", "10000"))
+    except ValueError:
+        print("⚠️  HNSW_MIN_CHUNKS 配置错误，使用默认值 10000")
+        HNSW_MIN_CHUNKS = 10000
+
+    try:
+        HNSW_M = int(os.getenv("HNSW_M", "16"))
+    except ValueError:
+        print("⚠️  HNSW_M 配置错误，使用默认值 16")
+        HNSW_M = 16
+
+    try:
+        HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    except ValueError:
+        print("⚠️  HNSW_EF_CONSTRUCTION 配置错误，使用默认值 200")
+        HNSW_EF_CONSTRUCTION = 200
+
+    try:
+        HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+    except ValueError:
+        print("⚠️  HNSW_EF_SEARCH 配置错误，使用默认值 64")
+        HNSW_EF_SEARCH = 64
+
+    # PQ 子空间数量（必须整除向量维度，0 表示每 8 维一个子空间，即压缩 32 倍）
+    try:
+        PQ_SUBVECTORS = int(os.getenv("PQ_SUBVECTORS", "0"))
+    except ValueError:
+        print("⚠️  PQ_SUBVECTORS 配置错误，使用默认值 0")
+        PQ_SUBVECTORS = 0
+
+    # PQ 检索后用原始向量精排的候选数量（0 表示不精排）
+    try:
+        PQ_RERANK = int(os.getenv("PQ_RERANK", "100"))
+    except ValueError:
+        print("⚠️  PQ_RERANK 配置错误，使用默认值 100")
+        PQ_RERANK = 100
+
     # 文档处理配置
     try:
         CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
@@ -53,8 +179,155 @@ class Config:
         print("⚠️  CHUNK_OVERLAP 配置错误，使用默认值 200")
         CHUNK_OVERLAP = 200
 
+    # 切分器：native（基于位置区间，速度快）或 langchain（RecursiveCharacterTextSplitter），切分结果相同
+    TEXT_SPLITTER = os.getenv("TEXT_SPLITTER", "native").lower()
+
+    # 分块方式：page（逐页切分，文档块不跨页）或 continuous（同一 PDF 的页面连成文本流，按句切分，可跨页）
+    CHUNKING_MODE = os.getenv("CHUNKING_MODE", "page").lower()
+
+    # 流式加载配置
+    try:
+        # 超过该大小的 PDF 使用逐页流式加载（MB）
+        STREAMING_THRESHOLD_MB = int(os.getenv("STREAMING_THRESHOLD_MB", "100"))
+    except ValueError:
+        print("⚠️  STREAMING_THRESHOLD_MB 配置错误，使用默认值 100")
+        STREAMING_THRESHOLD_MB = 100
+
+    try:
+        # 流式加载时每批送去向量化的文档块数量
+        INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+    except ValueError:
+        print("⚠️  INGEST_BATCH_SIZE 配置错误，使用默认值 100")
+        INGEST_BATCH_SIZE = 100
+
+    # 批量导入配置（解析 PDF 的进程数，默认等于 CPU 核数）
+    try:
+        INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+    except ValueError:
+        print("⚠️  INGEST_WORKERS 配置错误，使用默认值（CPU 核数）")
+        INGEST_WORKERS = os.cpu_count() or 1
+
+    # 增量索引配置（按内容哈希跳过未变化的文档块）
+    INCREMENTAL_INDEX = os.getenv("INCREMENTAL_INDEX", "true").lower() == "true"
+
+    # 检索配置
+    # 关键词索引：导入时同时建立 BM25 倒排索引（补足编号、错误码等精确词的召回）
+    BM25_INDEX = os.getenv("BM25_INDEX", "true").lower() == "true"
+    # 中文分词方式：bigram（二元组，无额外依赖）或 jieba（需要安装 jieba）
+    BM25_TOKENIZER = os.getenv("BM25_TOKENIZER", "bigram").lower()
+    # 检索模式：vector（向量）、bm25（关键词）或 hybrid（两路结果倒数排名融合）
+    # 默认 vector；hybrid 需要主动开启（已有数据库首次加载时会补建 BM25 索引）
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").lower()
+
+    try:
+        HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    except ValueError:
+        print("⚠️  HYBRID_CANDIDATES 配置错误，使用默认值 20")
+        HYBRID_CANDIDATES = 20
+
+    try:
+        RRF_K = int(os.getenv("RRF_K", "60"))
+    except ValueError:
+        print("⚠️  RRF_K 配置错误，使用默认值 60")
+        RRF_K = 60
+
+    try:
+        RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+    except ValueError:
+        print("⚠️  RETRIEVAL_TOP_K 配置错误，使用默认值 3")
+        RETRIEVAL_TOP_K = 3
+
+    # 上下文预算（检索文档 + 对话历史的 token 上限，0 表示按模型上下文窗口自动确定）
+    try:
+        CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+    except ValueError:
+        print("⚠️  CONTEXT_TOKEN_BUDGET 配置错误，使用默认值 0")
+        CONTEXT_TOKEN_BUDGET = 0
+
+    try:
+        CONTEXT_HISTORY_RATIO = float(os.getenv("CONTEXT_HISTORY_RATIO", "0.25"))
+    except ValueError:
+        print("⚠️  CONTEXT_HISTORY_RATIO 配置错误，使用默认值 0.25")
+        CONTEXT_HISTORY_RATIO = 0.25
+
+    # 重排序配置（交叉编码器对更多候选精排，只把最相关的几个交给 LLM）
+    RERANK = os.getenv("RERANK", "false").lower() == "true"
+    RERANK_MODEL = os.getenv("RERANK_MODEL", "BAAI/bge-reranker-base")
+
+    try:
+        RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+    except ValueError:
+        print("⚠️  RERANK_CANDIDATES 配置错误，使用默认值 30")
+        RERANK_CANDIDATES = 30
+
+    try:
+        RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    except ValueError:
+        print("⚠️  RERANK_BATCH_SIZE 配置错误，使用默认值 16")
+        RERANK_BATCH_SIZE = 16
+
+    try:
+        RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "500"))
+    except ValueError:
+        print("⚠️  RERANK_LATENCY_BUDGET_MS 配置错误，使用默认值 500")
+        RERANK_LATENCY_BUDGET_MS = 500.0
+
     # 对话记忆配置
     ENABLE_MEMORY = os.getenv("ENABLE_MEMORY", "true").lower() == "true"
+    # 记忆模式：buffer（预算内保留最近轮次原文）或 summary（最近几轮原文 + 更早对话的滚动摘要）
+    MEMORY_MODE = os.getenv("MEMORY_MODE", "buffer").lower()
+
+    try:
+        MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "4"))
+    except ValueError:
+        print("⚠️  MEMORY_WINDOW_TURNS 配置错误，使用默认值 4")
+        MEMORY_WINDOW_TURNS = 4
+
+    # 语义缓存配置（相似问题直接复用答案）
+    SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+
+    try:
+        SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    except ValueError:
+        print("⚠️  SEMANTIC_CACHE_THRESHOLD 配置错误，使用默认值 0.95")
+        SEMANTIC_CACHE_THRESHOLD = 0.95
+
+    try:
+        SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+    except ValueError:
+        print("⚠️  SEMANTIC_CACHE_TTL 配置错误，使用默认值 3600")
+        SEMANTIC_CACHE_TTL = 3600
+
+    try:
+        SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    except ValueError:
+        print("⚠️  SEMANTIC_CACHE_MAX_ENTRIES 配置错误，使用默认值 1000")
+        SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+    # 会话配置（多用户共享一个问答系统时，每个会话独立保存对话记忆）
+    try:
+        MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "100"))
+    except ValueError:
+        print("⚠️  MAX_SESSIONS 配置错误，使用默认值 100")
+        MAX_SESSIONS = 100
+
+    try:
+        SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))
+    except ValueError:
+        print("⚠️  SESSION_TTL 配置错误，使用默认值 1800")
+        SESSION_TTL = 1800
+
+    # HTTP 服务配置
+    SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+
+    try:
+        SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+    except ValueError:
+        print("⚠️  SERVER_PORT 配置错误，使用默认值 8000")
+        SERVER_PORT = 8000
+
+    # /ingest 接口只能导入该目录下的 PDF（请求中的相对路径相对于此目录）
+    INGEST_ROOT = os.getenv("INGEST_ROOT", "./docs")
 
     @classmethod
     def validate(cls):
@@ -136,6 +409,68 @@ class Config:
                     f"  推荐的 OpenAI 模型: {', '.join(valid_embedding_models)}"
                 )
 
+        # 验证分批向量化配置
+        if cls.EMBEDDING_BATCH_SIZE < 1 or cls.EMBEDDING_BATCH_SIZE > 2048:
+            errors.append(
+                f"EMBEDDING_BATCH_SIZE 超出范围: {cls.EMBEDDING_BATCH_SIZE}\n"
+                "  有效范围: 1 - 2048"
+            )
+
+        if cls.EMBEDDING_BATCH_TOKENS < 1:
+            errors.append(
+                f"EMBEDDING_BATCH_TOKENS 配置不合理: {cls.EMBEDDING_BATCH_TOKENS}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.EMBEDDING_CONCURRENCY < 1:
+            errors.append(
+                f"EMBEDDING_CONCURRENCY 配置不合理: {cls.EMBEDDING_CONCURRENCY}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.EMBEDDING_MAX_RETRIES < 0:
+            errors.append(
+                f"EMBEDDING_MAX_RETRIES 配置不合理: {cls.EMBEDDING_MAX_RETRIES}\n"
+                "  应该大于等于 0"
+            )
+
+        # 验证本地 Embedding 推理配置
+        if cls.LOCAL_EMBEDDING_BACKEND not in ["torch", "onnx"]:
+            errors.append(
+                f"LOCAL_EMBEDDING_BACKEND 配置错误: {cls.LOCAL_EMBEDDING_BACKEND}\n"
+                "  支持的后端: torch, onnx"
+            )
+
+        if cls.LOCAL_EMBEDDING_BATCH_SIZE < 1:
+            errors.append(
+                f"LOCAL_EMBEDDING_BATCH_SIZE 配置不合理: {cls.LOCAL_EMBEDDING_BATCH_SIZE}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.LOCAL_EMBEDDING_THREADS < 0:
+            errors.append(
+                f"LOCAL_EMBEDDING_THREADS 配置不合理: {cls.LOCAL_EMBEDDING_THREADS}\n"
+                "  应该大于等于 0（0 表示使用默认值）"
+            )
+
+        if cls.EMBEDDING_WORKERS < 0:
+            errors.append(
+                f"EMBEDDING_WORKERS 配置不合理: {cls.EMBEDDING_WORKERS}\n"
+                "  应该大于等于 0（0 表示不启用多进程向量化）"
+            )
+
+        if not 0 <= cls.EMBEDDING_DRIFT_THRESHOLD <= 1:
+            errors.append(
+                f"EMBEDDING_DRIFT_THRESHOLD 超出范围: {cls.EMBEDDING_DRIFT_THRESHOLD}\n"
+                "  有效范围: 0.0 - 1.0"
+            )
+
+        if cls.EMBEDDING_CACHE and cls.EMBEDDING_CACHE_MAX_MB < 1:
+            errors.append(
+                f"EMBEDDING_CACHE_MAX_MB 配置不合理: {cls.EMBEDDING_CACHE_MAX_MB}\n"
+                "  应该大于等于 1"
+            )
+
         # 验证文档分块配置
         if cls.CHUNK_SIZE < 100 or cls.CHUNK_SIZE > 5000:
             errors.append(
@@ -149,12 +484,204 @@ class Config:
                 f"  应该在 0 到 {cls.CHUNK_SIZE} 之间"
             )
 
+        if cls.TEXT_SPLITTER not in ["native", "langchain"]:
+            errors.append(
+                f"TEXT_SPLITTER 配置错误: {cls.TEXT_SPLITTER}\n"
+                "  支持的切分器: native, langchain"
+            )
+
+        if cls.CHUNKING_MODE not in ["page", "continuous"]:
+            errors.append(
+                f"CHUNKING_MODE 配置错误: {cls.CHUNKING_MODE}\n"
+                "  支持的分块方式: page, continuous"
+            )
+
+        if cls.STREAMING_THRESHOLD_MB < 1:
+            errors.append(
+                f"STREAMING_THRESHOLD_MB 配置不合理: {cls.STREAMING_THRESHOLD_MB}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.INGEST_BATCH_SIZE < 1:
+            errors.append(
+                f"INGEST_BATCH_SIZE 配置不合理: {cls.INGEST_BATCH_SIZE}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.INGEST_WORKERS < 1:
+            errors.append(
+                f"INGEST_WORKERS 配置不合理: {cls.INGEST_WORKERS}\n"
+                "  应该大于等于 1"
+            )
+
+        # 验证语义缓存配置
+        if not 0 < cls.SEMANTIC_CACHE_THRESHOLD <= 1:
+            errors.append(
+                f"SEMANTIC_CACHE_THRESHOLD 超出范围: {cls.SEMANTIC_CACHE_THRESHOLD}\n"
+                "  有效范围: 0 - 1"
+            )
+
+        if cls.SEMANTIC_CACHE_TTL < 0:
+            errors.append(
+                f"SEMANTIC_CACHE_TTL 配置不合理: {cls.SEMANTIC_CACHE_TTL}\n"
+                "  应该大于等于 0（0 表示永不过期）"
+            )
+
+        if cls.SEMANTIC_CACHE_MAX_ENTRIES < 1:
+            errors.append(
+                f"SEMANTIC_CACHE_MAX_ENTRIES 配置不合理: {cls.SEMANTIC_CACHE_MAX_ENTRIES}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.VECTOR_BACKEND not in ["chroma", "local"]:
+            errors.append(
+                f"VECTOR_BACKEND 配置错误: {cls.VECTOR_BACKEND}\n"
+                "  可选值: chroma, local"
+            )
+
+        if cls.MAX_OPEN_COLLECTIONS < 1:
+            errors.append(
+                f"MAX_OPEN_COLLECTIONS 配置不合理: {cls.MAX_OPEN_COLLECTIONS}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.LOCAL_INDEX_TYPE not in ["auto", "flat", "hnsw", "pq"]:
+            errors.append(
+                f"LOCAL_INDEX_TYPE 配置错误: {cls.LOCAL_INDEX_TYPE}\n"
+                "  可选值: auto, flat, hnsw, pq"
+            )
+
+        if cls.HNSW_MIN_CHUNKS < 0:
+            errors.append(
+                f"HNSW_MIN_CHUNKS 配置不合理: {cls.HNSW_MIN_CHUNKS}\n"
+                "  应该大于等于 0"
+            )
+
+        if not 2 <= cls.HNSW_M <= 100:
+            errors.append(
+                f"HNSW_M 配置不合理: {cls.HNSW_M}\n"
+                "  应该在 2 到 100 之间（常用 12-48）"
+            )
+
+        if cls.HNSW_EF_CONSTRUCTION < cls.HNSW_M:
+            errors.append(
+                f"HNSW_EF_CONSTRUCTION 配置不合理: {cls.HNSW_EF_CONSTRUCTION}\n"
+                "  应该大于等于 HNSW_M"
+            )
+
+        if cls.HNSW_EF_SEARCH < 1:
+            errors.append(
+                f"HNSW_EF_SEARCH 配置不合理: {cls.HNSW_EF_SEARCH}\n"
+                "  应该大于等于 1（越大召回越高、查询越慢）"
+            )
+
+        if cls.PQ_SUBVECTORS < 0:
+            errors.append(
+                f"PQ_SUBVECTORS 配置不合理: {cls.PQ_SUBVECTORS}\n"
+                "  应该大于等于 0（0 表示自动选择）"
+            )
+
+        if cls.PQ_RERANK < 0:
+            errors.append(
+                f"PQ_RERANK 配置不合理: {cls.PQ_RERANK}\n"
+                "  应该大于等于 0"
+            )
+
+        if cls.BM25_TOKENIZER not in ["bigram", "jieba"]:
+            errors.append(
+                f"BM25_TOKENIZER 配置错误: {cls.BM25_TOKENIZER}\n"
+                "  可选值: bigram, jieba"
+            )
+
+        if cls.RETRIEVAL_MODE not in ["vector", "bm25", "hybrid"]:
+            errors.append(
+                f"RETRIEVAL_MODE 配置错误: {cls.RETRIEVAL_MODE}\n"
+                "  可选值: vector, bm25, hybrid"
+            )
+
+        if cls.RETRIEVAL_MODE in ["bm25", "hybrid"] and not cls.BM25_INDEX:
+            errors.append(
+                f"RETRIEVAL_MODE={cls.RETRIEVAL_MODE} 需要开启 BM25_INDEX"
+            )
+
+        if cls.HYBRID_CANDIDATES < 1:
+            errors.append(
+                f"HYBRID_CANDIDATES 配置不合理: {cls.HYBRID_CANDIDATES}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.RRF_K < 1:
+            errors.append(
+                f"RRF_K 配置不合理: {cls.RRF_K}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.RETRIEVAL_TOP_K < 1:
+            errors.append(
+                f"RETRIEVAL_TOP_K 配置不合理: {cls.RETRIEVAL_TOP_K}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.CONTEXT_TOKEN_BUDGET < 0:
+            errors.append(
+                f"CONTEXT_TOKEN_BUDGET 配置不合理: {cls.CONTEXT_TOKEN_BUDGET}\n"
+                "  应该大于等于 0（0 表示按模型自动确定）"
+            )
+
+        if not 0 <= cls.CONTEXT_HISTORY_RATIO < 1:
+            errors.append(
+                f"CONTEXT_HISTORY_RATIO 超出范围: {cls.CONTEXT_HISTORY_RATIO}\n"
+                "  有效范围: 0 - 1（不含 1）"
+            )
+
+        if cls.RERANK and cls.RERANK_CANDIDATES < cls.RETRIEVAL_TOP_K:
+            errors.append(
+                f"RERANK_CANDIDATES 配置不合理: {cls.RERANK_CANDIDATES}\n"
+                f"  应该大于等于 RETRIEVAL_TOP_K（{cls.RETRIEVAL_TOP_K}）"
+            )
+
+        if cls.RERANK_BATCH_SIZE < 1:
+            errors.append(
+                f"RERANK_BATCH_SIZE 配置不合理: {cls.RERANK_BATCH_SIZE}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.RERANK_LATENCY_BUDGET_MS < 0:
+            errors.append(
+                f"RERANK_LATENCY_BUDGET_MS 配置不合理: {cls.RERANK_LATENCY_BUDGET_MS}\n"
+                "  应该大于等于 0（0 表示不限制）"
+            )
+
+        if cls.MEMORY_MODE not in ["buffer", "summary"]:
+            errors.append(
+                f"MEMORY_MODE 配置错误: {cls.MEMORY_MODE}\n"
+                "  可选值: buffer, summary"
+            )
+
+        if cls.MEMORY_WINDOW_TURNS < 1:
+            errors.append(
+                f"MEMORY_WINDOW_TURNS 配置不合理: {cls.MEMORY_WINDOW_TURNS}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.MAX_SESSIONS < 1:
+            errors.append(
+                f"MAX_SESSIONS 配置不合理: {cls.MAX_SESSIONS}\n"
+                "  应该大于等于 1"
+            )
+
+        if cls.SESSION_TTL < 0:
+            errors.append(
+                f"SESSION_TTL 配置不合理: {cls.SESSION_TTL}\n"
+                "  应该大于等于 0（0 表示永不过期）"
+            )
+
+        if not 1 <= cls.SERVER_PORT <= 65535:
+            errors.append(
+                f"SERVER_PORT 超出范围: {cls.SERVER_PORT}\n"
+                "  有效范围: 1 - 65535"
+            )
+
         if errors:
             raise ValueError("\n❌ 配置验证失败:\n" + "\n".join(errors))
 
-
-# 验证配置
-try:
-    Config.validate()
-except ValueError as e:
-    print(f"⚠️  配置错误：{e}")
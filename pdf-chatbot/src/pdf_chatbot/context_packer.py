@@ -0,0 +1,223 @@
+"""上下文打包模块（按 token 预算装入检索文档和对话历史）"""
+from typing import List
+
+from langchain.schema import Document
+
+from .text_utils import estimate_tokens
+
+
+# 各模型的上下文窗口（token，按保守值估计）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "qwen-turbo": 8000,
+    "qwen-turbo-latest": 8000,
+    "qwen-plus": 32000,
+    "qwen-plus-latest": 32000,
+    "qwen-max": 8000,
+    "qwen-max-latest": 8000,
+}
+
+# 未知模型的上下文窗口
+DEFAULT_CONTEXT_WINDOW = 8000
+
+# 自动预算的上限（窗口很大的模型也不必每次塞满）
+AUTO_BUDGET_LIMIT = 3000
+
+
+def overlap_length(a: str, b: str, min_overlap: int = 20) -> int:
+    """
+    计算 a 的结尾与 b 的开头重叠的长度
+
+    参数:
+        a: 前一个文本
+        b: 后一个文本
+        min_overlap: 最短重叠长度（更短的重叠视为巧合）
+
+    返回:
+        重叠的字符数（没有重叠时为 0）
+    """
+    if len(a) < min_overlap or len(b) < min_overlap:
+        return 0
+
+    probe = b[:min_overlap]
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        # 第一个满足条件的位置对应最长的重叠
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截断文本，使估算的 token 数不超过 max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # token 数随长度单调增加，二分查找最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+class ContextPacker:
+    """
+    上下文打包器
+
+    功能:
+        - 去掉检索结果中相互重叠的部分（CHUNK_OVERLAP 产生的重复文本）
+        - 按相关度顺序装入文档块，超出预算的文档块截断或丢弃
+        - 对话历史只保留预算内最近的若干轮，更早的轮次丢弃
+
+    预算按模型的上下文窗口确定，每次请求的提示词大小可预期：
+        文档 ≤ budget - 历史预算 - 问题，历史 ≤ budget × history_ratio
+    """
+
+    # 截断后剩余 token 少于该值时不再装入残缺的文档块
+    MIN_CHUNK_TOKENS = 50
+
+    def __init__(self, budget: int, history_ratio: float = 0.25):
+        """
+        参数:
+            budget: 文档和对话历史的总 token 预算
+            history_ratio: 对话历史占预算的比例
+        """
+        self.budget = budget
+        self.history_budget = int(budget * history_ratio)
+
+    @classmethod
+    def for_model(cls, model_name: str, budget: int = 0, history_ratio: float = 0.25) -> "ContextPacker":
+        """
+        按模型创建打包器
+
+        参数:
+            model_name: 模型名称
+            budget: token 预算（0 表示按模型上下文窗口自动确定）
+            history_ratio: 对话历史占预算的比例
+
+        返回:
+            上下文打包器
+        """
+        window = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
+        if not budget:
+            budget = min(AUTO_BUDGET_LIMIT, window // 2)
+        # 至少给回答留出一半窗口
+        return cls(min(budget, window // 2), history_ratio)
+
+    def document_budget(self, question: str) -> int:
+        """文档可用的 token 预算"""
+        return max(0, self.budget - self.history_budget - estimate_tokens(question))
+
+    @staticmethod
+    def dedupe(documents: List[Document]) -> List[Document]:
+        """
+        去掉重叠文本
+
+        按顺序处理，同一来源中：
+            - 被已保留文档块完整包含的文档块丢弃
+            - 与已保留文档块首尾重叠的部分裁掉
+
+        参数:
+            documents: 按相关度排序的文档块
+
+        返回:
+            去重后的文档块（顺序不变）
+        """
+        kept = []
+        for doc in documents:
+            content = doc.page_content
+            source = doc.metadata.get("source")
+
+            for other in kept:
+                if other.metadata.get("source") != source:
+                    continue
+                if content in other.page_content:
+                    content = ""
+                    break
+                content = content[overlap_length(other.page_content, content):]
+                tail = overlap_length(content, other.page_content)
+                if tail:
+                    content = content[:len(content) - tail]
+
+            if content.strip():
+                kept.append(Document(page_content=content, metadata=doc.metadata))
+        return kept
+
+    def pack_documents(self, question: str, documents: List[Document]) -> List[Document]:
+        """
+        按预算装入文档块
+
+        参数:
+            question: 问题（计入预算）
+            documents: 按相关度排序的文档块
+
+        返回:
+            去重并装入预算后的文档块
+        """
+        remaining = self.document_budget(question)
+        packed = []
+
+        for doc in self.dedupe(documents):
+            tokens = estimate_tokens(doc.page_content)
+            if tokens <= remaining:
+                packed.append(doc)
+                remaining -= tokens
+                continue
+
+            # 放不下完整文档块时，剩余预算足够就截断装入，然后停止
+            if remaining >= self.MIN_CHUNK_TOKENS:
+                packed.append(Document(
+                    page_content=truncate_to_tokens(doc.page_content, remaining),
+                    metadata={**doc.metadata, "truncated": True}
+                ))
+            break
+
+        return packed
+
+    def pack_history(self, messages: list, budget: int = None) -> list:
+        """
+        保留预算内最近的对话轮次
+
+        参数:
+            messages: 对话消息列表（问、答交替）
+            budget: token 预算（默认为对话历史预算）
+
+        返回:
+            最近若干轮的消息（按整轮保留；最近一轮都放不下时截断保留）
+        """
+        budget = self.history_budget if budget is None else budget
+        if not budget:
+            return []
+
+        remaining = budget
+        start = len(messages)
+
+        # 从最近一轮往前，每次保留一问一答
+        while start > 0:
+            turn_start = max(0, start - 2)
+            tokens = sum(estimate_tokens(message.content) for message in messages[turn_start:start])
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            start = turn_start
+
+        if start == len(messages) and messages:
+            # 最近一轮超出预算：截断每条消息，保证追问仍有上下文
+            last_turn = messages[-2:]
+            per_message = budget // len(last_turn)
+            return [
+                message.copy(update={"content": truncate_to_tokens(message.content, per_message)})
+                for message in last_turn
+            ]
+
+        return messages[start:]
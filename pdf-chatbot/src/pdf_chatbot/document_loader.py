@@ -1,39 +1,104 @@
 """文档加载模块"""
 import os
-from typing import List
+import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Iterator, Iterable, Tuple
 from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
 from .config import Config
+from .text_splitter import CHUNK_SEPARATORS, SentenceChunker, SpanTextSplitter
+
+
+# 每个工作进程复用一个 DocumentProcessor
+_worker_processor = None
+
+
+def _process_pdf_worker(file_path: str) -> List[Document]:
+    """进程池任务：在工作进程中解析并切分单个 PDF"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor()
+    return _worker_processor.process_pdf(file_path)
+
+
+def find_pdfs(path: str) -> List[str]:
+    """
+    查找待导入的 PDF 文件
+
+    参数:
+        path: 单个 PDF 文件、目录（递归查找）或 glob 模式（如 docs/**/*.pdf）
+
+    返回:
+        排序后的 PDF 文件路径列表
+
+    异常:
+        ValueError: 路径为空
+        FileNotFoundError: 未找到任何 PDF 文件
+    """
+    if not path:
+        raise ValueError("文件路径不能为空")
+
+    if os.path.isdir(path):
+        candidates = glob.glob(os.path.join(path, "**", "*"), recursive=True)
+    else:
+        candidates = glob.glob(path, recursive=True)
+
+    pdf_files = sorted(
+        p for p in candidates
+        if os.path.isfile(p) and p.lower().endswith('.pdf')
+    )
+
+    if not pdf_files:
+        raise FileNotFoundError(f"未找到 PDF 文件: {path}")
+
+    return pdf_files
 
 
 class DocumentProcessor:
     """文档处理类"""
 
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=Config.CHUNK_SIZE,
-            chunk_overlap=Config.CHUNK_OVERLAP,
-            separators=["\n\n", "\n", "。", "！", "？", " ", ""]
+        # 两种切分器的切分结果相同，native 只在位置区间上计算，速度更快
+        if Config.TEXT_SPLITTER == "langchain":
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=Config.CHUNK_SIZE,
+                chunk_overlap=Config.CHUNK_OVERLAP,
+                separators=CHUNK_SEPARATORS
+            )
+        else:
+            self.text_splitter = SpanTextSplitter(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP, CHUNK_SEPARATORS)
+
+        # continuous 模式：同一 PDF 的页面连成文本流按句切分，段落跨页时不会被切成碎片
+        self.sentence_chunker = (
+            SentenceChunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP, CHUNK_SEPARATORS)
+            if Config.CHUNKING_MODE == "continuous" else None
         )
 
-    def load_pdf(self, file_path: str) -> List[Document]:
+    def _iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """按 CHUNKING_MODE 切分页面流"""
+        if self.sentence_chunker is not None:
+            yield from self.sentence_chunker.iter_chunks(pages)
+            return
+        for page in pages:
+            yield from self.text_splitter.split_documents([page])
+
+    def _validate_pdf(self, file_path: str) -> int:
         """
-        加载 PDF 文件
+        校验 PDF 文件路径
 
         参数:
             file_path: PDF 文件路径
 
         返回:
-            文档列表
+            文件大小（字节）
 
         异常:
             FileNotFoundError: 文件不存在
-            ValueError: 文件格式错误
-            Exception: 其他加载错误
+            ValueError: 路径为空、格式错误或文件为空
         """
-        # 验证文件路径
         if not file_path:
             raise ValueError("文件路径不能为空")
 
@@ -43,35 +108,138 @@ class DocumentProcessor:
         if not file_path.lower().endswith('.pdf'):
             raise ValueError(f"文件格式错误，仅支持 PDF 文件: {file_path}")
 
-        # 验证文件大小（限制 100MB）
         file_size = os.path.getsize(file_path)
-        max_size = 100 * 1024 * 1024  # 100MB
-        if file_size > max_size:
-            raise ValueError(f"文件过大（{file_size / 1024 / 1024:.1f}MB），最大支持 100MB")
-
         if file_size == 0:
             raise ValueError(f"文件为空: {file_path}")
 
+        return file_size
+
+    def _convert_load_error(self, error: Exception, file_path: str) -> Exception:
+        """将 PyPDFLoader 的异常转换为友好提示"""
+        if "encrypted" in str(error).lower():
+            return ValueError(f"PDF 文件已加密，无法读取: {file_path}")
+        elif "damaged" in str(error).lower() or "invalid" in str(error).lower():
+            return ValueError(f"PDF 文件已损坏或格式无效: {file_path}")
+        else:
+            return Exception(f"加载 PDF 失败: {str(error)}")
+
+    def load_pdf(self, file_path: str) -> List[Document]:
+        """
+        加载 PDF 文件（一次性读入全部页面）
+
+        超过 Config.STREAMING_THRESHOLD_MB 的文件请使用 iter_pages / iter_chunk_batches
+        逐页流式加载。
+
+        参数:
+            file_path: PDF 文件路径
+
+        返回:
+            文档列表
+
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError: 文件格式错误
+            Exception: 其他加载错误
+        """
+        file_size = self._validate_pdf(file_path)
+
+        # 一次性加载的大小限制
+        max_size = Config.STREAMING_THRESHOLD_MB * 1024 * 1024
+        if file_size > max_size:
+            raise ValueError(
+                f"文件过大（{file_size / 1024 / 1024:.1f}MB），一次性加载最大支持 "
+                f"{Config.STREAMING_THRESHOLD_MB}MB，请使用流式加载（iter_chunk_batches）"
+            )
+
         print(f"📄 正在加载 PDF: {file_path} ({file_size / 1024:.1f}KB)")
 
         try:
             loader = PyPDFLoader(file_path)
             documents = loader.load()
+        except Exception as e:
+            raise self._convert_load_error(e, file_path)
 
-            if not documents:
-                raise ValueError("PDF 文件无法解析或内容为空")
+        if not documents:
+            raise ValueError("PDF 文件无法解析或内容为空")
 
-            print(f"✅ 成功加载 {len(documents)} 页")
-            return documents
+        print(f"✅ 成功加载 {len(documents)} 页")
+        return documents
 
+    def iter_pages(self, file_path: str) -> Iterator[Document]:
+        """
+        逐页流式加载 PDF（无文件大小限制）
+
+        参数:
+            file_path: PDF 文件路径
+
+        返回:
+            页面文档迭代器，每次只解析一页
+
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError: 文件格式错误或内容为空
+            Exception: 其他加载错误
+        """
+        file_size = self._validate_pdf(file_path)
+
+        print(f"📄 正在流式加载 PDF: {file_path} ({file_size / 1024 / 1024:.1f}MB)")
+
+        # 直接遍历 pypdf 的页面：PyPDFLoader.lazy_load 会先提取全部页面的文本再逐个产出，
+        # 大文件仍会整份读入内存。传入文件对象而不是路径（传路径时 pypdf 会把整个文件
+        # 读进 BytesIO），页面内容按需从磁盘读取。元数据与 PyPDFLoader 一致（source / page）
+        page_count = 0
+        try:
+            from pypdf import PdfReader
+
+            with open(file_path, "rb") as pdf_file:
+                reader = PdfReader(pdf_file)
+                for page_number, page in enumerate(reader.pages):
+                    page_count += 1
+                    yield Document(
+                        page_content=page.extract_text(),
+                        metadata={"source": file_path, "page": page_number}
+                    )
         except Exception as e:
-            # 捕获 PyPDFLoader 的异常并转换为友好提示
-            if "encrypted" in str(e).lower():
-                raise ValueError(f"PDF 文件已加密，无法读取: {file_path}")
-            elif "damaged" in str(e).lower() or "invalid" in str(e).lower():
-                raise ValueError(f"PDF 文件已损坏或格式无效: {file_path}")
-            else:
-                raise Exception(f"加载 PDF 失败: {str(e)}")
+            raise self._convert_load_error(e, file_path)
+
+        if page_count == 0:
+            raise ValueError("PDF 文件无法解析或内容为空")
+
+        print(f"✅ 成功加载 {page_count} 页")
+
+    def iter_chunk_batches(self, file_path: str, batch_size: int = None) -> Iterator[List[Document]]:
+        """
+        流式加载并切分 PDF，按批产出文档块
+
+        每页解析后立即切分，攒够 batch_size 个文档块就产出一批，
+        提取出的文本只保留当前批次（pypdf 读过的页面对象仍会缓存在解析器中）。
+
+        参数:
+            file_path: PDF 文件路径
+            batch_size: 每批文档块数量（默认读取 Config.INGEST_BATCH_SIZE）
+
+        返回:
+            文档块批次迭代器
+        """
+        batch_size = batch_size or Config.INGEST_BATCH_SIZE
+
+        batch = []
+        chunk_count = 0
+        for chunk in self._iter_chunks(self.iter_pages(file_path)):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                chunk_count += len(batch)
+                yield batch
+                batch = []
+
+        if batch:
+            chunk_count += len(batch)
+            yield batch
+
+        if chunk_count == 0:
+            raise ValueError("文档切分失败，未生成任何文档块")
+
+        print(f"✅ 切分为 {chunk_count} 个文档块")
 
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """
@@ -92,7 +260,10 @@ class DocumentProcessor:
         print(f"✂️  正在切分文档...")
 
         try:
-            chunks = self.text_splitter.split_documents(documents)
+            if self.sentence_chunker is not None:
+                chunks = self.sentence_chunker.split_documents(documents)
+            else:
+                chunks = self.text_splitter.split_documents(documents)
 
             if not chunks:
                 raise ValueError("文档切分失败，未生成任何文档块")
@@ -116,3 +287,51 @@ class DocumentProcessor:
         documents = self.load_pdf(file_path)
         chunks = self.split_documents(documents)
         return chunks
+
+    def iter_process_pdfs(
+        self,
+        file_paths: Iterable[str],
+        max_workers: int = None
+    ) -> Iterator[Tuple[str, List[Document]]]:
+        """
+        并行处理多个 PDF 文件（进程池）
+
+        PDF 解析是 CPU 密集型操作，使用多进程绕开 GIL。
+        每个文件处理完成后立即产出，不必等待最慢的文件。
+
+        参数:
+            file_paths: PDF 文件路径列表
+            max_workers: 进程数（默认读取 Config.INGEST_WORKERS）
+
+        返回:
+            (文件路径, 文档块列表) 迭代器，按完成顺序产出
+            处理失败的文件会打印错误并跳过
+        """
+        file_paths = list(file_paths)
+        if not file_paths:
+            return
+
+        max_workers = min(max_workers or Config.INGEST_WORKERS, len(file_paths))
+
+        # 单个文件或单进程时直接在当前进程处理
+        if max_workers <= 1:
+            for file_path in file_paths:
+                try:
+                    yield file_path, self.process_pdf(file_path)
+                except Exception as e:
+                    print(f"❌ {file_path}: {str(e)}")
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_process_pdf_worker, file_path): file_path
+                for file_path in file_paths
+            }
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    print(f"❌ {file_path}: {str(e)}")
+                    continue
+                yield file_path, chunks
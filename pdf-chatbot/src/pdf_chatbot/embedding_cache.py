@@ -0,0 +1,238 @@
+"""Embedding 磁盘缓存模块"""
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本（NFKC + 合并空白），作为缓存键的输入"""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Embedding 磁盘缓存（按模型隔离，LRU 淘汰）
+
+    存储布局（每个模型一个目录）:
+        - vectors.f32: float32 向量矩阵（内存映射，capacity × dim）
+        - keys.bin:    每个槽位的缓存键（SHA1 摘要，capacity × 20 字节）
+        - ticks.u64:   每个槽位的最近使用时间戳（0 表示空槽）
+        - meta.json:   模型名称、向量维度和容量
+
+    容量由 max_bytes 决定，写满后一次淘汰最久未使用的 10% 槽位。
+    """
+
+    KEY_SIZE = 20            # SHA1 摘要长度
+    EVICT_RATIO = 0.1        # 每次淘汰的槽位比例
+
+    def __init__(self, cache_dir: str, model_name: str, max_bytes: int):
+        """
+        初始化缓存
+
+        参数:
+            cache_dir: 缓存根目录
+            model_name: Embedding 模型名称（不同模型的缓存互不影响）
+            max_bytes: 缓存文件总大小上限（字节）
+        """
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.path = Path(cache_dir) / re.sub(r"[^A-Za-z0-9._-]", "_", model_name)
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._index = {}     # 缓存键 -> 槽位
+        self._free = []      # 空槽位
+        self._tick = 0
+        self._vectors = None
+        self._keys = None
+        self._ticks = None
+        self.dim = None
+
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                self._open(meta["dim"], meta["capacity"], create=False)
+            except Exception as e:
+                print(f"⚠️  Embedding 缓存损坏，将重新创建: {str(e)}")
+                self._vectors = None
+
+    @staticmethod
+    def make_key(text: str, kind: str = "document") -> bytes:
+        """
+        计算缓存键
+
+        参数:
+            text: 原始文本
+            kind: 文本类型（document / query，两类分开缓存）
+
+        返回:
+            20 字节的 SHA1 摘要
+        """
+        return hashlib.sha1(f"{kind}\x00{normalize_text(text)}".encode("utf-8")).digest()
+
+    def _open(self, dim: int, capacity: int, create: bool):
+        """打开（或创建）内存映射文件并重建索引"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        mode = "w+" if create else "r+"
+
+        self._vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode=mode,
+                                  shape=(capacity, dim))
+        self._keys = np.memmap(self.path / "keys.bin", dtype=np.uint8, mode=mode,
+                               shape=(capacity, self.KEY_SIZE))
+        self._ticks = np.memmap(self.path / "ticks.u64", dtype=np.uint64, mode=mode,
+                                shape=(capacity,))
+        self.dim = dim
+
+        if create:
+            meta = {"model": self.model_name, "dim": dim, "capacity": capacity}
+            (self.path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+        occupied = np.flatnonzero(self._ticks)
+        self._index = {self._keys[slot].tobytes(): int(slot) for slot in occupied}
+        self._free = sorted(set(range(capacity)) - set(self._index.values()), reverse=True)
+        self._tick = int(self._ticks.max()) if capacity else 0
+
+    def _evict(self):
+        """淘汰最久未使用的一批槽位"""
+        capacity = len(self._ticks)
+        count = max(1, int(capacity * self.EVICT_RATIO))
+        victims = np.argpartition(self._ticks, count - 1)[:count]
+        for slot in victims:
+            self._index.pop(self._keys[slot].tobytes(), None)
+            self._ticks[slot] = 0
+            self._free.append(int(slot))
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        批量查询缓存
+
+        参数:
+            keys: 缓存键列表
+
+        返回:
+            与 keys 对应的向量列表，未命中为 None
+        """
+        results = []
+        with self._lock:
+            for key in keys:
+                slot = self._index.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self.hits += 1
+                self._tick += 1
+                self._ticks[slot] = self._tick
+                results.append(np.array(self._vectors[slot]))
+        return results
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]):
+        """
+        批量写入缓存
+
+        参数:
+            keys: 缓存键列表
+            vectors: 对应的向量列表
+        """
+        if not keys:
+            return
+
+        with self._lock:
+            if self._vectors is None:
+                dim = len(vectors[0])
+                capacity = max(1, self.max_bytes // (dim * 4 + self.KEY_SIZE + 8))
+                self._open(dim, capacity, create=True)
+
+            for key, vector in zip(keys, vectors):
+                if len(vector) != self.dim:
+                    raise ValueError(
+                        f"Embedding 维度不一致: 缓存为 {self.dim}，实际为 {len(vector)}"
+                    )
+
+                slot = self._index.get(key)
+                if slot is None:
+                    if not self._free:
+                        self._evict()
+                    slot = self._free.pop()
+                    self._index[key] = slot
+
+                # 先写向量和键，最后写时间戳（时间戳非 0 才视为有效槽位）
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._tick += 1
+                self._ticks[slot] = self._tick
+
+    def flush(self):
+        """把内存映射的修改写回磁盘"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._keys.flush()
+                self._ticks.flush()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "model": self.model_name,
+            "entries": len(self._index),
+            "capacity": 0 if self._ticks is None else len(self._ticks),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """带磁盘缓存的 Embedding 包装器（只对未命中的文本调用底层模型）"""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        """
+        参数:
+            embeddings: 底层 Embedding 模型
+            cache: Embedding 缓存
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """向量化文档（命中缓存的文本不再调用模型）"""
+        texts = list(texts)
+        keys = [EmbeddingCache.make_key(text, "document") for text in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            # 同一批中重复的文本只向量化一次
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], texts[i])
+            new_vectors = self.embeddings.embed_documents(list(unique.values()))
+            new_vectors = np.asarray(new_vectors, dtype=np.float32)
+            self.cache.put_many(list(unique.keys()), new_vectors)
+            self.cache.flush()
+
+            by_key = dict(zip(unique.keys(), new_vectors))
+            for i in missing:
+                cached[i] = by_key[keys[i]]
+
+        return [vector.tolist() for vector in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        """向量化查询（重复的问题直接命中缓存）"""
+        key = EmbeddingCache.make_key(text, "query")
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self.cache.put_many([key], [vector])
+            self.cache.flush()
+        return vector.tolist()
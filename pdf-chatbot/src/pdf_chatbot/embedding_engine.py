@@ -0,0 +1,192 @@
+"""分批向量化模块（限并发 + 按批重试）"""
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain.embeddings.base import Embeddings
+
+from .config import Config
+from .text_utils import estimate_tokens
+
+
+# 值得重试的 HTTP 状态码（请求超时、冲突、限流、服务端错误）
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# 没有状态码时，按异常类型（含父类）判断的网络错误：
+# openai 的 APIConnectionError / APITimeoutError，httpx 的 TimeoutException / NetworkError
+RETRYABLE_ERROR_TYPES = {"APIConnectionError", "APITimeoutError", "TimeoutException", "NetworkError"}
+
+
+def error_status_code(error: Exception):
+    """
+    取出接口异常对应的 HTTP 状态码
+
+    参数:
+        error: 底层 Embedding 调用抛出的异常
+
+    返回:
+        状态码（openai 的 APIStatusError 等带 status_code / response 的异常），没有则返回 None
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    判断 Embedding 接口错误是否值得重试（限流、超时、连接失败、服务端错误）
+
+    按状态码和异常类型判断，不匹配错误信息文本（错误信息中恰好出现 "429"、"500" 的
+    参数错误不会被误判为可重试）
+    """
+    status = error_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_TYPES for cls in type(error).__mro__)
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    分批向量化引擎
+
+    功能:
+        - 按条数和估算 token 数切分批次
+        - 有界并发：同时最多 max_concurrency 个请求
+        - 按批重试：单批失败只重试这一批（指数退避 + 抖动），已成功的批次保留
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = None,
+        max_batch_tokens: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 30.0
+    ):
+        """
+        初始化向量化引擎
+
+        参数:
+            embeddings: 底层 Embedding 模型（如 OpenAIEmbeddings）
+            batch_size: 每批最多文本条数（默认读取 Config.EMBEDDING_BATCH_SIZE）
+            max_batch_tokens: 每批最多估算 token 数（默认读取 Config.EMBEDDING_BATCH_TOKENS）
+            max_concurrency: 最大并发请求数（默认读取 Config.EMBEDDING_CONCURRENCY）
+            max_retries: 单批最大重试次数（默认读取 Config.EMBEDDING_MAX_RETRIES）
+            retry_base_delay: 首次重试等待秒数
+            retry_max_delay: 单次重试最长等待秒数
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+        self.max_batch_tokens = max_batch_tokens or Config.EMBEDDING_BATCH_TOKENS
+        self.max_concurrency = max_concurrency or Config.EMBEDDING_CONCURRENCY
+        self.max_retries = Config.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        按条数和 token 数切分批次
+
+        参数:
+            texts: 文本列表
+
+        返回:
+            批次列表，每批是文本下标列表（超长的单条文本独占一批）
+        """
+        batches = []
+        current = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (
+                len(current) >= self.batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def _embed_batch(self, batch_no: int, texts: List[str]) -> List[List[float]]:
+        """向量化单个批次，失败时按指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                error_msg = str(e)
+
+                if error_status_code(e) == 401:
+                    raise ValueError("Embedding API Key 无效或已过期，请检查 .env 配置")
+
+                if not is_retryable_error(e):
+                    raise Exception(f"第 {batch_no} 批向量化失败: {error_msg}")
+
+                if attempt >= self.max_retries:
+                    raise Exception(
+                        f"第 {batch_no} 批向量化失败（已重试 {self.max_retries} 次）: {error_msg}"
+                    )
+
+                wait_time = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+                wait_time *= random.uniform(0.5, 1.0)
+                print(f"⚠️  第 {batch_no} 批向量化失败，{wait_time:.1f} 秒后重试"
+                      f"（{attempt + 1}/{self.max_retries}）...")
+                time.sleep(wait_time)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        分批并发向量化文本
+
+        参数:
+            texts: 文本列表
+
+        返回:
+            向量列表（与输入顺序一致）
+
+        异常:
+            ValueError: API Key 无效
+            Exception: 某一批重试耗尽后仍失败
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = self.make_batches(texts)
+        vectors = [None] * len(texts)
+
+        # 只有一批时不必启动线程池
+        if len(batches) == 1:
+            return self._embed_batch(1, texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = [
+                (batch, executor.submit(self._embed_batch, batch_no, [texts[i] for i in batch]))
+                for batch_no, batch in enumerate(batches, 1)
+            ]
+            try:
+                for batch, future in futures:
+                    for i, vector in zip(batch, future.result()):
+                        vectors[i] = vector
+            except Exception:
+                # 某批彻底失败后，取消尚未开始的批次
+                for _, future in futures:
+                    future.cancel()
+                raise
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """向量化查询（单条请求，不分批）"""
+        return self.embeddings.embed_query(text)
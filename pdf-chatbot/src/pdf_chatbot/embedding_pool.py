@@ -0,0 +1,369 @@
+"""多进程 Embedding 模块（本地模型按进程分片向量化，结果经共享内存返回）"""
+import os
+import math
+import queue
+import itertools
+import threading
+import weakref
+import multiprocessing
+from concurrent.futures import Future
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from .config import Config
+
+
+def split_cores(workers: int, cores: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    把可用 CPU 核平均分给各工作进程
+
+    参数:
+        workers: 进程数
+        cores: 可用核编号（默认为当前进程允许使用的核）
+
+    返回:
+        每个进程的核编号列表（核数少于进程数时，多出的进程与其他进程共用核）
+    """
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    per_worker = max(1, len(cores) // workers)
+    return [
+        cores[(i * per_worker) % len(cores):(i * per_worker) % len(cores) + per_worker]
+        for i in range(workers)
+    ]
+
+
+def _worker_main(worker_no: int, cores: List[int], settings: Dict, factory, tasks, results):
+    """
+    工作进程：加载一次模型（factory 为 None 时使用 create_local_embeddings），循环处理向量化任务
+
+    任务为 (job_id, shm_name, rows, texts)：向量写入共享内存矩阵的 rows 行；
+    shm_name 为 None 时（单条查询）向量直接随结果返回。
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    # 父进程中的配置（可能在运行时修改过）覆盖子进程重新读取的环境变量
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    if Config.LOCAL_EMBEDDING_THREADS == 0 and cores:
+        Config.LOCAL_EMBEDDING_THREADS = len(cores)
+
+    try:
+        if factory is None:
+            from .local_embeddings import create_local_embeddings
+
+            factory = create_local_embeddings
+        embeddings = factory()
+        dim = len(embeddings.embed_query("向量维度"))
+    except Exception as e:
+        results.put((None, worker_no, None, str(e)))
+        return
+    results.put((None, worker_no, dim, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        job_id, shm_name, rows, texts = task
+        try:
+            if shm_name is None:
+                results.put((job_id, worker_no, embeddings.embed_query(texts[0]), None))
+                continue
+
+            vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                matrix = np.ndarray((shm.size // (4 * dim), dim), dtype=np.float32, buffer=shm.buf)
+                matrix[rows] = vectors
+                del matrix
+            finally:
+                shm.close()
+            results.put((job_id, worker_no, None, None))
+        except Exception as e:
+            results.put((job_id, worker_no, None, str(e)))
+
+
+def _shutdown(processes, tasks):
+    """通知工作进程退出（超时未退出的强制结束）"""
+    for _ in processes:
+        try:
+            tasks.put(None)
+        except Exception:
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+
+class EmbeddingPool(Embeddings):
+    """
+    多进程本地 Embedding
+
+    启动 N 个工作进程，每个进程加载一次本地模型（create_local_embeddings，含预热），
+    并绑定到一部分 CPU 核（EMBEDDING_PIN_CPUS），进程之间不抢占核和缓存。
+
+    embed_documents 按文本长度排序后切分任务，分发给空闲进程（动态负载均衡）；
+    向量由工作进程直接写入共享内存中的结果矩阵，不经过 pickle 传回列表。
+
+    工作进程使用 spawn 方式启动（不继承父进程已加载的 PyTorch / ONNX Runtime 线程状态）。
+    """
+
+    # 每个任务最多包含的推理批数（任务越小负载越均衡，越大调度开销越少）
+    BATCHES_PER_JOB = 2
+
+    # 等待工作进程启动（加载模型和预热）的最长时间（秒）
+    STARTUP_TIMEOUT = 600
+
+    def __init__(
+        self,
+        workers: int = None,
+        pin_cpus: bool = None,
+        factory: Optional[Callable[[], Embeddings]] = None
+    ):
+        """
+        参数:
+            workers: 工作进程数（默认读取 Config.EMBEDDING_WORKERS）
+            pin_cpus: 是否把进程绑定到 CPU 核（默认读取 Config.EMBEDDING_PIN_CPUS，仅 Linux 生效）
+            factory: 工作进程中创建模型的函数（需为模块级函数，默认 create_local_embeddings）
+
+        异常:
+            Exception: 工作进程加载模型失败
+        """
+        self.workers = workers or Config.EMBEDDING_WORKERS
+        pin_cpus = Config.EMBEDDING_PIN_CPUS if pin_cpus is None else pin_cpus
+        core_slices = (
+            split_cores(self.workers) if pin_cpus and hasattr(os, "sched_setaffinity")
+            else [[] for _ in range(self.workers)]
+        )
+        settings = {
+            name: getattr(Config, name) for name in dir(Config)
+            if name.startswith("LOCAL_EMBEDDING_")
+        }
+
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(i, cores, settings, factory, self._tasks, self._results),
+                daemon=True
+            )
+            for i, cores in enumerate(core_slices)
+        ]
+
+        print(f"🔧 启动 {self.workers} 个 Embedding 工作进程...")
+        for process in self._processes:
+            process.start()
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._tasks)
+
+        self.dim = None
+        try:
+            for _ in self._processes:
+                _, worker_no, dim, error = self._results.get(timeout=self.STARTUP_TIMEOUT)
+                if error:
+                    raise Exception(f"Embedding 工作进程 {worker_no} 启动失败: {error}")
+                self.dim = dim
+        except queue.Empty:
+            self.close()
+            raise Exception("Embedding 工作进程启动超时")
+        except Exception:
+            self.close()
+            raise
+
+        if any(core_slices):
+            print(f"✅ Embedding 工作进程已就绪（每个进程 {len(core_slices[0])} 个 CPU 核）")
+        else:
+            print("✅ Embedding 工作进程已就绪")
+
+        self._job_ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._error = None
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+
+    def _read_results(self):
+        """结果分发线程：按任务编号完成对应的 Future；工作进程异常退出时让所有任务失败"""
+        while self._finalizer.alive:
+            try:
+                job_id, worker_no, value, error = self._results.get(timeout=1)
+            except queue.Empty:
+                if self._finalizer.alive and not all(p.is_alive() for p in self._processes):
+                    self._fail_all(Exception("Embedding 工作进程异常退出"))
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+
+            with self._pending_lock:
+                future = self._pending.pop(job_id, None)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(Exception(f"Embedding 工作进程 {worker_no} 向量化失败: {error}"))
+            else:
+                future.set_result(value)
+
+    def _fail_all(self, error: Exception):
+        with self._pending_lock:
+            self._error = error
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.set_exception(error)
+
+    def _submit(self, shm_name: Optional[str], rows: List[int], texts: List[str]) -> Future:
+        future = Future()
+        with self._pending_lock:
+            if self._error is not None:
+                raise self._error
+            if not self._finalizer.alive:
+                raise Exception("Embedding 工作进程已关闭")
+            job_id = next(self._job_ids)
+            self._pending[job_id] = future
+        self._tasks.put((job_id, shm_name, rows, texts))
+        return future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        多进程向量化
+
+        参数:
+            texts: 文本列表
+
+        返回:
+            向量列表（与输入顺序一致）
+
+        异常:
+            Exception: 工作进程向量化失败或异常退出
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        # 长度接近的文本分到同一任务，各进程内补齐的 token 最少
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        job_size = max(1, min(
+            math.ceil(len(texts) / self.workers),
+            Config.LOCAL_EMBEDDING_BATCH_SIZE * self.BATCHES_PER_JOB
+        ))
+
+        shm = shared_memory.SharedMemory(create=True, size=len(texts) * self.dim * 4)
+        try:
+            futures = [
+                self._submit(shm.name, rows, [texts[i] for i in rows])
+                for rows in (order[start:start + job_size] for start in range(0, len(order), job_size))
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                # 等待已分发的任务结束后再释放共享内存
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+                raise
+
+            matrix = np.ndarray((len(texts), self.dim), dtype=np.float32, buffer=shm.buf)
+            vectors = matrix.tolist()
+            del matrix
+            return vectors
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def embed_query(self, text: str) -> List[float]:
+        """向量化查询（由任一空闲进程处理）"""
+        return self._submit(None, [0], [text]).result()
+
+    def close(self):
+        """关闭工作进程（尚未完成的任务失败）"""
+        self._finalizer()
+        if hasattr(self, "_pending"):
+            self._fail_all(Exception("Embedding 工作进程已关闭"))
+
+
+class IngestPoolEmbeddings(Embeddings):
+    """
+    只在批量导入期间使用多进程的本地 Embedding
+
+    查询和导入之外的写入在当前进程中向量化（模型在第一次使用时加载，只做批量导入时不加载）；
+    ingest_pool() 期间启动 EmbeddingPool，文档块交给工作进程，最外层退出时关闭。
+    对话和 HTTP 服务平时不占用工作进程。
+    """
+
+    def __init__(self, workers: int = None, factory: Optional[Callable[[], Embeddings]] = None):
+        """
+        参数:
+            workers: 工作进程数（默认读取 Config.EMBEDDING_WORKERS）
+            factory: 创建模型的函数（当前进程和工作进程共用，默认 create_local_embeddings）
+        """
+        self.workers = workers or Config.EMBEDDING_WORKERS
+        self.factory = factory
+        self._local = None
+        self._local_lock = threading.Lock()
+        self._pool = None
+        self._pool_users = 0
+        self._pool_lock = threading.Lock()
+
+    def _local_embeddings(self) -> Embeddings:
+        """当前进程中的模型（第一次使用时加载）"""
+        with self._local_lock:
+            if self._local is None:
+                factory = self.factory
+                if factory is None:
+                    from .local_embeddings import create_local_embeddings
+
+                    factory = create_local_embeddings
+                self._local = factory()
+            return self._local
+
+    @contextmanager
+    def ingest_pool(self):
+        """
+        批量导入期间启动工作进程（可以嵌套，多个导入共用，最外层退出时关闭）
+
+        异常:
+            Exception: 工作进程加载模型失败
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = EmbeddingPool(self.workers, factory=self.factory)
+            self._pool_users += 1
+        try:
+            yield
+        finally:
+            with self._pool_lock:
+                self._pool_users -= 1
+                if not self._pool_users:
+                    self._pool.close()
+                    self._pool = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """向量化文档块（导入期间由工作进程处理，否则在当前进程中处理）"""
+        pool = self._pool
+        if pool is not None:
+            return pool.embed_documents(texts)
+        return self._local_embeddings().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """向量化查询（始终在当前进程中处理，不等待导入任务）"""
+        return self._local_embeddings().embed_query(text)
+
+    def close(self):
+        """关闭工作进程（如果正在导入，尚未完成的任务失败）"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+                self._pool_users = 0
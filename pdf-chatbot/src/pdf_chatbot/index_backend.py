@@ -0,0 +1,864 @@
+"""向量索引后端模块（Chroma 数据库 / 进程内 NumPy + HNSW 索引）"""
+import os
+import json
+import uuid
+import itertools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain.embeddings.base import Embeddings
+
+from .config import Config
+from .quantization import ProductQuantizer, recall_at_k
+from .search_filter import SearchFilter
+
+
+class VectorIndex:
+    """
+    向量索引后端接口
+
+    VectorStoreManager 只通过这些方法访问向量索引，更换后端不影响导入和检索流程。
+    距离统一为 L2 距离的平方（越小越相似），与 Chroma 默认的距离一致。
+    """
+
+    # 后端名称（用于日志）
+    name = ""
+
+    def count(self) -> int:
+        """文档块数量"""
+        raise NotImplementedError
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """
+        向量化并写入文档块（已存在的 ID 会被覆盖）
+
+        参数:
+            documents: 文档块列表
+            ids: 文档块 ID（默认随机生成）
+
+        返回:
+            写入的文档块 ID
+        """
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        """删除文档块（不存在的 ID 忽略）"""
+        raise NotImplementedError
+
+    def get_ids(self, where: dict) -> List[str]:
+        """
+        按 metadata 精确匹配查询文档块 ID
+
+        参数:
+            where: 条件字典，如 {"source": "a.pdf"}
+
+        返回:
+            满足所有条件的文档块 ID
+        """
+        raise NotImplementedError
+
+    def get_documents(self, limit: int, offset: int = 0) -> List[Document]:
+        """分页读取文档块（用于重建 BM25 索引）"""
+        raise NotImplementedError
+
+    def search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 3,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        按向量检索
+
+        参数:
+            embedding: 查询向量
+            k: 返回结果数量
+            search_filter: 过滤条件（在索引内执行，只在满足条件的文档块中检索）
+
+        返回:
+            (Document, 距离) 元组列表，按距离从小到大排序
+        """
+        raise NotImplementedError
+
+    def persist(self):
+        """保存到磁盘"""
+        raise NotImplementedError
+
+    def close(self):
+        """保存并释放内存和文件句柄（关闭后不能再使用）"""
+        raise NotImplementedError
+
+
+class ChromaIndex(VectorIndex):
+    """Chroma 向量数据库后端（通过公开的客户端接口访问集合）"""
+
+    name = "chroma"
+
+    # LangChain 默认的集合名称（与旧版本创建的数据库兼容）
+    COLLECTION_NAME = "langchain"
+
+    def __init__(self, persist_dir: str, embeddings: Embeddings):
+        """
+        打开（或创建）Chroma 数据库
+
+        参数:
+            persist_dir: 数据库目录
+            embeddings: Embedding 模型
+        """
+        import chromadb
+        from langchain.vectorstores import Chroma
+
+        self.client = chromadb.PersistentClient(path=persist_dir)
+        self.store = Chroma(
+            client=self.client,
+            collection_name=self.COLLECTION_NAME,
+            embedding_function=embeddings,
+            persist_directory=persist_dir
+        )
+        self.collection = self.client.get_or_create_collection(self.COLLECTION_NAME)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        return self.store.add_documents(documents, ids=ids)
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.store.delete(ids=ids)
+
+    def get_ids(self, where: dict) -> List[str]:
+        return self.store.get(where=where, include=[])["ids"]
+
+    def get_documents(self, limit: int, offset: int = 0) -> List[Document]:
+        result = self.store.get(limit=limit, offset=offset, include=["documents", "metadatas"])
+        return [
+            Document(page_content=content, metadata=metadata or {})
+            for content, metadata in zip(result["documents"], result["metadatas"])
+        ]
+
+    def search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 3,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        where = search_filter.to_chroma_where() if search_filter else None
+        return self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=where)
+
+    def persist(self):
+        self.store.persist()
+
+    def close(self):
+        # chromadb 没有公开的关闭接口：只释放本对象持有的客户端和集合句柄，
+        # 同一目录的 System（SQLite 连接、HNSW 段）由 chromadb 缓存，再次打开时复用
+        self.store = None
+        self.collection = None
+        self.client = None
+
+
+class LocalVectorIndex(VectorIndex):
+    """
+    进程内向量索引
+
+    功能:
+        - 向量保存为 float32 矩阵文件，加载时内存映射（冷启动不读入全部向量）
+        - flat：矩阵乘法精确检索，适合小规模语料
+        - hnsw：HNSW 图近似检索（hnswlib），适合大规模语料，M / ef 可调，图结构持久化
+        - pq：乘积量化，内存中只保留每个向量 m 字节的编码（压缩 8-32 倍），
+              按 ADC 近似距离取候选，再用磁盘上的原始向量精排
+        - auto：文档块数量达到 hnsw_min_chunks 时使用 HNSW，否则精确检索
+        - 按来源 / 导入批次预建槽位倒排表、按槽位保存页码，过滤检索只计算满足条件的槽位
+        - 文档块内容和 metadata 追加写入 JSONL，检索结果按偏移读取；
+          来源 / 批次倒排表在第一次过滤检索或按条件查询 ID 时才从磁盘读入 metadata 构建
+        - 删除只做标记，标记过多时在保存时压缩
+
+    文件（保存在数据库目录中）:
+        local_index.json         文档块 ID、各文件已登记的长度
+        local_docs.jsonl         文档块内容和 metadata（每个槽位一行，只追加）
+        local_docs.offsets       各槽位在 local_docs.jsonl 中的起始偏移（uint64）
+        local_vectors.f32        向量矩阵（按槽位顺序）
+        local_hnsw.bin           HNSW 图
+        local_pq_codebooks.npy   PQ 各子空间中心
+        local_pq_codes.u8        PQ 编码（按槽位顺序）
+    """
+
+    name = "local"
+
+    FORMAT_VERSION = 2
+    META_FILENAME = "local_index.json"
+    DOCS_FILENAME = "local_docs.jsonl"
+    OFFSETS_FILENAME = "local_docs.offsets"
+    VECTORS_FILENAME = "local_vectors.f32"
+    HNSW_FILENAME = "local_hnsw.bin"
+    PQ_CODEBOOKS_FILENAME = "local_pq_codebooks.npy"
+    PQ_CODES_FILENAME = "local_pq_codes.u8"
+
+    # 已删除槽位超过该比例时压缩向量文件
+    COMPACT_RATIO = 0.3
+
+    # 过滤后的候选不超过该数量时直接精确计算（比带过滤条件遍历 HNSW 图更快）
+    FILTER_EXACT_LIMIT = 20000
+
+    def __init__(
+        self,
+        persist_dir: str,
+        embeddings: Embeddings,
+        index_type: str = "auto",
+        hnsw_min_chunks: int = 10000,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        pq_subvectors: int = 0,
+        pq_rerank: int = 100
+    ):
+        """
+        打开（或创建）进程内索引
+
+        参数:
+            persist_dir: 索引目录
+            embeddings: Embedding 模型
+            index_type: 索引类型（auto / flat / hnsw / pq）
+            hnsw_min_chunks: auto 模式下使用 HNSW 的最少文档块数量
+            m: HNSW 每个节点的连接数
+            ef_construction: HNSW 建图时的候选数量
+            ef_search: HNSW 查询时的候选数量
+            pq_subvectors: PQ 子空间数量（必须整除向量维度，0 表示每 8 维一个子空间）
+            pq_rerank: PQ 检索后用原始向量精排的候选数量（0 表示不精排，直接返回近似距离）
+
+        异常:
+            ValueError: 索引类型不支持
+            Exception: 索引文件损坏
+        """
+        if index_type not in ("auto", "flat", "hnsw", "pq"):
+            raise ValueError(f"不支持的索引类型: {index_type}（可选: auto / flat / hnsw / pq）")
+
+        self.persist_dir = persist_dir
+        self.embeddings = embeddings
+        self.index_type = index_type
+        self.hnsw_min_chunks = hnsw_min_chunks
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_subvectors = pq_subvectors
+        self.pq_rerank = pq_rerank
+
+        self._lock = threading.RLock()
+        self.dim = None
+        self._ids = []          # 槽位 -> 文档块 ID（已删除为 None）
+        self._offsets = np.zeros(0, dtype=np.uint64)  # 槽位 -> 在 local_docs.jsonl 中的偏移
+        self._docs_size = 0     # local_docs.jsonl 已写入的长度
+        self._docs_file = None  # 读取文档块的文件句柄（第一次读取时打开）
+        self._metadatas = []    # 槽位 -> metadata（从磁盘加载的索引在构建倒排表时才读入，之前为 None）
+        self._slots = {}        # 文档块 ID -> 槽位
+        self._vectors = None    # 向量矩阵（内存映射，只读）
+        self._norms = None      # 向量模长的平方（首次精确检索时计算）
+        self._alive = np.zeros(0, dtype=bool)
+        self._source_slots = {}  # 来源 -> 槽位列表
+        self._batch_slots = {}   # 导入批次 -> 槽位列表
+        self._pages = np.zeros(0, dtype=np.float64)      # 槽位 -> 起始页码（没有页码为 nan）
+        self._page_ends = np.zeros(0, dtype=np.float64)  # 槽位 -> 结束页码（跨页文档块，没有 page_end 时等于起始页码）
+        self._hnsw = None
+        self._hnsw_slots = 0    # 磁盘上的 HNSW 图覆盖的槽位数量
+        self._hnsw_dirty = False
+        self._pq = None
+        self._pq_codes = None   # PQ 编码 (槽位数, m)
+        self._pq_slots = 0      # 磁盘上的 PQ 编码覆盖的槽位数量
+        self._pq_dirty = False
+        self._dirty = False
+
+        if os.path.exists(self._path(self.META_FILENAME)):
+            self._load()
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.persist_dir, filename)
+
+    def _load(self):
+        """加载文档块 ID 和偏移，向量文件内存映射（文档块内容和 metadata 留在磁盘上按需读取）"""
+        try:
+            with open(self._path(self.META_FILENAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            raise Exception(f"进程内索引文件损坏: {str(e)}")
+
+        self.dim = data.get("dim")
+        self._ids = data["ids"]
+        self._hnsw_slots = data.get("hnsw_slots", 0)
+        self._pq_slots = data.get("pq_slots", 0)
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._alive = np.array([chunk_id is not None for chunk_id in self._ids], dtype=bool)
+
+        # 上次写入后未保存元数据时，文件末尾会多出没有登记的内容，截掉
+        self._truncate(self.VECTORS_FILENAME, len(self._ids) * (self.dim or 0) * 4)
+        if "contents" in data:
+            # 旧格式（内容和 metadata 保存在 local_index.json 中）：转存到 local_docs.jsonl
+            self._truncate(self.DOCS_FILENAME, 0)
+            self._truncate(self.OFFSETS_FILENAME, 0)
+            self._append_records(data["contents"], data["metadatas"])
+            self._metadatas = data["metadatas"]
+            self._rebuild_metadata_index()
+            self._dirty = True
+        else:
+            self._docs_size = data.get("docs_size", 0)
+            self._truncate(self.DOCS_FILENAME, self._docs_size)
+            self._truncate(self.OFFSETS_FILENAME, len(self._ids) * 8)
+            self._offsets = np.fromfile(self._path(self.OFFSETS_FILENAME), dtype=np.uint64)
+            self._metadatas = None
+        self._map_vectors()
+
+    def _truncate(self, filename: str, expected: int):
+        """把文件截到已登记的长度，文件比登记的短时报错"""
+        path = self._path(filename)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < expected:
+            raise Exception(f"进程内索引文件 {filename} 不完整，请重新导入文档")
+        if size > expected:
+            with open(path, "r+b") as f:
+                f.truncate(expected)
+
+    def _append_records(self, contents: List[str], metadatas: List[dict]):
+        """把文档块内容和 metadata 追加到 local_docs.jsonl，并记录各自的偏移（需持有锁）"""
+        if not contents:
+            return
+        lines = [
+            (json.dumps({"content": content, "metadata": metadata}, ensure_ascii=False) + "\n").encode("utf-8")
+            for content, metadata in zip(contents, metadatas)
+        ]
+        offsets = np.cumsum([self._docs_size] + [len(line) for line in lines[:-1]]).astype(np.uint64)
+
+        with open(self._path(self.DOCS_FILENAME), "ab") as f:
+            f.write(b"".join(lines))
+        with open(self._path(self.OFFSETS_FILENAME), "ab") as f:
+            f.write(offsets.tobytes())
+        self._offsets = np.concatenate([self._offsets, offsets])
+        self._docs_size += sum(len(line) for line in lines)
+
+    def _read_record(self, slot: int) -> dict:
+        """按偏移读取一个槽位的内容和 metadata（需持有锁）"""
+        if self._docs_file is None:
+            self._docs_file = open(self._path(self.DOCS_FILENAME), "rb")
+        self._docs_file.seek(int(self._offsets[slot]))
+        return json.loads(self._docs_file.readline())
+
+    def _close_docs_file(self):
+        if self._docs_file is not None:
+            self._docs_file.close()
+            self._docs_file = None
+
+    def _ensure_metadata(self):
+        """第一次用到倒排表时顺序读入全部 metadata 并构建（需持有锁）"""
+        if self._metadatas is not None:
+            return
+        metadatas = []
+        if self._ids:
+            with open(self._path(self.DOCS_FILENAME), "rb") as f:
+                for chunk_id, line in zip(self._ids, itertools.islice(f, len(self._ids))):
+                    metadatas.append(json.loads(line)["metadata"] if chunk_id is not None else None)
+        self._metadatas = metadatas
+        self._rebuild_metadata_index()
+
+    def _index_metadata(self, start: int):
+        """把 start 之后的槽位加入来源 / 批次倒排表和页码数组"""
+        pages = np.full(len(self._ids) - start, np.nan)
+        page_ends = np.full(len(self._ids) - start, np.nan)
+        for slot in range(start, len(self._ids)):
+            metadata = self._metadatas[slot]
+            if metadata is None:
+                continue
+            self._source_slots.setdefault(str(metadata.get("source", "")), []).append(slot)
+            if "batch_id" in metadata:
+                self._batch_slots.setdefault(str(metadata["batch_id"]), []).append(slot)
+            if isinstance(metadata.get("page"), int):
+                pages[slot - start] = metadata["page"]
+                page_end = metadata.get("page_end")
+                page_ends[slot - start] = page_end if isinstance(page_end, int) else metadata["page"]
+        self._pages = np.concatenate([self._pages[:start], pages])
+        self._page_ends = np.concatenate([self._page_ends[:start], page_ends])
+
+    def _rebuild_metadata_index(self):
+        """重建来源 / 批次倒排表和页码数组"""
+        self._source_slots = {}
+        self._batch_slots = {}
+        self._pages = np.zeros(0, dtype=np.float64)
+        self._page_ends = np.zeros(0, dtype=np.float64)
+        self._index_metadata(0)
+
+    def _map_vectors(self):
+        """重新内存映射向量文件"""
+        rows = len(self._ids)
+        if not rows:
+            self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+            return
+        self._vectors = np.memmap(
+            self._path(self.VECTORS_FILENAME), dtype=np.float32, mode="r", shape=(rows, self.dim)
+        )
+
+    def count(self) -> int:
+        return len(self._slots)
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        if not documents:
+            return []
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in documents]
+
+        vectors = np.asarray(
+            self.embeddings.embed_documents([doc.page_content for doc in documents]),
+            dtype=np.float32
+        )
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: 索引为 {self.dim}，新向量为 {vectors.shape[1]}")
+
+            # 覆盖已存在的 ID
+            self.delete([chunk_id for chunk_id in ids if chunk_id in self._slots])
+
+            start = len(self._ids)
+            os.makedirs(self.persist_dir, exist_ok=True)
+            with open(self._path(self.VECTORS_FILENAME), "ab") as f:
+                f.write(vectors.tobytes())
+            metadatas = [dict(doc.metadata) for doc in documents]
+            self._append_records([doc.page_content for doc in documents], metadatas)
+
+            for offset, chunk_id in enumerate(ids):
+                self._slots[chunk_id] = start + offset
+                self._ids.append(chunk_id)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            # 倒排表尚未构建时不必读入，构建时会从磁盘读到这些 metadata
+            if self._metadatas is not None:
+                self._metadatas.extend(metadatas)
+                self._index_metadata(start)
+            if self._norms is not None:
+                self._norms = np.concatenate([self._norms, np.einsum("ij,ij->i", vectors, vectors)])
+            self._map_vectors()
+
+            if self._hnsw is not None:
+                if self._hnsw.get_max_elements() < len(self._ids):
+                    self._hnsw.resize_index(max(len(self._ids), self._hnsw.get_max_elements() * 2))
+                self._hnsw.add_items(vectors, np.arange(start, start + len(ids)))
+                self._hnsw_dirty = True
+
+            # 已训练的 PQ 直接编码新向量（不重新训练中心）
+            if self._pq is not None:
+                self._pq_codes = np.concatenate([self._pq_codes, self._pq.encode(vectors)])
+                self._pq_dirty = True
+
+            self._dirty = True
+        return ids
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for chunk_id in ids:
+                slot = self._slots.pop(chunk_id, None)
+                if slot is None:
+                    continue
+                self._ids[slot] = None
+                if self._metadatas is not None:
+                    self._metadatas[slot] = None
+                self._alive[slot] = False
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(slot)
+                    self._hnsw_dirty = True
+                self._dirty = True
+
+    def get_ids(self, where: dict) -> List[str]:
+        with self._lock:
+            self._ensure_metadata()
+            if set(where) == {"source"}:
+                return [
+                    self._ids[slot] for slot in self._source_slots.get(str(where["source"]), [])
+                    if self._alive[slot]
+                ]
+            return [
+                chunk_id for chunk_id, slot in self._slots.items()
+                if all(self._metadatas[slot].get(key) == value for key, value in where.items())
+            ]
+
+    def get_documents(self, limit: int, offset: int = 0) -> List[Document]:
+        with self._lock:
+            slots = sorted(self._slots.values())[offset:offset + limit]
+            return [self._document(slot) for slot in slots]
+
+    def _document(self, slot: int) -> Document:
+        record = self._read_record(slot)
+        return Document(page_content=record["content"], metadata=record["metadata"])
+
+    def _use_hnsw(self) -> bool:
+        """当前是否使用 HNSW 检索"""
+        if self.index_type == "auto":
+            return len(self._slots) >= self.hnsw_min_chunks
+        return self.index_type == "hnsw"
+
+    def _ensure_hnsw(self):
+        """加载或构建 HNSW 图（需持有锁）"""
+        if self._hnsw is not None:
+            return self._hnsw
+
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("使用 HNSW 索引需要先安装: pip install chroma-hnswlib")
+
+        index = hnswlib.Index(space="l2", dim=self.dim)
+        path = self._path(self.HNSW_FILENAME)
+
+        # 磁盘上的图与当前槽位一致时直接加载，否则重建
+        if os.path.exists(path) and self._hnsw_slots == len(self._ids):
+            index.load_index(path, max_elements=max(len(self._ids), 1))
+            # 图未加载期间的删除只记录在 _alive 中，加载后补标记
+            for slot in np.flatnonzero(~self._alive):
+                try:
+                    index.mark_deleted(int(slot))
+                except RuntimeError:
+                    # 已标记删除，或构建图时就已删除（不在图中）
+                    pass
+            index.set_ef(self.ef_search)
+            self._hnsw = index
+            return index
+
+        print(f"🔧 正在构建 HNSW 索引（{len(self._slots)} 个文档块，M={self.m}）...")
+        index.init_index(
+            max_elements=max(len(self._ids), 1),
+            ef_construction=self.ef_construction,
+            M=self.m
+        )
+        live = np.flatnonzero(self._alive)
+        if len(live):
+            index.add_items(np.asarray(self._vectors[live]), live)
+        index.set_ef(self.ef_search)
+        self._hnsw = index
+        self._hnsw_dirty = True
+        return index
+
+    def _ensure_pq(self) -> ProductQuantizer:
+        """加载或训练 PQ 量化器并编码全部向量（需持有锁）"""
+        if self._pq is not None:
+            return self._pq
+
+        codebooks_path = self._path(self.PQ_CODEBOOKS_FILENAME)
+        codes_path = self._path(self.PQ_CODES_FILENAME)
+
+        # 磁盘上的编码与当前槽位一致时直接加载，否则重新训练
+        if os.path.exists(codebooks_path) and os.path.exists(codes_path) and self._pq_slots == len(self._ids):
+            pq = ProductQuantizer.load(codebooks_path)
+            if pq.dim == self.dim and self.pq_subvectors in (0, pq.m):
+                self._pq_codes = np.fromfile(codes_path, dtype=np.uint8).reshape(-1, pq.m)
+                self._pq = pq
+                return pq
+
+        pq = ProductQuantizer(self.dim, self.pq_subvectors)
+        print(f"🔧 正在训练 PQ 量化（{len(self._slots)} 个文档块，{pq.m} 个子空间，"
+              f"压缩 {pq.compression_ratio:.0f} 倍）...")
+        live = np.flatnonzero(self._alive)
+        pq.train(np.asarray(self._vectors[live]))
+
+        codes = np.zeros((len(self._ids), pq.m), dtype=np.uint8)
+        for start in range(0, len(self._ids), ProductQuantizer.CHUNK_SIZE):
+            end = start + ProductQuantizer.CHUNK_SIZE
+            codes[start:end] = pq.encode(np.asarray(self._vectors[start:end]))
+        self._pq_codes = codes
+        self._pq = pq
+        self._pq_dirty = True
+        return pq
+
+    @staticmethod
+    def _smallest(distances: np.ndarray, k: int) -> np.ndarray:
+        """距离最小的 k 个下标（按距离排序）"""
+        slots = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        return slots[np.argsort(distances[slots])]
+
+    def _exact_distances(self, query: np.ndarray) -> np.ndarray:
+        """查询向量与所有槽位的精确距离（已删除的槽位为 inf，需持有锁）"""
+        if self._norms is None:
+            self._norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+        # ‖x - q‖² = ‖x‖² - 2x·q + ‖q‖²
+        distances = self._norms - 2 * (self._vectors @ query) + float(query @ query)
+        distances[~self._alive] = np.inf
+        return distances
+
+    @staticmethod
+    def _union(slot_lists: Dict[str, List[int]], keys: List[str]) -> np.ndarray:
+        """多个键对应槽位的并集"""
+        arrays = [np.asarray(slot_lists.get(key, []), dtype=np.int64) for key in keys]
+        return np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, dtype=np.int64)
+
+    def _filter_candidates(self, search_filter: SearchFilter) -> np.ndarray:
+        """按过滤条件从预建的倒排表和页码数组中取出候选槽位（需持有锁）"""
+        self._ensure_metadata()
+        candidates = None
+        if search_filter.sources:
+            candidates = self._union(self._source_slots, search_filter.sources)
+        if search_filter.batch_ids:
+            batch = self._union(self._batch_slots, search_filter.batch_ids)
+            candidates = batch if candidates is None else np.intersect1d(candidates, batch, assume_unique=True)
+
+        if candidates is None:
+            candidates = np.flatnonzero(self._alive)
+        else:
+            candidates = candidates[self._alive[candidates]]
+
+        if search_filter.has_page_range():
+            # 文档块的页码区间 [page, page_end] 与过滤范围有重叠即满足
+            pages = self._pages[candidates]
+            mask = ~np.isnan(pages)
+            if search_filter.page_min is not None:
+                mask &= self._page_ends[candidates] >= search_filter.page_min
+            if search_filter.page_max is not None:
+                mask &= pages <= search_filter.page_max
+            candidates = candidates[mask]
+
+        return candidates
+
+    def _rerank_exact(self, query: np.ndarray, slots: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """只读取候选槽位的原始向量（内存映射，按需从磁盘读入）计算精确距离，取前 k 个"""
+        slots = np.sort(slots)
+        exact = ((np.asarray(self._vectors[slots]) - query) ** 2).sum(axis=1)
+        order = self._smallest(exact, min(k, len(slots)))
+        return slots[order], exact[order]
+
+    def _search_slots(
+        self,
+        query: np.ndarray,
+        k: int,
+        candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按当前索引类型检索，返回 (槽位, 距离)（需持有锁）
+
+        candidates 为过滤后的候选槽位（None 表示不过滤）：
+            - pq：只对候选的编码计算 ADC 距离
+            - hnsw：候选较少时直接精确计算，否则带过滤条件遍历 HNSW 图
+            - flat：只读取候选的向量精确计算
+        """
+        if self.index_type == "pq":
+            pq = self._ensure_pq()
+            if candidates is None:
+                distances = pq.adc(query, self._pq_codes)
+                distances[~self._alive] = np.inf
+                pool = np.arange(len(distances))
+            else:
+                distances = pq.adc(query, self._pq_codes[candidates])
+                pool = candidates
+            top = self._smallest(distances, min(max(k, self.pq_rerank), len(pool)))
+            if self.pq_rerank:
+                return self._rerank_exact(query, pool[top], k)
+            top = top[:k]
+            return pool[top], distances[top]
+
+        if candidates is not None and (not self._use_hnsw() or len(candidates) <= self.FILTER_EXACT_LIMIT):
+            return self._rerank_exact(query, candidates, k)
+
+        if self._use_hnsw():
+            index = self._ensure_hnsw()
+            index.set_ef(max(self.ef_search, k))
+            if candidates is None:
+                labels, distances = index.knn_query(query, k=k)
+            else:
+                allowed = np.zeros(len(self._ids), dtype=bool)
+                allowed[candidates] = True
+                labels, distances = index.knn_query(query, k=k, filter=lambda label: allowed[label])
+            labels = labels[0].astype(np.int64)
+            # 防御：图中残留的已删除槽位不返回
+            live = self._alive[labels]
+            return labels[live], distances[0][live]
+
+        distances = self._exact_distances(query)
+        slots = self._smallest(distances, k)
+        return slots, distances[slots]
+
+    def search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 3,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        query = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            candidates = None
+            if search_filter is not None and not search_filter.is_empty():
+                candidates = self._filter_candidates(search_filter)
+                k = min(k, len(candidates))
+            else:
+                k = min(k, len(self._slots))
+            if k <= 0:
+                return []
+
+            slots, distances = self._search_slots(query, k, candidates)
+            return [
+                (self._document(int(slot)), max(float(distance), 0.0))
+                for slot, distance in zip(slots, distances)
+            ]
+
+    def measure_recall(self, queries: List[List[float]], k: int = 10) -> float:
+        """
+        测量当前索引的召回率（以精确检索结果为准）
+
+        参数:
+            queries: 查询向量列表
+            k: 每个查询的结果数量
+
+        返回:
+            recall@k（0-1，flat 索引恒为 1）
+        """
+        approx, exact = [], []
+        with self._lock:
+            k = min(k, len(self._slots))
+            if k <= 0:
+                return 0.0
+            for query in queries:
+                query = np.asarray(query, dtype=np.float32)
+                approx.append(self._search_slots(query, k)[0].tolist())
+                exact.append(self._smallest(self._exact_distances(query), k).tolist())
+        return recall_at_k(approx, exact)
+
+    def _compact(self):
+        """去掉已删除的槽位，重写向量文件和文档块文件（需持有锁）"""
+        live = np.flatnonzero(self._alive)
+        vectors = np.asarray(self._vectors[live]) if len(live) else np.zeros((0, self.dim), dtype=np.float32)
+
+        path = self._path(self.VECTORS_FILENAME)
+        self._vectors = None
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(vectors.tobytes())
+        os.replace(tmp_path, path)
+
+        # 按槽位顺序复制存活的文档块行，重新计算偏移
+        path = self._path(self.DOCS_FILENAME)
+        self._close_docs_file()
+        offsets = np.zeros(len(live), dtype=np.uint64)
+        size = 0
+        with open(path, "rb") as src, open(f"{path}.tmp", "wb") as dst:
+            for i, slot in enumerate(live):
+                src.seek(int(self._offsets[slot]))
+                line = src.readline()
+                dst.write(line)
+                offsets[i] = size
+                size += len(line)
+        os.replace(f"{path}.tmp", path)
+        path = self._path(self.OFFSETS_FILENAME)
+        offsets.tofile(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self._offsets = offsets
+        self._docs_size = size
+
+        self._ids = [self._ids[slot] for slot in live]
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._norms = None
+        if self._metadatas is not None:
+            self._metadatas = [self._metadatas[slot] for slot in live]
+            self._rebuild_metadata_index()
+        self._map_vectors()
+
+        # PQ 中心不变，编码按槽位重新排列
+        if self._pq is not None:
+            self._pq_codes = self._pq_codes[live]
+            self._pq_dirty = True
+
+        # 槽位变化后 HNSW 图需要重建（正在使用时立即重建，随本次保存一起写入）
+        rebuild = self._hnsw is not None
+        self._hnsw = None
+        self._hnsw_slots = 0
+        if rebuild and self._slots:
+            self._ensure_hnsw()
+
+    def persist(self):
+        """
+        保存到磁盘（先写临时文件再替换，避免写到一半时损坏）
+
+        文档块内容和 metadata 在写入时已追加到 local_docs.jsonl，
+        这里只重写文档块 ID 和各文件已登记的长度。
+        """
+        with self._lock:
+            if not self._dirty and not self._hnsw_dirty and not self._pq_dirty:
+                return
+
+            deleted = len(self._ids) - len(self._slots)
+            if self._ids and deleted / len(self._ids) > self.COMPACT_RATIO:
+                self._compact()
+
+            os.makedirs(self.persist_dir, exist_ok=True)
+            if self._hnsw is not None and self._hnsw_dirty:
+                path = self._path(self.HNSW_FILENAME)
+                self._hnsw.save_index(f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+                self._hnsw_slots = len(self._ids)
+                self._hnsw_dirty = False
+
+            if self._pq is not None and self._pq_dirty:
+                path = self._path(self.PQ_CODEBOOKS_FILENAME)
+                with open(f"{path}.tmp", "wb") as f:
+                    self._pq.save(f)
+                os.replace(f"{path}.tmp", path)
+                path = self._path(self.PQ_CODES_FILENAME)
+                self._pq_codes.tofile(f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+                self._pq_slots = len(self._ids)
+                self._pq_dirty = False
+
+            data = {
+                "format": self.FORMAT_VERSION,
+                "dim": self.dim,
+                "hnsw_slots": self._hnsw_slots,
+                "pq_slots": self._pq_slots,
+                "docs_size": self._docs_size,
+                "ids": self._ids,
+            }
+            path = self._path(self.META_FILENAME)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(f"{path}.tmp", path)
+            self._dirty = False
+
+    def close(self):
+        with self._lock:
+            self.persist()
+            # 释放内存映射、HNSW 图、PQ 编码和 metadata 倒排表，关闭文档块文件
+            self._close_docs_file()
+            self._vectors = None
+            self._norms = None
+            self._hnsw = None
+            self._pq = None
+            self._pq_codes = None
+            self._ids, self._metadatas = [], []
+            self._offsets = np.zeros(0, dtype=np.uint64)
+            self._slots = {}
+            self._source_slots, self._batch_slots = {}, {}
+
+
+def create_vector_index(backend: str, persist_dir: str, embeddings: Embeddings) -> VectorIndex:
+    """
+    按配置创建向量索引后端
+
+    参数:
+        backend: 后端名称（chroma / local）
+        persist_dir: 索引目录
+        embeddings: Embedding 模型
+
+    返回:
+        向量索引后端
+
+    异常:
+        ValueError: 后端名称不支持
+    """
+    if backend == "chroma":
+        return ChromaIndex(persist_dir, embeddings)
+    if backend == "local":
+        return LocalVectorIndex(
+            persist_dir,
+            embeddings,
+            index_type=Config.LOCAL_INDEX_TYPE,
+            hnsw_min_chunks=Config.HNSW_MIN_CHUNKS,
+            m=Config.HNSW_M,
+            ef_construction=Config.HNSW_EF_CONSTRUCTION,
+            ef_search=Config.HNSW_EF_SEARCH,
+            pq_subvectors=Config.PQ_SUBVECTORS,
+            pq_rerank=Config.PQ_RERANK
+        )
+    raise ValueError(f"不支持的向量索引后端: {backend}（可选: chroma / local）")
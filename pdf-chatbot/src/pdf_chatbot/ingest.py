@@ -0,0 +1,121 @@
+"""批量导入模块（目录 / glob 多文件导入）"""
+import os
+from typing import Dict
+
+from .config import Config
+from .document_loader import DocumentProcessor, find_pdfs
+from .vector_store import VectorStoreManager, new_batch_id
+
+
+def ingest_pdf_stream(
+    file_path: str,
+    vector_store_manager: VectorStoreManager,
+    processor: DocumentProcessor = None,
+    batch_size: int = None,
+    batch_id: str = None
+) -> int:
+    """
+    流式导入单个 PDF（逐页解析、逐批向量化）
+
+    内存占用只与批大小有关，适合超大 PDF（如数百 MB 的扫描手册）。
+
+    参数:
+        file_path: PDF 文件路径
+        vector_store_manager: 向量存储管理器
+        processor: 文档处理器（默认新建）
+        batch_size: 每批文档块数量（默认读取 Config.INGEST_BATCH_SIZE）
+        batch_id: 导入批次（写入 metadata，默认新建）
+
+    返回:
+        导入的文档块数量
+    """
+    processor = processor or DocumentProcessor()
+    batches = processor.iter_chunk_batches(file_path, batch_size=batch_size)
+    batch_id = batch_id or new_batch_id()
+
+    if Config.INCREMENTAL_INDEX:
+        stats = vector_store_manager.index_batches(batches, batch_id=batch_id)
+        return stats["added"] + stats["skipped"]
+
+    chunk_count = 0
+    for batch in batches:
+        vector_store_manager.create_vectorstore(batch, incremental=False, batch_id=batch_id)
+        chunk_count += len(batch)
+    return chunk_count
+
+
+def ingest_pdfs(
+    path: str,
+    vector_store_manager: VectorStoreManager,
+    processor: DocumentProcessor = None,
+    max_workers: int = None
+) -> Dict[str, object]:
+    """
+    批量导入 PDF 到向量数据库
+
+    流程:
+        1. 查找目录或 glob 模式下的所有 PDF
+        2. 在进程池中并行解析和切分
+        3. 每个文件完成后立即写入向量数据库（边解析边写入），向量索引和 BM25 索引在全部导入后保存一次；
+           EMBEDDING_WORKERS > 0 时导入期间启动多进程向量化，结束后关闭
+        4. 超过 Config.STREAMING_THRESHOLD_MB 的大文件在当前进程中流式导入
+
+    同一次调用导入的文档块使用同一个批次 ID（metadata["batch_id"]），
+    之后可以按批次过滤检索范围。
+
+    参数:
+        path: 单个 PDF 文件、目录或 glob 模式
+        vector_store_manager: 向量存储管理器
+        processor: 文档处理器（默认新建）
+        max_workers: 解析进程数（默认读取 Config.INGEST_WORKERS）
+
+    返回:
+        统计字典 {"files": 文件数, "succeeded": 成功数, "failed": 失败数, "chunks": 文档块数,
+                  "batch_id": 导入批次}
+
+    异常:
+        FileNotFoundError: 未找到任何 PDF 文件
+    """
+    pdf_files = find_pdfs(path)
+    processor = processor or DocumentProcessor()
+
+    print(f"📚 找到 {len(pdf_files)} 个 PDF 文件")
+
+    batch_id = new_batch_id()
+    stats = {"files": len(pdf_files), "succeeded": 0, "failed": 0, "chunks": 0, "batch_id": batch_id}
+
+    # 大文件不经过进程池（避免整份文档块列表在进程间传递）
+    threshold = Config.STREAMING_THRESHOLD_MB * 1024 * 1024
+    large_files = [p for p in pdf_files if os.path.getsize(p) > threshold]
+    small_files = [p for p in pdf_files if os.path.getsize(p) <= threshold]
+
+    # 导入期间使用多进程向量化（EMBEDDING_WORKERS > 0 时），所有文件导入完后只保存一次向量索引和 BM25 索引
+    with vector_store_manager.embedding_pool(), vector_store_manager.deferred_save():
+        for file_path, chunks in processor.iter_process_pdfs(small_files, max_workers=max_workers):
+            try:
+                vector_store_manager.create_vectorstore(chunks, batch_id=batch_id)
+            except Exception as e:
+                print(f"❌ {file_path}: {str(e)}")
+                continue
+
+            stats["succeeded"] += 1
+            stats["chunks"] += len(chunks)
+            print(f"📥 [{stats['succeeded']}/{stats['files']}] 已导入: {file_path}")
+
+        for file_path in large_files:
+            try:
+                chunk_count = ingest_pdf_stream(file_path, vector_store_manager, processor, batch_id=batch_id)
+            except Exception as e:
+                print(f"❌ {file_path}: {str(e)}")
+                continue
+
+            stats["succeeded"] += 1
+            stats["chunks"] += chunk_count
+            print(f"📥 [{stats['succeeded']}/{stats['files']}] 已导入: {file_path}")
+
+    stats["failed"] = stats["files"] - stats["succeeded"]
+
+    print(f"✅ 批量导入完成：成功 {stats['succeeded']} 个文件，"
+          f"失败 {stats['failed']} 个，共 {stats['chunks']} 个文档块（批次: {batch_id}）")
+
+    return stats
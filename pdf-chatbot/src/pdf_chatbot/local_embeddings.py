@@ -0,0 +1,334 @@
+"""本地 Embedding 模块（PyTorch / ONNX Runtime 推理、启动预热、吞吐量与向量偏差检查）"""
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from .config import Config
+
+
+# 预热文本：长度接近一个典型文档块，让首个真实请求不再承担算子初始化和内存分配
+_WARMUP_TEXT = "这是一段用于预热向量模型的文本，长度接近一个典型的文档块。" * 8
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    ONNX Runtime 推理的 BERT 类 Embedding 模型（默认 bge-small-zh-v1.5）
+
+    模型目录由 optimum 导出：
+        optimum-cli export onnx --model BAAI/bge-small-zh-v1.5 --task feature-extraction <目录>
+    目录中需要 model.onnx 和 tokenizer.json。
+
+    与 HuggingFaceEmbeddings（sentence-transformers）的输出保持一致：
+    取 [CLS] 位置的隐藏状态（bge 的池化方式）并做 L2 归一化。
+
+    quantize=True 时使用动态 int8 量化的模型（model_int8.onnx，不存在时从 model.onnx 生成），
+    矩阵乘法权重量化为 int8，推理更快，向量与原模型有少量偏差（用 compare_backends 检查）。
+    """
+
+    MODEL_FILE = "model.onnx"
+    QUANTIZED_MODEL_FILE = "model_int8.onnx"
+    TOKENIZER_FILE = "tokenizer.json"
+
+    def __init__(
+        self,
+        model_dir: str,
+        batch_size: int = 32,
+        threads: int = 0,
+        quantize: bool = False,
+        max_length: int = 512
+    ):
+        """
+        参数:
+            model_dir: ONNX 模型目录
+            batch_size: 每批推理的文本数量
+            threads: 单次推理使用的线程数（intra-op，0 表示由 ONNX Runtime 按物理核数决定）
+            quantize: 是否使用动态 int8 量化模型
+            max_length: 最大 token 数（超出截断，与模型的位置编码长度一致）
+
+        异常:
+            Exception: 未安装 onnxruntime / tokenizers、模型文件不存在或加载失败
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise Exception(
+                "使用 ONNX Embedding 需要安装 onnxruntime 和 tokenizers\n"
+                "  pip install onnxruntime tokenizers"
+            )
+
+        self.model_dir = Path(model_dir)
+        self.batch_size = batch_size
+        self.threads = threads
+        self.quantize = quantize
+
+        model_path = self.model_dir / self.MODEL_FILE
+        tokenizer_path = self.model_dir / self.TOKENIZER_FILE
+        for path in (model_path, tokenizer_path):
+            if not path.exists():
+                raise Exception(
+                    f"ONNX 模型文件不存在: {path}\n"
+                    f"  请先导出模型: optimum-cli export onnx --model {Config.LOCAL_EMBEDDING_MODEL} "
+                    f"--task feature-extraction {self.model_dir}"
+                )
+
+        if quantize:
+            model_path = self._quantized_model(model_path)
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else None
+        if pad_token:
+            self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        else:
+            self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+
+        try:
+            self.session = ort.InferenceSession(
+                str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+            )
+        except Exception as e:
+            raise Exception(f"加载 ONNX 模型失败: {str(e)}")
+
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        self.output_name = self.session.get_outputs()[0].name
+
+    def _quantized_model(self, model_path: Path) -> Path:
+        """动态 int8 量化模型路径（不存在时生成，需要 onnx 包）"""
+        quantized_path = self.model_dir / self.QUANTIZED_MODEL_FILE
+        if quantized_path.exists():
+            return quantized_path
+
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise Exception(
+                "生成 int8 量化模型需要安装 onnx\n"
+                "  pip install onnx"
+            )
+
+        print(f"🔧 生成 int8 量化模型: {quantized_path}")
+        quantize_dynamic(str(model_path), str(quantized_path), weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """一批文本的归一化向量"""
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+
+        hidden = self.session.run([self.output_name], feeds)[0]
+        vectors = hidden[:, 0] if hidden.ndim == 3 else hidden
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量向量化
+
+        按长度排序后分批，同一批内长度接近，补齐（padding）的计算量最少；结果按原顺序返回。
+        """
+        if not texts:
+            return []
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            vectors = self._encode_batch([texts[i] for i in indices])
+            for i, vector in zip(indices, vectors):
+                results[i] = vector.tolist()
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def cache_model_name() -> str:
+    """
+    本地模型在 Embedding 缓存中的名称
+
+    量化模型和 ONNX 推理的向量与 PyTorch 原模型有少量偏差，按后端分开缓存，
+    切换后端后不会混用两种向量。
+    """
+    if Config.LOCAL_EMBEDDING_BACKEND == "onnx":
+        suffix = "onnx-int8" if Config.LOCAL_EMBEDDING_QUANTIZE else "onnx"
+        return f"{Config.LOCAL_EMBEDDING_MODEL}@{suffix}"
+    return Config.LOCAL_EMBEDDING_MODEL
+
+
+def create_local_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """
+    按配置创建本地 Embedding 模型
+
+    参数:
+        backend: torch / onnx（默认 Config.LOCAL_EMBEDDING_BACKEND）
+
+    返回:
+        Embedding 模型（Config.LOCAL_EMBEDDING_WARMUP 开启时已完成预热）
+
+    异常:
+        ValueError: 不支持的后端
+    """
+    backend = backend or Config.LOCAL_EMBEDDING_BACKEND
+
+    if backend == "onnx":
+        label = "ONNX Runtime int8" if Config.LOCAL_EMBEDDING_QUANTIZE else "ONNX Runtime"
+        print(f"🔧 使用本地 Embedding: {Config.LOCAL_EMBEDDING_MODEL}（{label}）")
+        embeddings = OnnxEmbeddings(
+            Config.LOCAL_EMBEDDING_ONNX_DIR,
+            batch_size=Config.LOCAL_EMBEDDING_BATCH_SIZE,
+            threads=Config.LOCAL_EMBEDDING_THREADS,
+            quantize=Config.LOCAL_EMBEDDING_QUANTIZE
+        )
+    elif backend == "torch":
+        from langchain.embeddings import HuggingFaceEmbeddings
+
+        if Config.LOCAL_EMBEDDING_THREADS > 0:
+            import torch
+
+            torch.set_num_threads(Config.LOCAL_EMBEDDING_THREADS)
+
+        print(f"🔧 使用本地 Embedding: {Config.LOCAL_EMBEDDING_MODEL}")
+        print("📥 首次使用会自动下载模型（约 100MB），请稍候...")
+        embeddings = HuggingFaceEmbeddings(
+            model_name=Config.LOCAL_EMBEDDING_MODEL,
+            model_kwargs={'device': 'cpu'},  # 使用 CPU（无需 GPU）
+            encode_kwargs={
+                'normalize_embeddings': True,  # 归一化向量
+                'batch_size': Config.LOCAL_EMBEDDING_BATCH_SIZE
+            }
+        )
+    else:
+        raise ValueError(f"不支持的本地 Embedding 后端: {backend}")
+
+    print("✅ 本地 Embedding 模型加载完成")
+
+    if Config.LOCAL_EMBEDDING_WARMUP:
+        elapsed = warm_up(embeddings)
+        print(f"🔥 Embedding 模型预热完成（{elapsed * 1000:.0f}ms）")
+    return embeddings
+
+
+def warm_up(embeddings: Embeddings, batch_size: Optional[int] = None) -> float:
+    """
+    预热：启动时跑一批推理
+
+    第一次推理要初始化算子、分配内存（ONNX Runtime 还要做图优化），
+    放在启动阶段，第一个用户请求不再多等这段时间。
+
+    参数:
+        embeddings: Embedding 模型
+        batch_size: 预热批大小（默认 Config.LOCAL_EMBEDDING_BATCH_SIZE）
+
+    返回:
+        预热耗时（秒）
+    """
+    batch_size = batch_size or Config.LOCAL_EMBEDDING_BATCH_SIZE
+    start = time.perf_counter()
+    embeddings.embed_documents([_WARMUP_TEXT] * batch_size)
+    embeddings.embed_query(_WARMUP_TEXT)
+    return time.perf_counter() - start
+
+
+def benchmark(embeddings: Embeddings, texts: List[str], rounds: int = 3) -> Dict[str, float]:
+    """
+    吞吐量测试（取多轮中最快的一轮，减少偶发抖动的影响）
+
+    参数:
+        embeddings: Embedding 模型（应已预热）
+        texts: 测试文本
+        rounds: 轮数
+
+    返回:
+        {"texts", "seconds", "texts_per_second"}
+    """
+    best = float("inf")
+    for _ in range(max(1, rounds)):
+        start = time.perf_counter()
+        embeddings.embed_documents(texts)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "texts": len(texts),
+        "seconds": best,
+        "texts_per_second": len(texts) / best if best > 0 else float("inf"),
+    }
+
+
+def embedding_drift(reference: List[List[float]], candidate: List[List[float]]) -> Dict[str, float]:
+    """
+    向量偏差：同一批文本在两个模型下向量的余弦相似度
+
+    参数:
+        reference: 基准向量（原模型）
+        candidate: 待比较向量（ONNX / 量化模型）
+
+    返回:
+        {"mean_similarity", "min_similarity", "max_drift"}（max_drift = 1 - 最小相似度）
+
+    异常:
+        ValueError: 两组向量的数量或维度不一致
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    if reference.shape != candidate.shape:
+        raise ValueError(f"向量形状不一致: {reference.shape} != {candidate.shape}")
+
+    reference = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    candidate = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    similarities = np.einsum("ij,ij->i", reference, candidate)
+    return {
+        "mean_similarity": float(similarities.mean()),
+        "min_similarity": float(similarities.min()),
+        "max_drift": float(1.0 - similarities.min()),
+    }
+
+
+def compare_backends(
+    reference: Embeddings,
+    candidate: Embeddings,
+    texts: List[str],
+    threshold: Optional[float] = None,
+    rounds: int = 3
+) -> Dict[str, object]:
+    """
+    对比两个 Embedding 模型的吞吐量和向量偏差
+
+    参数:
+        reference: 基准模型（PyTorch 原模型）
+        candidate: 待比较模型（ONNX / 量化模型）
+        texts: 测试文本（建议使用真实文档块）
+        threshold: 允许的最大偏差（1 - 余弦相似度，默认 Config.EMBEDDING_DRIFT_THRESHOLD）
+        rounds: 吞吐量测试轮数
+
+    返回:
+        {"reference", "candidate", "speedup", "drift", "threshold", "passed"}
+    """
+    threshold = Config.EMBEDDING_DRIFT_THRESHOLD if threshold is None else threshold
+
+    reference_stats = benchmark(reference, texts, rounds)
+    candidate_stats = benchmark(candidate, texts, rounds)
+    drift = embedding_drift(reference.embed_documents(texts), candidate.embed_documents(texts))
+
+    return {
+        "reference": reference_stats,
+        "candidate": candidate_stats,
+        "speedup": candidate_stats["texts_per_second"] / reference_stats["texts_per_second"],
+        "drift": drift,
+        "threshold": threshold,
+        "passed": drift["max_drift"] <= threshold,
+    }
@@ -1,23 +1,291 @@
 """命令行入口"""
 import os
 import sys
+import argparse
 
-from pdf_chatbot import DocumentProcessor, VectorStoreManager, QASystem
+# 只导入轻量模块；LangChain、向量数据库等依赖在解析参数后按需导入（--help 等命令秒开）
 from pdf_chatbot.config import Config
+from pdf_chatbot.search_filter import SearchFilter
 
 
-def main():
+def parse_filter_command(text: str):
+    """
+    解析命令行的过滤命令
+
+    格式: /filter source=a.pdf,b.pdf pages=3-10 batch=20240501-153000-a1b2c3
+          /filter clear（取消过滤）
+
+    参数:
+        text: /filter 之后的参数部分
+
+    返回:
+        过滤条件（取消过滤时返回 None）
+
+    异常:
+        ValueError: 参数格式错误
+    """
+    text = text.strip()
+    if not text or text.lower() == "clear":
+        return None
+
+    options = {}
+    for item in text.split():
+        key, sep, value = item.partition("=")
+        if not sep or not value:
+            raise ValueError(f"过滤参数格式错误: {item}（应为 key=value）")
+        key = key.lower()
+        if key == "source":
+            options["source"] = value.split(",")
+        elif key == "batch":
+            options["batch_id"] = value.split(",")
+        elif key == "pages":
+            # pages=5 表示单页，pages=3- / pages=-10 表示单侧范围
+            low, dash, high = value.partition("-")
+            high = high if dash else low
+            if low:
+                options["page_min"] = int(low)
+            if high:
+                options["page_max"] = int(high)
+        else:
+            raise ValueError(f"不支持的过滤参数: {key}（可用: source, pages, batch）")
+    return SearchFilter.from_dict(options)
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        prog="pdf_chatbot",
+        description="PDF 聊天机器人 - 基于 RAG 的文档问答系统"
+    )
+    parser.add_argument(
+        "--ingest",
+        metavar="PATH",
+        help="批量导入 PDF：单个文件、目录或 glob 模式（如 'docs/**/*.pdf'）"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="解析 PDF 的进程数（默认读取 INGEST_WORKERS）"
+    )
+    parser.add_argument(
+        "--no-chat",
+        action="store_true",
+        help="导入完成后直接退出，不进入问答环节"
+    )
+    parser.add_argument(
+        "--collection",
+        metavar="NAME",
+        default=None,
+        help="使用命名集合（导入和问答都在该集合中进行，默认使用 CHROMA_PERSIST_DIR）"
+    )
+    parser.add_argument(
+        "--benchmark-embeddings",
+        metavar="PDF",
+        help="用 PDF 的文档块对比本地 Embedding 的 torch 与 onnx 后端（吞吐量和向量偏差），然后退出"
+    )
+    parser.add_argument(
+        "--check-splitter",
+        metavar="PATH",
+        help="用 PDF（文件、目录或 glob）对比 native 切分器与 RecursiveCharacterTextSplitter 的切分结果和耗时，然后退出"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="以 HTTP 服务方式运行（导入、问答、历史和导出接口）"
+    )
+    parser.add_argument(
+        "--host",
+        default=None,
+        help="HTTP 服务监听地址（默认读取 SERVER_HOST）"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="HTTP 服务监听端口（默认读取 SERVER_PORT）"
+    )
+    return parser.parse_args(argv)
+
+
+def is_batch_path(path: str) -> bool:
+    """判断路径是否为目录或 glob 模式"""
+    return os.path.isdir(path) or any(ch in path for ch in "*?[")
+
+
+def run_batch_ingest(path: str, max_workers: int = None, collection: str = None):
+    """
+    批量导入 PDF
+
+    返回:
+        成功导入至少一个文件时返回 VectorStoreManager，否则返回 None
+    """
+    from pdf_chatbot import VectorStoreManager, ingest_pdfs
+
+    try:
+        vector_manager = VectorStoreManager(collection=collection)
+        stats = ingest_pdfs(path, vector_manager, max_workers=max_workers)
+    except Exception as e:
+        print(f"❌ {str(e)}")
+        return None
+
+    if not stats["succeeded"]:
+        print("❌ 没有成功导入任何文件")
+        return None
+
+    return vector_manager
+
+
+def run_embedding_benchmark(pdf_path: str, max_chunks: int = 256) -> bool:
+    """
+    对比本地 Embedding 的 torch（基准）与 onnx 后端
+
+    返回:
+        向量偏差是否在 EMBEDDING_DRIFT_THRESHOLD 以内
+    """
+    from pdf_chatbot import DocumentProcessor
+    from pdf_chatbot.local_embeddings import create_local_embeddings, compare_backends, warm_up
+
+    try:
+        texts = [doc.page_content for doc in DocumentProcessor().process_pdf(pdf_path)[:max_chunks]]
+        reference = create_local_embeddings("torch")
+        candidate = create_local_embeddings("onnx")
+    except Exception as e:
+        print(f"❌ {str(e)}")
+        return False
+
+    if not texts:
+        print("❌ PDF 中没有可用的文本")
+        return False
+
+    if not Config.LOCAL_EMBEDDING_WARMUP:
+        warm_up(reference)
+        warm_up(candidate)
+
+    print(f"\n⏱️  基准测试: {len(texts)} 个文档块，批大小 {Config.LOCAL_EMBEDDING_BATCH_SIZE}，"
+          f"线程数 {Config.LOCAL_EMBEDDING_THREADS or '默认'}")
+    result = compare_backends(reference, candidate, texts)
+
+    candidate_label = "onnx-int8" if Config.LOCAL_EMBEDDING_QUANTIZE else "onnx"
+    print(f"   torch: {result['reference']['texts_per_second']:.1f} 块/秒")
+    print(f"   {candidate_label}: {result['candidate']['texts_per_second']:.1f} 块/秒"
+          f"（{result['speedup']:.2f}x）")
+
+    drift = result["drift"]
+    print(f"   余弦相似度: 平均 {drift['mean_similarity']:.5f}，最低 {drift['min_similarity']:.5f}")
+    if result["passed"]:
+        print(f"✅ 向量偏差 {drift['max_drift']:.5f} 在阈值 {result['threshold']} 以内")
+    else:
+        print(f"❌ 向量偏差 {drift['max_drift']:.5f} 超过阈值 {result['threshold']}")
+    return result["passed"]
+
+
+def run_splitter_check(path: str) -> bool:
+    """
+    对比 native 切分器与 RecursiveCharacterTextSplitter
+
+    返回:
+        所有文档块的内容和 metadata 是否完全一致
+    """
+    import time
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from pdf_chatbot import DocumentProcessor
+    from pdf_chatbot.document_loader import find_pdfs
+    from pdf_chatbot.text_splitter import CHUNK_SEPARATORS, SpanTextSplitter
+
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=Config.CHUNK_SIZE,
+        chunk_overlap=Config.CHUNK_OVERLAP,
+        separators=CHUNK_SEPARATORS
+    )
+    native = SpanTextSplitter(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP, CHUNK_SEPARATORS)
+    processor = DocumentProcessor()
+
+    pages = chunks = mismatches = 0
+    reference_seconds = native_seconds = 0.0
+    try:
+        for file_path in find_pdfs(path):
+            documents = list(processor.iter_pages(file_path))
+
+            start = time.perf_counter()
+            expected = reference.split_documents(documents)
+            reference_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = native.split_documents(documents)
+            native_seconds += time.perf_counter() - start
+
+            pages += len(documents)
+            chunks += len(expected)
+            if [(d.page_content, d.metadata) for d in expected] != [(d.page_content, d.metadata) for d in actual]:
+                mismatches += 1
+                print(f"❌ 切分结果不一致: {file_path}（{len(expected)} / {len(actual)} 个文档块）")
+    except Exception as e:
+        print(f"❌ {str(e)}")
+        return False
+
+    print(f"\n⏱️  {pages} 页，{chunks} 个文档块")
+    print(f"   RecursiveCharacterTextSplitter: {reference_seconds:.2f} 秒")
+    print(f"   native: {native_seconds:.2f} 秒")
+    if mismatches:
+        print(f"❌ {mismatches} 个文件的切分结果不一致")
+        return False
+    print("✅ 切分结果完全一致")
+    return True
+
+
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
+
+    # 导入 pdf_chatbot 时不再校验配置，由命令行入口校验
+    try:
+        Config.validate()
+    except ValueError as e:
+        print(f"⚠️  配置错误：{e}")
+
     print("=" * 60)
     print("📚 PDF 聊天机器人 - 基于 RAG 的文档问答系统")
     print("=" * 60)
 
-    # 检查是否存在向量数据库
-    chroma_exists = os.path.exists("./chroma_db")
+    if args.check_splitter:
+        sys.exit(0 if run_splitter_check(args.check_splitter) else 1)
+
+    if args.benchmark_embeddings:
+        sys.exit(0 if run_embedding_benchmark(args.benchmark_embeddings) else 1)
+
+    if args.serve:
+        # HTTP 服务模式：模型只加载一次，所有客户端共享
+        from pdf_chatbot.server import serve
+
+        try:
+            serve(args.host, args.port)
+        except Exception as e:
+            print(f"❌ {str(e)}")
+        return
+
+    from pdf_chatbot import DocumentProcessor, VectorStoreManager, QASystem, ingest_pdf_stream
+
+    # 检查是否存在向量数据库（默认数据库或 --collection 指定的集合）
+    try:
+        persist_dir = VectorStoreManager.collection_dir(args.collection)
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return
+    store_exists = os.path.exists(persist_dir)
+
+    if args.ingest:
+        # 批量导入模式
+        print("\n" + "=" * 60)
+        print("步骤 1-2/3: 批量处理文档并创建向量数据库")
+        print("=" * 60)
+        vector_manager = run_batch_ingest(args.ingest, args.workers, args.collection)
+        if not vector_manager or args.no_chat:
+            return
 
-    if not chroma_exists:
+    elif not store_exists:
         print("\n🆕 首次运行，需要先加载 PDF 文档")
-        pdf_path = input("📄 请输入 PDF 文件路径: ").strip()
+        pdf_path = input("📄 请输入 PDF 文件路径（也支持目录或 glob 模式）: ").strip()
 
         # 验证文件路径
         if not pdf_path:
@@ -29,45 +297,68 @@ def main():
         # 处理 shell 转义字符（反斜杠）
         pdf_path = pdf_path.replace("\\ ", " ").replace("\\'", "'")
 
-        if not os.path.exists(pdf_path):
-            print(f"❌ 文件不存在: {pdf_path}")
-            print("💡 提示: 请输入完整的文件路径，例如: /Users/xxx/document.pdf")
-            return
+        if is_batch_path(pdf_path):
+            # 目录或 glob：并行解析，边解析边写入
+            print("\n" + "=" * 60)
+            print("步骤 1-2/3: 批量处理文档并创建向量数据库")
+            print("=" * 60)
+            vector_manager = run_batch_ingest(pdf_path, args.workers, args.collection)
+            if not vector_manager:
+                return
 
-        if not pdf_path.lower().endswith('.pdf'):
-            print(f"❌ 文件格式错误，仅支持 PDF 文件: {pdf_path}")
-            return
+        else:
+            if not os.path.exists(pdf_path):
+                print(f"❌ 文件不存在: {pdf_path}")
+                print("💡 提示: 请输入完整的文件路径，例如: /Users/xxx/document.pdf")
+                return
 
-        # 1. 处理文档
-        print("\n" + "=" * 60)
-        print("步骤 1/3: 处理文档")
-        print("=" * 60)
-        try:
-            processor = DocumentProcessor()
-            chunks = processor.process_pdf(pdf_path)
-        except Exception as e:
-            print(f"❌ {str(e)}")
-            return
+            if not pdf_path.lower().endswith('.pdf'):
+                print(f"❌ 文件格式错误，仅支持 PDF 文件: {pdf_path}")
+                return
 
-        # 2. 创建向量数据库
-        print("\n" + "=" * 60)
-        print("步骤 2/3: 创建向量数据库")
-        print("=" * 60)
-        try:
-            vector_manager = VectorStoreManager()
-            vector_manager.create_vectorstore(chunks)
-        except Exception as e:
-            print(f"❌ {str(e)}")
-            return
+            if os.path.getsize(pdf_path) > Config.STREAMING_THRESHOLD_MB * 1024 * 1024:
+                # 大文件：逐页解析、逐批向量化
+                print("\n" + "=" * 60)
+                print("步骤 1-2/3: 流式处理文档并创建向量数据库")
+                print("=" * 60)
+                try:
+                    vector_manager = VectorStoreManager(collection=args.collection)
+                    ingest_pdf_stream(pdf_path, vector_manager)
+                except Exception as e:
+                    print(f"❌ {str(e)}")
+                    return
+
+            else:
+                # 1. 处理文档
+                print("\n" + "=" * 60)
+                print("步骤 1/3: 处理文档")
+                print("=" * 60)
+                try:
+                    processor = DocumentProcessor()
+                    chunks = processor.process_pdf(pdf_path)
+                except Exception as e:
+                    print(f"❌ {str(e)}")
+                    return
+
+                # 2. 创建向量数据库
+                print("\n" + "=" * 60)
+                print("步骤 2/3: 创建向量数据库")
+                print("=" * 60)
+                try:
+                    vector_manager = VectorStoreManager(collection=args.collection)
+                    vector_manager.create_vectorstore(chunks)
+                except Exception as e:
+                    print(f"❌ {str(e)}")
+                    return
 
     else:
         print("\n📂 检测到已存在的向量数据库，直接加载...")
         try:
-            vector_manager = VectorStoreManager()
+            vector_manager = VectorStoreManager(collection=args.collection)
             vector_manager.load_vectorstore()
         except Exception as e:
             print(f"❌ {str(e)}")
-            print("💡 提示: 如需重新创建数据库，请删除 chroma_db 文件夹")
+            print(f"💡 提示: 如需重新创建数据库，请删除 {persist_dir} 文件夹")
             return
 
     # 3. 初始化问答系统
@@ -91,9 +382,12 @@ def main():
         print("  - 输入 'history' 查看对话历史")
         print("  - 输入 'clear' 清空对话历史")
         print("  - 输入 'export' 导出对话记录")
+    print("  - 输入 '/filter source=xx.pdf pages=3-10' 限定检索范围，'/filter clear' 取消")
     print("  - 答案将以流式输出方式实时显示")
     print()
 
+    search_filter = None
+
     while True:
         try:
             question = input("\n❓ 你的问题: ").strip()
@@ -105,6 +399,19 @@ def main():
                 print("👋 再见！")
                 break
 
+            # 命令带 / 前缀，以 filter 开头的普通问题不会被当作命令
+            if question.split()[0].lower() == '/filter':
+                try:
+                    search_filter = parse_filter_command(question[len('/filter'):])
+                except ValueError as e:
+                    print(f"❌ {str(e)}")
+                    continue
+                if search_filter:
+                    print(f"🔎 检索范围: {search_filter.describe()}")
+                else:
+                    print("🔎 已取消检索范围限制")
+                continue
+
             # 特殊命令处理（仅在启用记忆时可用）
             if Config.ENABLE_MEMORY:
                 if question.lower() == 'history':
@@ -141,7 +448,7 @@ def main():
 
             # 回答问题
             try:
-                qa_system.ask(question)
+                qa_system.ask(question, search_filter=search_filter)
             except Exception as e:
                 print(f"❌ {str(e)}")
                 # 继续循环，不退出程序
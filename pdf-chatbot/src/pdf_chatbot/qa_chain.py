@@ -1,18 +1,26 @@
 """问答链模块（支持对话记忆和流式输出）"""
+import re
 import sys
 import time
 import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple, Optional
-from langchain.chains import ConversationalRetrievalChain, RetrievalQA
-from langchain.chat_models import ChatOpenAI
-from langchain_community.chat_models import ChatTongyi
+from typing import Tuple, Optional, AsyncIterator
 from langchain.memory import ConversationBufferMemory
-from langchain.callbacks.base import BaseCallbackHandler
+from langchain.callbacks.base import BaseCallbackHandler, AsyncCallbackHandler
 
 from .config import Config
 from .vector_store import VectorStoreManager
+from .retriever import ScoredRetriever, StageTimings, RETRIEVAL_MODES
+from .semantic_cache import SemanticCache
+from .session import ChatSession, SessionManager
+from .context_packer import ContextPacker
+from .summary_memory import RollingSummaryMemory
+from .question_rewrite import needs_history, rewrite_cache_key
+from .search_filter import SearchFilter
 
 
 class StreamingCallbackHandler(BaseCallbackHandler):
@@ -52,6 +60,42 @@ class StreamingCallbackHandler(BaseCallbackHandler):
         self.is_first_token = True
 
 
+class AsyncTokenQueueHandler(AsyncCallbackHandler):
+    """
+    异步流式回调处理器
+
+    功能:
+        - 把 LLM 生成的 token 放入 asyncio 队列，供 astream 逐个产出
+        - 每次调用新建一个实例，多个并发请求互不干扰
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        """每当 LLM 生成新 token 时放入队列"""
+        await self.queue.put(token)
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    """
+    LLM 调用计数器
+
+    每次问答新建一个实例，统计这次问答实际调用了几次 LLM（改写追问 + 生成答案）。
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.count = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        self.count += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        self.count += 1
+
+
 def get_confidence_level(distance: float) -> Tuple[str, str, float]:
     """
     根据余弦距离判断可信度
@@ -76,13 +120,21 @@ def get_confidence_level(distance: float) -> Tuple[str, str, float]:
 
 
 class QASystem:
-    """问答系统类（支持多轮对话和流式输出）"""
+    """问答系统类（支持多轮对话、流式输出和多会话）"""
+
+    # 未指定会话 ID 时使用的默认会话（命令行模式）
+    DEFAULT_SESSION = "default"
 
     def __init__(
         self,
         vector_store_manager: VectorStoreManager,
         enable_memory: bool = True,
-        enable_streaming: bool = True
+        enable_streaming: bool = True,
+        enable_semantic_cache: bool = None,
+        llm=None,
+        condense_llm=None,
+        reranker=None,
+        memory_mode: str = None
     ):
         """
         初始化问答系统
@@ -91,92 +143,257 @@ class QASystem:
             vector_store_manager: 向量存储管理器
             enable_memory: 是否启用对话记忆（默认启用）
             enable_streaming: 是否启用流式输出（默认启用）
+            enable_semantic_cache: 是否启用语义缓存（默认读取 Config.SEMANTIC_CACHE）
+            llm: 回答问题的 LLM（默认根据配置创建，可传入已有实例或测试用的模拟 LLM）
+            condense_llm: 改写追问的 LLM（默认根据配置创建非流式 LLM；传入 llm 时必须同时传入）
+            reranker: 重排序模型（默认在 initialize 时按 Config.RERANK 加载）
+            memory_mode: 记忆模式（buffer / summary，默认读取 Config.MEMORY_MODE）
+
+        异常:
+            ValueError: 传入 llm 但未传入 condense_llm，或记忆模式不支持
         """
         self.vector_store_manager = vector_store_manager
         self.enable_memory = enable_memory
         self.enable_streaming = enable_streaming
 
-        # 创建流式回调处理器
-        self.streaming_handler = StreamingCallbackHandler() if enable_streaming else None
+        if enable_semantic_cache is None:
+            enable_semantic_cache = Config.SEMANTIC_CACHE
+
+        # 语义缓存：相似问题直接复用答案，跳过 LLM 调用
+        self.semantic_cache = SemanticCache(
+            threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=Config.SEMANTIC_CACHE_TTL,
+            max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES
+        ) if enable_semantic_cache else None
 
         # 根据配置选择 LLM
+        self.llm = llm or self._create_llm(streaming=enable_streaming, verbose=True)
+        # 改写追问的 LLM 不流式输出，避免改写结果混入答案 token
+        # （传入的 llm 可能开启了流式输出，不能直接复用）
+        if condense_llm is None:
+            if llm is not None:
+                raise ValueError("传入 llm 时必须同时传入 condense_llm（改写追问的 LLM 不能流式输出）")
+            condense_llm = self._create_llm(streaming=False)
+        self.condense_llm = condense_llm
+
+        self.qa_chain = None
+
+        # 上下文打包：检索文档和对话历史都限制在模型的 token 预算内
+        self.context_packer = ContextPacker.for_model(
+            Config.MODEL_NAME,
+            budget=Config.CONTEXT_TOKEN_BUDGET,
+            history_ratio=Config.CONTEXT_HISTORY_RATIO
+        )
+
+        # 记忆模式：summary 模式下旧轮次在后台线程合并进摘要（所有会话共享线程池）
+        self.memory_mode = (memory_mode or Config.MEMORY_MODE).lower()
+        if self.memory_mode not in ("buffer", "summary"):
+            raise ValueError(f"不支持的记忆模式: {self.memory_mode}（可选: buffer, summary）")
+        self._summary_executor = ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix="memory-summary"
+        ) if enable_memory and self.memory_mode == "summary" else None
+
+        # LLM 调用统计（衡量跳过追问改写的效果）
+        self._call_stats_lock = threading.Lock()
+        self._call_stats = {
+            "asks": 0,
+            "llm_calls": 0,
+            "rewrites": 0,
+            "rewrites_skipped": 0,
+            "rewrite_cache_hits": 0,
+        }
+
+        # 重排序模型（交叉编码器）和检索各阶段耗时
+        self.reranker = reranker
+        self.retrieval_timings = StageTimings()
+
+        # 会话状态（对话记忆、历史、流式处理器）按会话 ID 隔离，
+        # LLM、检索器和 Embedding 模型由所有会话共享
+        self.sessions = SessionManager(
+            self._create_session,
+            max_sessions=Config.MAX_SESSIONS,
+            ttl_seconds=Config.SESSION_TTL
+        )
+
+    def _create_session(self, session_id: str) -> ChatSession:
+        """创建新会话"""
+        memory = None
+        if self._summary_executor is not None:
+            # 摘要占对话历史预算的三分之一，其余留给最近几轮原文
+            summary_tokens = self.context_packer.history_budget // 3
+            recent_tokens = self.context_packer.history_budget - summary_tokens
+            memory = RollingSummaryMemory(
+                self.condense_llm,
+                self._summary_executor,
+                window_turns=Config.MEMORY_WINDOW_TURNS,
+                max_summary_tokens=summary_tokens,
+                pack_history=lambda messages: self.context_packer.pack_history(messages, recent_tokens)
+            )
+
+        return ChatSession(
+            session_id,
+            enable_memory=self.enable_memory,
+            # 创建流式回调处理器（调用时传入，不绑定在 LLM 上）
+            streaming_handler=StreamingCallbackHandler() if self.enable_streaming else None,
+            memory=memory
+        )
+
+    def get_session(self, session_id: str = DEFAULT_SESSION) -> ChatSession:
+        """
+        获取会话（不存在时自动创建）
+
+        参数:
+            session_id: 会话 ID
+
+        返回:
+            会话对象
+        """
+        return self.sessions.get(session_id)
+
+    def close_session(self, session_id: str) -> bool:
+        """
+        关闭会话，释放其对话状态
+
+        返回:
+            会话是否存在
+        """
+        return self.sessions.remove(session_id)
+
+    @property
+    def memory(self):
+        """默认会话的对话记忆"""
+        return self.get_session().memory
+
+    @property
+    def chat_history(self) -> list:
+        """默认会话的对话历史"""
+        return self.get_session().chat_history
+
+    @property
+    def streaming_handler(self):
+        """默认会话的流式输出回调处理器"""
+        return self.get_session().streaming_handler
+
+    def _create_llm(self, streaming: bool, verbose: bool = False):
+        """
+        根据配置创建 LLM
+
+        参数:
+            streaming: 是否流式输出
+            verbose: 是否打印所用模型
+
+        返回:
+            LLM 对象
+        """
+        # 只导入所选提供商的客户端
         if Config.LLM_PROVIDER == "openai":
-            print(f"🔧 使用 OpenAI LLM: {Config.MODEL_NAME}")
-            self.llm = ChatOpenAI(
+            from langchain.chat_models import ChatOpenAI
+
+            if verbose:
+                print(f"🔧 使用 OpenAI LLM: {Config.MODEL_NAME}")
+            return ChatOpenAI(
                 model=Config.MODEL_NAME,
                 temperature=Config.TEMPERATURE,
                 openai_api_key=Config.OPENAI_API_KEY,
-                streaming=enable_streaming,
-                callbacks=[self.streaming_handler] if enable_streaming else None
+                streaming=streaming
             )
         elif Config.LLM_PROVIDER == "qwen":
-            print(f"🔧 使用通义千问 LLM: {Config.MODEL_NAME}")
-            self.llm = ChatTongyi(
+            from langchain_community.chat_models import ChatTongyi
+
+            if verbose:
+                print(f"🔧 使用通义千问 LLM: {Config.MODEL_NAME}")
+            return ChatTongyi(
                 model_name=Config.MODEL_NAME,
                 temperature=Config.TEMPERATURE,
                 dashscope_api_key=Config.DASHSCOPE_API_KEY,
-                streaming=enable_streaming,
-                callbacks=[self.streaming_handler] if enable_streaming else None
+                streaming=streaming
             )
         else:
             raise ValueError(f"不支持的 LLM 提供商: {Config.LLM_PROVIDER}")
 
-        self.qa_chain = None
-        self.memory = None
-        self.chat_history = []  # 存储对话历史（用于显示）
+    def initialize(self, retrieval_mode: str = None, rerank: bool = None):
+        """
+        初始化问答链
+
+        参数:
+            retrieval_mode: 检索模式（vector / bm25 / hybrid，默认读取 Config.RETRIEVAL_MODE）
+            rerank: 是否启用交叉编码器重排序（默认读取 Config.RERANK；传入了 reranker 时默认启用）
 
-    def initialize(self):
-        """初始化问答链"""
-        if not self.vector_store_manager.vectorstore:
+        异常:
+            ValueError: 向量数据库未加载（也没有命名集合）或检索模式不支持
+        """
+        # 只使用命名集合时默认向量数据库可以为空（集合在第一次检索时打开）
+        if not self.vector_store_manager.vectorstore and not self.vector_store_manager.list_collections():
             raise ValueError("向量数据库未加载！请先加载或创建向量数据库")
 
+        retrieval_mode = (retrieval_mode or Config.RETRIEVAL_MODE).lower()
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(
+                f"不支持的检索模式: {retrieval_mode}（可选: {', '.join(RETRIEVAL_MODES)}）"
+            )
+        self.retrieval_mode = retrieval_mode
+
+        if rerank is None:
+            rerank = Config.RERANK or self.reranker is not None
+        if rerank and self.reranker is None:
+            from .reranker import CrossEncoderReranker
+            self.reranker = CrossEncoderReranker()
+
         print(f"🤖 正在初始化问答系统...")
-        print(f"   - 记忆功能：{'✅ 开启' if self.enable_memory else '❌ 关闭'}")
+        if self.enable_memory:
+            print(f"   - 记忆功能：✅ 开启（{self.memory_mode}）")
+        else:
+            print(f"   - 记忆功能：❌ 关闭")
         print(f"   - 流式输出：{'✅ 开启' if self.enable_streaming else '❌ 关闭'}")
+        print(f"   - 语义缓存：{'✅ 开启' if self.semantic_cache else '❌ 关闭'}")
+        print(f"   - 检索模式：{retrieval_mode}")
+        print(f"   - 上下文预算：{self.context_packer.budget} tokens"
+              f"（对话历史 {self.context_packer.history_budget}）")
+        if rerank:
+            print(f"   - 重排序：✅ 开启（{Config.RERANK_CANDIDATES} 个候选 → {Config.RETRIEVAL_TOP_K} 个）")
+        else:
+            print(f"   - 重排序：❌ 关闭")
 
-        if self.enable_memory:
-            # 创建对话记忆
-            self.memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True,
-                output_key="answer"  # 指定输出键
-            )
+        # 检索结果自带分数，展示来源时无需再次检索
+        retriever = ScoredRetriever(
+            vector_store_manager=self.vector_store_manager,
+            k=Config.RETRIEVAL_TOP_K,
+            mode=retrieval_mode,
+            reranker=self.reranker if rerank else None,
+            candidates=Config.RERANK_CANDIDATES,
+            timings=self.retrieval_timings,
+            packer=self.context_packer
+        )
+
+        from langchain.chains import ConversationalRetrievalChain, RetrievalQA
 
+        if self.enable_memory:
             # 使用 ConversationalRetrievalChain（支持记忆）
+            # 链本身不绑定记忆，每次调用时传入对应会话的对话历史
             self.qa_chain = ConversationalRetrievalChain.from_llm(
                 llm=self.llm,
-                retriever=self.vector_store_manager.vectorstore.as_retriever(
-                    search_kwargs={"k": 3}
-                ),
-                memory=self.memory,
-                return_source_documents=True
+                retriever=retriever,
+                condense_question_llm=self.condense_llm,
+                return_source_documents=True,
+                return_generated_question=True
             )
         else:
             # 使用普通的 RetrievalQA（不支持记忆）
             self.qa_chain = RetrievalQA.from_chain_type(
                 llm=self.llm,
-                retriever=self.vector_store_manager.vectorstore.as_retriever(
-                    search_kwargs={"k": 3}
-                ),
+                retriever=retriever,
                 return_source_documents=True
             )
 
         print("✅ 问答系统初始化完成")
 
-    def ask(self, question: str, show_source: bool = True) -> dict:
+    def _prepare_question(self, question: str) -> str:
         """
-        提问
-
-        参数:
-            question: 用户问题
-            show_source: 是否显示来源文档（默认显示）
-
-        返回:
-            包含答案和来源文档的字典
+        校验并规范化问题
 
         异常:
-            ValueError: 问题为空或问答链未初始化
-            Exception: API 调用失败
+            ValueError: 问题为空、过长或问答链未初始化
         """
         if not self.qa_chain:
             raise ValueError("问答链未初始化！请先调用 initialize()")
@@ -191,159 +408,604 @@ class QASystem:
         if len(question) > 1000:
             raise ValueError("问题过长（超过 1000 字符），请简化问题")
 
+        return question
+
+    def _count_call(self, key: str, amount: int = 1):
+        """累加 LLM 调用统计"""
+        with self._call_stats_lock:
+            self._call_stats[key] += amount
+
+    def _chain_inputs(self, question: str, session: ChatSession) -> Tuple[dict, Optional[str]]:
+        """
+        构造问答链输入（两种链的输入键不同，记忆模式带上会话的对话历史）
+
+        记忆模式下，只有问题依赖上下文时才把对话历史交给链（链会先调用 LLM 改写追问）：
+            - 独立问题：不传历史，跳过改写
+            - 本会话中已改写过的追问：直接使用缓存的改写结果，跳过改写
+
+        返回:
+            (链输入, 改写缓存键)，改写缓存键仅在需要 LLM 改写时不为 None
+        """
+        if not self.enable_memory:
+            return {"query": question}, None
+
+        chat_history = session.memory.load_memory_variables({})["chat_history"]
+        if not chat_history:
+            return {"question": question, "chat_history": []}, None
+
+        if not needs_history(question):
+            self._count_call("rewrites_skipped")
+            return {"question": question, "chat_history": []}, None
+
+        key = rewrite_cache_key(question, chat_history)
+        rewritten = session.get_rewrite(key)
+        if rewritten is not None:
+            self._count_call("rewrite_cache_hits")
+            return {"question": rewritten, "chat_history": []}, None
+
+        return {"question": question, "chat_history": chat_history}, key
+
+    def _extract_answer(self, result: dict) -> str:
+        """从问答链结果中取出答案"""
+        return result['answer'] if self.enable_memory else result['result']
+
+    def _use_semantic_cache(self, session: ChatSession, search_filter: Optional[SearchFilter] = None) -> bool:
+        """
+        语义缓存只用于不依赖对话上下文的问题（未开启记忆或首轮提问）
+
+        限定了检索范围的提问不走缓存（缓存的答案可能来自范围外的文档）。
+        """
+        if search_filter is not None:
+            return False
+        return bool(self.semantic_cache) and not (self.enable_memory and session.chat_history)
+
+    @staticmethod
+    def _chain_metadata(search_filter: Optional[SearchFilter], collection: Optional[str] = None) -> dict:
+        """问答链调用的 metadata（检索器从中读取本次请求的过滤条件和集合）"""
+        metadata = {}
+        if collection is not None:
+            metadata["collection"] = collection
+        if search_filter is not None:
+            print(f"🔎 检索范围: {search_filter.describe()}")
+            metadata["search_filter"] = search_filter.to_dict()
+        return metadata
+
+    def _index_version(self, collection: Optional[str]):
+        """
+        语义缓存使用的索引版本
+
+        命名集合的版本带上集合名称，不同集合的缓存答案互不命中。
+
+        异常:
+            ValueError: 集合名称不合法
+        """
+        version = self.vector_store_manager.collection(collection).index_version
+        return version if collection is None else (collection, version)
+
+    def _save_memory(self, session: ChatSession, question: str, answer: str):
+        """
+        保存一轮对话到记忆
+
+        buffer 模式下超出历史预算的旧轮次直接丢弃；
+        summary 模式下由 RollingSummaryMemory 在后台合并进摘要。
+        """
+        if not session.memory:
+            return
+        session.memory.save_context({"question": question}, {"answer": answer})
+        if isinstance(session.memory, ConversationBufferMemory):
+            chat_memory = session.memory.chat_memory
+            chat_memory.messages = self.context_packer.pack_history(chat_memory.messages)
+
+    def _record_answer(
+        self,
+        session: ChatSession,
+        question: str,
+        answer: str,
+        result: dict,
+        cache_embedding,
+        index_version,
+        rewrite_key: Optional[str] = None,
+        llm_calls: int = 0
+    ):
+        """保存对话记忆和历史，并写入语义缓存（问题向量已在查找缓存时算好）"""
+        # 记录改写结果，同一会话中重复的追问不再调用 LLM 改写
+        if rewrite_key and result.get("generated_question"):
+            session.put_rewrite(rewrite_key, result["generated_question"])
+            self._count_call("rewrites")
+        self._count_call("asks")
+        self._count_call("llm_calls", llm_calls)
+        result["llm_calls"] = llm_calls
+
+        self._save_memory(session, question, answer)
+        session.chat_history.append({
+            "question": question,
+            "answer": answer
+        })
+
+        if cache_embedding is not None:
+            self.semantic_cache.store(
+                question,
+                cache_embedding,
+                answer,
+                result.get('source_documents', []),
+                index_version
+            )
+
+    def _retry_wait(self, error_msg: str, attempt: int, max_retries: int, retry_delay: float) -> float:
+        """
+        根据错误类型决定是否重试
+
+        参数:
+            error_msg: 错误信息
+            attempt: 当前尝试次数（从 0 开始）
+            max_retries: 最大尝试次数
+            retry_delay: 基础重试间隔（秒）
+
+        返回:
+            重试前需要等待的秒数
+
+        异常:
+            ValueError: API Key 无效
+            Exception: 不可重试的错误或重试次数已用完
+        """
+        # 检测常见错误类型（OpenAI）
+        if Config.LLM_PROVIDER == "openai":
+            if "api key" in error_msg.lower() or "authentication" in error_msg.lower():
+                raise ValueError("OpenAI API Key 无效或已过期，请检查 .env 配置")
+            elif "rate limit" in error_msg.lower():
+                if attempt < max_retries - 1:
+                    wait_time = retry_delay * (attempt + 1)
+                    print(f"⚠️  API 调用频率限制，{wait_time} 秒后重试...")
+                    return wait_time
+                else:
+                    raise Exception("API 调用频率限制，请稍后再试或升级 API 套餐")
+            elif "insufficient_quota" in error_msg.lower():
+                raise Exception("OpenAI API 额度不足，请充值或检查账户状态")
+
+        # 检测常见错误类型（通义千问）
+        elif Config.LLM_PROVIDER == "qwen":
+            if "invalid api" in error_msg.lower() or "authentication" in error_msg.lower():
+                raise ValueError(
+                    "DashScope API Key 无效或已过期\n"
+                    "请访问 https://dashscope.console.aliyun.com/ 检查 API Key"
+                )
+            elif "throttling" in error_msg.lower() or "rate limit" in error_msg.lower():
+                if attempt < max_retries - 1:
+                    wait_time = retry_delay * (attempt + 1)
+                    print(f"⚠️  API 调用频率限制，{wait_time} 秒后重试...")
+                    return wait_time
+                else:
+                    raise Exception("API 调用频率限制，请稍后再试")
+
+        # 通用错误处理
+        if "timeout" in error_msg.lower() or "connection" in error_msg.lower():
+            if attempt < max_retries - 1:
+                print(f"⚠️  网络超时，正在重试（{attempt + 1}/{max_retries}）...")
+                return retry_delay
+            else:
+                raise Exception("网络连接失败，请检查网络连接")
+        else:
+            raise Exception(f"问答失败: {error_msg}")
+
+    def ask(
+        self,
+        question: str,
+        show_source: bool = True,
+        session_id: str = DEFAULT_SESSION,
+        search_filter: Optional[SearchFilter] = None,
+        collection: Optional[str] = None
+    ) -> dict:
+        """
+        提问
+
+        参数:
+            question: 用户问题
+            show_source: 是否显示来源文档（默认显示）
+            session_id: 会话 ID（默认会话用于命令行模式）
+            search_filter: 检索范围（来源、页码范围、导入批次，默认检索全部文档）
+            collection: 集合名称（默认使用默认向量数据库）
+
+        返回:
+            包含答案和来源文档的字典
+
+        异常:
+            ValueError: 问题为空或问答链未初始化
+            Exception: API 调用失败
+        """
+        question = self._prepare_question(question)
+        session = self.get_session(session_id)
+
         print(f"\n❓ 问题: {question}")
+
+        # 语义缓存命中时不调用 LLM
+        cache_embedding = None
+        index_version = self._index_version(collection)
+        if self._use_semantic_cache(session, search_filter):
+            cache_embedding = self.vector_store_manager.embed_query(question)
+            cached = self.semantic_cache.lookup(cache_embedding, index_version)
+            if cached:
+                return self._answer_from_cache(session, question, cached, show_source)
+
         print("🔍 正在搜索相关文档...")
 
+        inputs, rewrite_key = self._chain_inputs(question, session)
+        metadata = self._chain_metadata(search_filter, collection)
         max_retries = 3
         retry_delay = 2
 
         for attempt in range(max_retries):
             try:
                 # 重置流式处理器状态
-                if self.enable_streaming and self.streaming_handler:
-                    self.streaming_handler.reset()
+                counter = LLMCallCounter()
+                callbacks = [counter]
+                if self.enable_streaming and session.streaming_handler:
+                    session.streaming_handler.reset()
+                    callbacks.append(session.streaming_handler)
 
                 # 调用问答链
-                if self.enable_memory:
-                    result = self.qa_chain({"question": question})
-                    answer = result['answer']
-                else:
-                    result = self.qa_chain({"query": question})
-                    answer = result['result']
+                result = self.qa_chain(inputs, callbacks=callbacks, metadata=metadata)
+                answer = self._extract_answer(result)
 
                 # 流式模式下，从 callback 获取答案
-                if self.enable_streaming and self.streaming_handler:
-                    answer = self.streaming_handler.answer
+                if self.enable_streaming and session.streaming_handler:
+                    answer = session.streaming_handler.answer
                     print()  # 流式输出结束后换行
                 else:
                     # 非流式模式，一次性打印
                     print(f"\n💡 答案: {answer}")
 
                 # 保存到历史记录
-                self.chat_history.append({
-                    "question": question,
-                    "answer": answer
-                })
+                self._record_answer(
+                    session, question, answer, result, cache_embedding, index_version,
+                    rewrite_key=rewrite_key, llm_calls=counter.count
+                )
 
-                # 显示来源（包含相似度分数）
+                # 显示来源（相似度分数来自问答链的同一次检索）
                 if show_source and result.get('source_documents'):
-                    # 使用 search_with_score 获取相似度分数
-                    try:
-                        docs_with_scores = self.vector_store_manager.search_with_score(
-                            question,
-                            k=len(result['source_documents'])
-                        )
-
-                        print("\n📚 参考来源（按相似度排序）:")
-                        for i, (doc, score) in enumerate(docs_with_scores, 1):
-                            source = doc.metadata.get('source', '未知')
-                            page = doc.metadata.get('page', '?')
-
-                            # 获取可信度等级
-                            level, icon, similarity = get_confidence_level(score)
-
-                            print(f"  {i}. {source} (第{page}页) {icon} {level}")
-                            print(f"     相似度: {similarity:.1%} | 距离: {score:.3f}")
-                            print(f"     {doc.page_content[:100]}...")
-
-                    except Exception as e:
-                        # 如果获取分数失败，回退到原来的显示方式
-                        print("\n📚 参考来源:")
-                        for i, doc in enumerate(result['source_documents'], 1):
-                            source = doc.metadata.get('source', '未知')
-                            page = doc.metadata.get('page', '?')
-                            print(f"  {i}. {source} (第{page}页)")
-                            print(f"     {doc.page_content[:100]}...")
+                    self._print_sources(result['source_documents'])
 
                 return result
 
             except Exception as e:
-                error_msg = str(e)
-
-                # 检测常见错误类型（OpenAI）
-                if Config.LLM_PROVIDER == "openai":
-                    if "api key" in error_msg.lower() or "authentication" in error_msg.lower():
-                        raise ValueError("OpenAI API Key 无效或已过期，请检查 .env 配置")
-                    elif "rate limit" in error_msg.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (attempt + 1)
-                            print(f"⚠️  API 调用频率限制，{wait_time} 秒后重试...")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception("API 调用频率限制，请稍后再试或升级 API 套餐")
-                    elif "insufficient_quota" in error_msg.lower():
-                        raise Exception("OpenAI API 额度不足，请充值或检查账户状态")
-
-                # 检测常见错误类型（通义千问）
-                elif Config.LLM_PROVIDER == "qwen":
-                    if "invalid api" in error_msg.lower() or "authentication" in error_msg.lower():
-                        raise ValueError(
-                            "DashScope API Key 无效或已过期\n"
-                            "请访问 https://dashscope.console.aliyun.com/ 检查 API Key"
-                        )
-                    elif "throttling" in error_msg.lower() or "rate limit" in error_msg.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (attempt + 1)
-                            print(f"⚠️  API 调用频率限制，{wait_time} 秒后重试...")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception("API 调用频率限制，请稍后再试")
-
-                # 通用错误处理
-                if "timeout" in error_msg.lower() or "connection" in error_msg.lower():
-                    if attempt < max_retries - 1:
-                        print(f"⚠️  网络超时，正在重试（{attempt + 1}/{max_retries}）...")
-                        time.sleep(retry_delay)
+                wait_time = self._retry_wait(str(e), attempt, max_retries, retry_delay)
+                time.sleep(wait_time)
+
+    async def aask(
+        self,
+        question: str,
+        session_id: str = DEFAULT_SESSION,
+        search_filter: Optional[SearchFilter] = None,
+        collection: Optional[str] = None
+    ) -> dict:
+        """
+        异步提问（不阻塞事件循环，适合并发服务）
+
+        参数:
+            question: 用户问题
+            session_id: 会话 ID
+            search_filter: 检索范围（默认检索全部文档）
+            collection: 集合名称（默认使用默认向量数据库）
+
+        返回:
+            包含答案和来源文档的字典（与 ask 相同）
+
+        异常:
+            ValueError: 问题为空或问答链未初始化
+            Exception: API 调用失败
+        """
+        question = self._prepare_question(question)
+        session = self.get_session(session_id)
+
+        cache_embedding = None
+        index_version = self._index_version(collection)
+        if self._use_semantic_cache(session, search_filter):
+            cache_embedding = await asyncio.to_thread(self.vector_store_manager.embed_query, question)
+            cached = self.semantic_cache.lookup(cache_embedding, index_version)
+            if cached:
+                return self._cached_result(session, question, cached)
+
+        max_retries = 3
+        retry_delay = 2
+
+        inputs, rewrite_key = self._chain_inputs(question, session)
+        metadata = self._chain_metadata(search_filter, collection)
+        for attempt in range(max_retries):
+            try:
+                counter = LLMCallCounter()
+                result = await self.qa_chain.acall(inputs, callbacks=[counter], metadata=metadata)
+                answer = self._extract_answer(result)
+                self._record_answer(
+                    session, question, answer, result, cache_embedding, index_version,
+                    rewrite_key=rewrite_key, llm_calls=counter.count
+                )
+                return result
+
+            except Exception as e:
+                wait_time = self._retry_wait(str(e), attempt, max_retries, retry_delay)
+                await asyncio.sleep(wait_time)
+
+    async def astream(
+        self,
+        question: str,
+        result_holder: Optional[dict] = None,
+        session_id: str = DEFAULT_SESSION,
+        search_filter: Optional[SearchFilter] = None,
+        collection: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        异步流式提问，逐个产出答案 token
+
+        参数:
+            question: 用户问题
+            result_holder: 可选字典，结束后写入完整结果（答案、来源文档等）
+            session_id: 会话 ID
+            search_filter: 检索范围（默认检索全部文档）
+            collection: 集合名称（默认使用默认向量数据库）
+
+        返回:
+            答案 token 异步迭代器（缓存命中或未开启流式时一次性产出完整答案）
+
+        异常:
+            ValueError: 问题为空或问答链未初始化
+            Exception: API 调用失败（已产出 token 后出错不再重试）
+        """
+        question = self._prepare_question(question)
+        session = self.get_session(session_id)
+
+        cache_embedding = None
+        index_version = self._index_version(collection)
+        if self._use_semantic_cache(session, search_filter):
+            cache_embedding = await asyncio.to_thread(self.vector_store_manager.embed_query, question)
+            cached = self.semantic_cache.lookup(cache_embedding, index_version)
+            if cached:
+                result = self._cached_result(session, question, cached)
+                if result_holder is not None:
+                    result_holder.update(result)
+                yield cached["answer"]
+                return
+
+        max_retries = 3
+        retry_delay = 2
+
+        inputs, rewrite_key = self._chain_inputs(question, session)
+        metadata = self._chain_metadata(search_filter, collection)
+        for attempt in range(max_retries):
+            handler = AsyncTokenQueueHandler()
+            counter = LLMCallCounter()
+            chain_task = asyncio.ensure_future(
+                self.qa_chain.acall(inputs, callbacks=[handler, counter], metadata=metadata)
+            )
+            emitted = False
+
+            try:
+                # 问答链结束前持续转发 token
+                while True:
+                    token_task = asyncio.ensure_future(handler.queue.get())
+                    done, _ = await asyncio.wait(
+                        {token_task, chain_task},
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if token_task in done:
+                        emitted = True
+                        yield token_task.result()
                         continue
-                    else:
-                        raise Exception("网络连接失败，请检查网络连接")
-                else:
-                    raise Exception(f"问答失败: {error_msg}")
+                    token_task.cancel()
+                    break
+
+                # 转发队列中剩余的 token
+                while not handler.queue.empty():
+                    emitted = True
+                    yield handler.queue.get_nowait()
 
-    def get_chat_history(self) -> list:
+                result = chain_task.result()
+
+            except Exception as e:
+                if not chain_task.done():
+                    chain_task.cancel()
+                if emitted:
+                    raise Exception(f"问答失败: {str(e)}")
+                wait_time = self._retry_wait(str(e), attempt, max_retries, retry_delay)
+                await asyncio.sleep(wait_time)
+                continue
+
+            answer = self._extract_answer(result)
+            if not emitted:
+                # LLM 未开启流式输出时，一次性产出完整答案
+                yield answer
+
+            self._record_answer(
+                session, question, answer, result, cache_embedding, index_version,
+                rewrite_key=rewrite_key, llm_calls=counter.count
+            )
+            if result_holder is not None:
+                result_holder.update(result)
+            return
+
+    def _cached_result(self, session: ChatSession, question: str, cached: dict) -> dict:
+        """
+        用语义缓存条目构造结果（同时记录对话记忆和历史）
+
+        参数:
+            session: 当前会话
+            question: 用户问题
+            cached: SemanticCache.lookup 返回的缓存条目
+
+        返回:
+            与问答链结构一致的结果字典（额外包含 cached=True）
+        """
+        answer = cached["answer"]
+
+        # 与正常问答一样记录到对话记忆和历史
+        self._save_memory(session, question, answer)
+        session.chat_history.append({
+            "question": question,
+            "answer": answer
+        })
+
+        self._count_call("asks")
+
+        answer_key = "answer" if self.enable_memory else "result"
+        return {
+            "question" if self.enable_memory else "query": question,
+            answer_key: answer,
+            "source_documents": cached["source_documents"],
+            "llm_calls": 0,
+            "cached": True,
+        }
+
+    def _answer_from_cache(self, session: ChatSession, question: str, cached: dict, show_source: bool) -> dict:
+        """
+        使用语义缓存中的答案回答问题（不调用 LLM）
+
+        参数:
+            session: 当前会话
+            question: 用户问题
+            cached: SemanticCache.lookup 返回的缓存条目
+            show_source: 是否显示来源文档
+
+        返回:
+            与问答链结构一致的结果字典（额外包含 cached=True）
+        """
+        result = self._cached_result(session, question, cached)
+
+        print(f"\n💡 答案（⚡ 缓存命中，相似度 {cached['similarity']:.1%}）: {cached['answer']}")
+
+        if show_source and cached["source_documents"]:
+            self._print_sources(cached["source_documents"])
+
+        return result
+
+    def get_cache_stats(self) -> dict:
+        """
+        获取语义缓存统计
+
+        返回:
+            {"entries", "hits", "misses", "hit_rate"}，未开启缓存时返回空字典
+        """
+        return self.semantic_cache.stats() if self.semantic_cache else {}
+
+    def get_llm_call_stats(self) -> dict:
+        """
+        获取 LLM 调用统计
+
+        返回:
+            {"asks", "llm_calls", "calls_per_ask", "rewrites", "rewrites_skipped", "rewrite_cache_hits"}
+            （语义缓存命中的问答计为 0 次调用；后台摘要调用不计入）
+        """
+        with self._call_stats_lock:
+            stats = dict(self._call_stats)
+        stats["calls_per_ask"] = stats["llm_calls"] / stats["asks"] if stats["asks"] else 0.0
+        return stats
+
+    def get_retrieval_stats(self) -> dict:
+        """
+        获取检索各阶段耗时统计
+
+        返回:
+            {"retrieve": {...}, "rerank": {...}, "truncated": 截断次数}，
+            每个阶段包含 {"count", "avg_ms", "max_ms", "last_ms"}
+        """
+        return self.retrieval_timings.stats()
+
+    def _print_sources(self, source_documents: list):
+        """
+        打印来源文档
+
+        参数:
+            source_documents: 问答链返回的来源文档（metadata 中带 score / bm25_score / rrf_score / rerank_score）
+        """
+        has_scores = any(
+            key in doc.metadata
+            for doc in source_documents
+            for key in ("score", "bm25_score", "rrf_score", "rerank_score")
+        )
+
+        if has_scores:
+            print("\n📚 参考来源（按相关度排序）:")
+        else:
+            print("\n📚 参考来源:")
+
+        for i, doc in enumerate(source_documents, 1):
+            source = doc.metadata.get('source', '未知')
+            page = doc.metadata.get('page', '?')
+            if doc.metadata.get('page_end', page) != page:
+                page = f"{page}-{doc.metadata['page_end']}"
+
+            details = []
+            if "score" in doc.metadata:
+                score = doc.metadata['score']
+                # 获取可信度等级
+                level, icon, similarity = get_confidence_level(score)
+
+                print(f"  {i}. {source} (第{page}页) {icon} {level}")
+                details.append(f"相似度: {similarity:.1%} | 距离: {score:.3f}")
+            else:
+                print(f"  {i}. {source} (第{page}页)")
+            if "bm25_score" in doc.metadata:
+                details.append(f"BM25: {doc.metadata['bm25_score']:.2f}")
+            if "rrf_score" in doc.metadata:
+                details.append(f"融合得分: {doc.metadata['rrf_score']:.4f}")
+            if "rerank_score" in doc.metadata:
+                details.append(f"重排得分: {doc.metadata['rerank_score']:.3f}")
+
+            if details:
+                print(f"     {' | '.join(details)}")
+            print(f"     {doc.page_content[:100]}...")
+
+    def get_chat_history(self, session_id: str = DEFAULT_SESSION) -> list:
         """
         获取对话历史
 
+        参数:
+            session_id: 会话 ID
+
         返回:
             对话历史列表
         """
-        return self.chat_history
+        return self.get_session(session_id).chat_history
 
-    def clear_history(self):
+    def clear_history(self, session_id: str = DEFAULT_SESSION):
         """清空对话历史"""
-        self.chat_history = []
-        if self.memory:
-            self.memory.clear()
+        self.get_session(session_id).clear()
         print("🗑️  对话历史已清空")
 
-    def show_history(self):
+    def show_history(self, session_id: str = DEFAULT_SESSION):
         """显示对话历史"""
-        if not self.chat_history:
+        chat_history = self.get_chat_history(session_id)
+        if not chat_history:
             print("📝 暂无对话历史")
             return
 
         print("\n" + "=" * 60)
         print("📝 对话历史")
         print("=" * 60)
-        for i, item in enumerate(self.chat_history, 1):
+        for i, item in enumerate(chat_history, 1):
             print(f"\n【第 {i} 轮对话】")
             print(f"❓ 问: {item['question']}")
             print(f"💡 答: {item['answer'][:200]}{'...' if len(item['answer']) > 200 else ''}")
         print("\n" + "=" * 60)
 
-    def export_to_text(self, output_dir: str = "./exports") -> str:
+    def _export_filename(self, session_id: str, extension: str) -> str:
+        """生成导出文件名（包含时间戳，非默认会话再带上会话 ID，避免多个会话同时导出时重名）"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if session_id == self.DEFAULT_SESSION:
+            return f"chat_history_{timestamp}.{extension}"
+        safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", session_id)
+        return f"chat_history_{safe_id}_{timestamp}.{extension}"
+
+    def export_to_text(self, output_dir: str = "./exports", session_id: str = DEFAULT_SESSION) -> str:
         """
         导出对话记录为纯文本格式
 
         参数:
             output_dir: 导出目录（默认 ./exports）
+            session_id: 会话 ID
 
         返回:
             导出文件路径
         """
-        if not self.chat_history:
+        chat_history = self.get_chat_history(session_id)
+        if not chat_history:
             raise ValueError("对话历史为空，无法导出")
 
         # 创建导出目录
@@ -351,8 +1013,7 @@ class QASystem:
         export_path.mkdir(parents=True, exist_ok=True)
 
         # 生成文件名（包含时间戳）
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"chat_history_{timestamp}.txt"
+        filename = self._export_filename(session_id, "txt")
         filepath = export_path / filename
 
         # 写入文件
@@ -361,10 +1022,10 @@ class QASystem:
             f.write("PDF 聊天机器人对话记录\n")
             f.write("=" * 70 + "\n")
             f.write(f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"对话轮数: {len(self.chat_history)}\n")
+            f.write(f"对话轮数: {len(chat_history)}\n")
             f.write("=" * 70 + "\n\n")
 
-            for i, item in enumerate(self.chat_history, 1):
+            for i, item in enumerate(chat_history, 1):
                 f.write(f"【第 {i} 轮对话】\n")
                 f.write(f"{'─' * 70}\n")
                 f.write(f"问题: {item['question']}\n\n")
@@ -373,17 +1034,19 @@ class QASystem:
 
         return str(filepath)
 
-    def export_to_json(self, output_dir: str = "./exports") -> str:
+    def export_to_json(self, output_dir: str = "./exports", session_id: str = DEFAULT_SESSION) -> str:
         """
         导出对话记录为 JSON 格式
 
         参数:
             output_dir: 导出目录（默认 ./exports）
+            session_id: 会话 ID
 
         返回:
             导出文件路径
         """
-        if not self.chat_history:
+        chat_history = self.get_chat_history(session_id)
+        if not chat_history:
             raise ValueError("对话历史为空，无法导出")
 
         # 创建导出目录
@@ -391,21 +1054,20 @@ class QASystem:
         export_path.mkdir(parents=True, exist_ok=True)
 
         # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"chat_history_{timestamp}.json"
+        filename = self._export_filename(session_id, "json")
         filepath = export_path / filename
 
         # 构建 JSON 数据
         data = {
             "export_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "total_conversations": len(self.chat_history),
+            "total_conversations": len(chat_history),
             "conversations": [
                 {
                     "round": i,
                     "question": item['question'],
                     "answer": item['answer']
                 }
-                for i, item in enumerate(self.chat_history, 1)
+                for i, item in enumerate(chat_history, 1)
             ]
         }
 
@@ -415,17 +1077,19 @@ class QASystem:
 
         return str(filepath)
 
-    def export_to_markdown(self, output_dir: str = "./exports") -> str:
+    def export_to_markdown(self, output_dir: str = "./exports", session_id: str = DEFAULT_SESSION) -> str:
         """
         导出对话记录为 Markdown 格式
 
         参数:
             output_dir: 导出目录（默认 ./exports）
+            session_id: 会话 ID
 
         返回:
             导出文件路径
         """
-        if not self.chat_history:
+        chat_history = self.get_chat_history(session_id)
+        if not chat_history:
             raise ValueError("对话历史为空，无法导出")
 
         # 创建导出目录
@@ -433,18 +1097,17 @@ class QASystem:
         export_path.mkdir(parents=True, exist_ok=True)
 
         # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"chat_history_{timestamp}.md"
+        filename = self._export_filename(session_id, "md")
         filepath = export_path / filename
 
         # 写入 Markdown 文件
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write("# PDF 聊天机器人对话记录\n\n")
             f.write(f"**导出时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            f.write(f"**对话轮数**: {len(self.chat_history)}\n\n")
+            f.write(f"**对话轮数**: {len(chat_history)}\n\n")
             f.write("---\n\n")
 
-            for i, item in enumerate(self.chat_history, 1):
+            for i, item in enumerate(chat_history, 1):
                 f.write(f"## 第 {i} 轮对话\n\n")
                 f.write(f"### ❓ 问题\n\n")
                 f.write(f"{item['question']}\n\n")
@@ -454,13 +1117,19 @@ class QASystem:
 
         return str(filepath)
 
-    def export_history(self, format_type: str = "text", output_dir: str = "./exports") -> str:
+    def export_history(
+        self,
+        format_type: str = "text",
+        output_dir: str = "./exports",
+        session_id: str = DEFAULT_SESSION
+    ) -> str:
         """
         导出对话历史（统一接口）
 
         参数:
             format_type: 导出格式 ('text', 'json', 'markdown')
             output_dir: 导出目录
+            session_id: 会话 ID
 
         返回:
             导出文件路径
@@ -471,10 +1140,10 @@ class QASystem:
         format_type = format_type.lower()
 
         if format_type == "text" or format_type == "txt":
-            return self.export_to_text(output_dir)
+            return self.export_to_text(output_dir, session_id)
         elif format_type == "json":
-            return self.export_to_json(output_dir)
+            return self.export_to_json(output_dir, session_id)
         elif format_type == "markdown" or format_type == "md":
-            return self.export_to_markdown(output_dir)
+            return self.export_to_markdown(output_dir, session_id)
         else:
             raise ValueError(f"不支持的导出格式: {format_type}，支持的格式: text, json, markdown")
@@ -0,0 +1,190 @@
+"""向量量化模块（乘积量化 PQ，压缩内存中的向量）"""
+from typing import List
+
+import numpy as np
+
+
+def default_subvectors(dim: int) -> int:
+    """
+    默认子空间数量：每个子向量约 8 维（float32 → 每个子空间 1 字节，压缩 32 倍）
+
+    维度不能整除时取不超过 dim // 8 的最大约数。
+    """
+    target = max(1, dim // 8)
+    for m in range(target, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def recall_at_k(approx: List[List], exact: List[List]) -> float:
+    """
+    召回率：近似结果中命中精确结果的比例（按查询平均）
+
+    参数:
+        approx: 每个查询的近似检索结果 ID
+        exact: 每个查询的精确检索结果 ID
+
+    返回:
+        recall@k（0-1）
+    """
+    if not exact:
+        return 0.0
+    hits = [
+        len(set(a) & set(e)) / len(e)
+        for a, e in zip(approx, exact) if e
+    ]
+    return sum(hits) / len(hits) if hits else 0.0
+
+
+class ProductQuantizer:
+    """
+    乘积量化（Product Quantization）
+
+    把向量切成 m 个子向量，每个子空间用 k-means 训练 256 个中心，
+    每个向量只保存 m 个 uint8 中心编号（m 字节，原始 float32 为 dim × 4 字节）。
+
+    查询时使用非对称距离（ADC）：查询向量不量化，预先算出它与每个子空间
+    各中心的距离表，文档距离 = 查表求和，不需要解码向量。
+    """
+
+    CENTROIDS = 256
+
+    # 训练 k-means 的最大样本数（每个中心约 64 个样本，足够收敛）
+    MAX_TRAINING_SAMPLES = 256 * 64
+
+    # 编码和计算 ADC 距离时每次处理的向量数量（控制临时数组大小）
+    CHUNK_SIZE = 65536
+
+    def __init__(self, dim: int, m: int = 0, iterations: int = 20, seed: int = 0):
+        """
+        参数:
+            dim: 向量维度
+            m: 子空间数量（必须整除 dim，0 表示自动选择）
+            iterations: k-means 迭代次数
+            seed: 随机种子（训练结果可复现）
+
+        异常:
+            ValueError: m 不能整除 dim
+        """
+        m = m or default_subvectors(dim)
+        if dim % m:
+            raise ValueError(f"PQ 子空间数量 {m} 不能整除向量维度 {dim}")
+
+        self.dim = dim
+        self.m = m
+        self.dsub = dim // m
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks = None    # (m, 256, dsub)
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def compression_ratio(self) -> float:
+        """相对 float32 向量的内存压缩倍数"""
+        return self.dim * 4 / self.m
+
+    def _subvectors(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) → (m, n, dsub)（连续内存，矩阵乘法不走跨步访问）"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.m, self.dsub)
+        return np.ascontiguousarray(vectors.transpose(1, 0, 2))
+
+    @staticmethod
+    def _assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """最近中心编号（‖x - c‖² 展开为矩阵乘法，省略与中心无关的 ‖x‖²）"""
+        distances = np.einsum("ij,ij->i", centroids, centroids)[None, :] - 2 * (points @ centroids.T)
+        return np.argmin(distances, axis=1)
+
+    def train(self, vectors: np.ndarray) -> "ProductQuantizer":
+        """
+        训练各子空间的中心（k-means）
+
+        参数:
+            vectors: 训练向量 (n, dim)
+
+        返回:
+            self
+        """
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.MAX_TRAINING_SAMPLES:
+            vectors = vectors[np.sort(rng.choice(len(vectors), self.MAX_TRAINING_SAMPLES, replace=False))]
+
+        subvectors = self._subvectors(vectors)
+        n = subvectors.shape[1]
+        codebooks = np.zeros((self.m, self.CENTROIDS, self.dsub), dtype=np.float32)
+
+        for sub in range(self.m):
+            points = subvectors[sub]
+            # 样本不足 256 个时允许重复取样作为初始中心
+            centroids = points[rng.choice(n, self.CENTROIDS, replace=n < self.CENTROIDS)].copy()
+            for _ in range(self.iterations):
+                labels = self._assign(points, centroids)
+                counts = np.bincount(labels, minlength=self.CENTROIDS)
+                sums = np.stack([
+                    np.bincount(labels, weights=points[:, d], minlength=self.CENTROIDS)
+                    for d in range(self.dsub)
+                ], axis=1)
+                # 空簇保留原中心
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[sub] = centroids
+
+        self.codebooks = codebooks
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        编码向量
+
+        参数:
+            vectors: (n, dim)
+
+        返回:
+            uint8 编码 (n, m)
+        """
+        subvectors = self._subvectors(vectors)
+        codes = np.empty((subvectors.shape[1], self.m), dtype=np.uint8)
+        for sub in range(self.m):
+            codes[:, sub] = self._assign(subvectors[sub], self.codebooks[sub])
+        return codes
+
+    def distance_table(self, query: np.ndarray) -> np.ndarray:
+        """查询向量与各子空间中心的距离平方表 (m, 256)"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, 1, self.dsub)
+        return ((self.codebooks - query) ** 2).sum(axis=2)
+
+    def adc(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        非对称距离：查询向量与编码向量的近似 L2 距离平方
+
+        参数:
+            query: 查询向量 (dim,)
+            codes: 编码 (n, m)
+
+        返回:
+            近似距离 (n,)
+        """
+        # 展平距离表，第 sub 个子空间的编号偏移 sub × 256，一次查表取出所有子空间的距离
+        table = self.distance_table(query).ravel()
+        offsets = np.arange(self.m, dtype=np.intp) * self.CENTROIDS
+        distances = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.CHUNK_SIZE):
+            chunk = codes[start:start + self.CHUNK_SIZE]
+            distances[start:start + len(chunk)] = table[chunk + offsets].sum(axis=1)
+        return distances
+
+    def save(self, file):
+        """保存中心（文件路径或已打开的文件；编码由调用方保存）"""
+        np.save(file, self.codebooks)
+
+    @classmethod
+    def load(cls, file, iterations: int = 20, seed: int = 0) -> "ProductQuantizer":
+        """加载已训练的中心"""
+        codebooks = np.load(file)
+        m, _, dsub = codebooks.shape
+        quantizer = cls(m * dsub, m, iterations=iterations, seed=seed)
+        quantizer.codebooks = codebooks
+        return quantizer
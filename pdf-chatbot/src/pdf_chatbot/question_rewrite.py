@@ -0,0 +1,75 @@
+"""追问判断模块（判断问题是否依赖对话上下文，决定是否需要 LLM 改写）"""
+import re
+import hashlib
+
+from .text_utils import estimate_tokens
+
+
+# 指代上文的中文词（它、这个、上述……）
+_CJK_REFERENCE_PATTERN = re.compile(
+    r"它|他们|她们|他|她|这个|那个|这些|那些|这种|那种|这样|那样|这里|那里|这一|那一|"
+    r"上述|上面|前面|刚才|之前|上一|前者|后者|其中|该(?:方法|问题|功能|步骤|文件|文档|章节|参数|错误)|"
+    r"继续|展开|详细|具体|还有|其他|其它|另外|以外|呢[？?]?$"
+)
+
+# 承接上文的中文开头（那、还、再、然后……）
+_CJK_LEADING_PATTERN = re.compile(r"^(?:那|还|再|又|也|并且|而且|但|可是|然后|所以|为什么|为啥|怎么说)")
+
+# 指代上文的英文词
+_EN_REFERENCE_PATTERN = re.compile(
+    r"\b(?:it|its|this|that|these|those|they|them|their|he|she|him|her|"
+    r"above|previous|earlier|former|latter|same|more|else|another|other)\b"
+)
+
+# 承接上文的英文开头
+_EN_LEADING_PATTERN = re.compile(r"^(?:and|but|so|also|then|what about|how about|why|what else)\b")
+
+# 少于该 token 数的问题通常是省略了主语的追问（如「为什么？」「多少钱」）
+SHORT_QUESTION_TOKENS = 5
+
+
+def needs_history(question: str) -> bool:
+    """
+    判断问题是否依赖对话上下文（本地规则，不调用 LLM）
+
+    规则（命中任一条即认为依赖上下文，需要改写）:
+        - 含有指代词（它、这个、上述、it、this……）
+        - 以承接词开头（那、还、然后、and、what about……）
+        - 问题很短（通常省略了主语）
+
+    宁可多改写一次，也不要漏掉真正的追问：判断为独立问题时才跳过改写。
+
+    参数:
+        question: 用户问题
+
+    返回:
+        是否需要结合对话历史改写
+    """
+    text = question.strip()
+    lowered = text.lower()
+
+    if estimate_tokens(text) < SHORT_QUESTION_TOKENS:
+        return True
+    if _CJK_REFERENCE_PATTERN.search(text) or _CJK_LEADING_PATTERN.search(text):
+        return True
+    if _EN_REFERENCE_PATTERN.search(lowered) or _EN_LEADING_PATTERN.search(lowered):
+        return True
+    return False
+
+
+def rewrite_cache_key(question: str, chat_history: list) -> str:
+    """
+    计算改写缓存键（同一问题在同一段对话历史下的改写结果相同）
+
+    参数:
+        question: 用户问题
+        chat_history: 对话消息列表
+
+    返回:
+        缓存键（十六进制字符串）
+    """
+    digest = hashlib.sha1(question.strip().encode("utf-8"))
+    for message in chat_history:
+        digest.update(b"\x00")
+        digest.update(message.content.encode("utf-8"))
+    return digest.hexdigest()
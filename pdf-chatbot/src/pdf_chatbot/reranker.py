@@ -0,0 +1,111 @@
+"""重排序模块（交叉编码器对候选文档精排）"""
+import time
+from typing import List, Tuple
+
+from langchain.schema import Document
+
+from .config import Config
+
+
+class CrossEncoderReranker:
+    """
+    交叉编码器重排序（CPU 批量推理）
+
+    功能:
+        - 把 (问题, 文档) 对分批送入交叉编码器打分，按分数重新排序
+        - 按检索排名从高到低打分，超出延迟预算时停止，未打分的候选直接截断
+        - 分数写入 metadata["rerank_score"]（越大越相关）
+    """
+
+    def __init__(
+        self,
+        model_name: str = None,
+        batch_size: int = None,
+        latency_budget_ms: float = None,
+        model=None
+    ):
+        """
+        初始化重排序模型
+
+        参数:
+            model_name: 交叉编码器模型名称（默认读取 Config.RERANK_MODEL）
+            batch_size: 每批打分的候选数量（默认读取 Config.RERANK_BATCH_SIZE）
+            latency_budget_ms: 延迟预算（毫秒，默认读取 Config.RERANK_LATENCY_BUDGET_MS，0 表示不限制）
+            model: 已加载的模型（需提供 predict(pairs, batch_size=...) 方法，测试时可传入模拟模型）
+
+        异常:
+            Exception: 模型加载失败
+        """
+        self.model_name = model_name or Config.RERANK_MODEL
+        self.batch_size = batch_size or Config.RERANK_BATCH_SIZE
+        self.latency_budget_ms = (
+            Config.RERANK_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+        )
+
+        if model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+
+                print(f"🔧 加载重排序模型: {self.model_name}")
+                model = CrossEncoder(self.model_name, device="cpu", max_length=512)
+                print("✅ 重排序模型加载完成")
+            except Exception as e:
+                raise Exception(f"加载重排序模型失败: {str(e)}")
+        self.model = model
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[Document],
+        top_n: int
+    ) -> Tuple[List[Document], dict]:
+        """
+        重排序候选文档
+
+        参数:
+            query: 查询问题
+            documents: 候选文档（按检索相关度排序）
+            top_n: 保留的文档数量
+
+        返回:
+            (重排后的前 top_n 个文档, 统计信息)
+            统计信息: {"candidates", "scored", "truncated", "elapsed_ms"}
+        """
+        start = time.perf_counter()
+        scored = []
+
+        for offset in range(0, len(documents), self.batch_size):
+            batch = documents[offset:offset + self.batch_size]
+            scores = self.model.predict(
+                [(query, doc.page_content) for doc in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            scored.extend(zip(batch, (float(score) for score in scores)))
+
+            # 按已完成批次的平均耗时预估下一批，超出预算则停止（至少打分一批）
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            per_batch_ms = elapsed_ms / (offset // self.batch_size + 1)
+            if self.latency_budget_ms and elapsed_ms + per_batch_ms > self.latency_budget_ms:
+                break
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        reranked = [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "rerank_score": score}
+            )
+            for doc, score in scored[:top_n]
+        ]
+
+        # 打分的候选不足 top_n 时，按检索排名补齐
+        if len(reranked) < top_n:
+            reranked.extend(documents[len(scored):len(scored) + top_n - len(reranked)])
+
+        stats = {
+            "candidates": len(documents),
+            "scored": len(scored),
+            "truncated": len(scored) < len(documents),
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+        return reranked, stats
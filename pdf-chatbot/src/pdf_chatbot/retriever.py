@@ -0,0 +1,145 @@
+"""检索器模块"""
+import time
+import threading
+from typing import Any, List
+
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.schema import BaseRetriever, Document
+
+from .search_filter import SearchFilter
+
+
+# 支持的检索模式
+RETRIEVAL_MODES = ("vector", "bm25", "hybrid")
+
+
+class StageTimings:
+    """
+    检索各阶段耗时统计（线程安全）
+
+    每个阶段记录调用次数、总耗时、最大耗时和最近一次耗时（毫秒）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.truncated = 0    # 因超出延迟预算而截断候选的次数
+
+    def record(self, stage: str, elapsed_ms: float, truncated: bool = False):
+        """记录一次阶段耗时"""
+        with self._lock:
+            stats = self._stages.setdefault(
+                stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+            )
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["last_ms"] = elapsed_ms
+            if truncated:
+                self.truncated += 1
+
+    def stats(self) -> dict:
+        """
+        各阶段统计
+
+        返回:
+            {阶段: {"count", "avg_ms", "max_ms", "last_ms"}, "truncated": 截断次数}
+        """
+        with self._lock:
+            result = {
+                stage: {
+                    "count": stats["count"],
+                    "avg_ms": stats["total_ms"] / stats["count"],
+                    "max_ms": stats["max_ms"],
+                    "last_ms": stats["last_ms"],
+                }
+                for stage, stats in self._stages.items()
+            }
+            result["truncated"] = self.truncated
+            return result
+
+
+class ScoredRetriever(BaseRetriever):
+    """
+    带相似度分数的检索器
+
+    一次检索同时拿到文档和分数，问答链使用的来源文档与展示给用户的来源文档完全一致，
+    无需二次检索。分数写入 metadata:
+        - vector: score（向量距离，越小越相似）
+        - bm25:   bm25_score（越大越相关）
+        - hybrid: rrf_score（融合分数），以及各路命中时的 score / bm25_score
+
+    配置了 reranker 时，先检索 candidates 个候选，再用交叉编码器重排取前 k 个
+    （额外写入 rerank_score）。配置了 packer 时，最后去掉重叠文本并按 token 预算裁剪。
+
+    过滤条件和集合按请求传入：问答链调用时的 metadata["search_filter"]（SearchFilter.to_dict()）
+    和 metadata["collection"]（集合名称，默认为默认向量数据库），检索器共享，
+    不同请求可以使用不同的过滤条件和集合。
+    """
+
+    vector_store_manager: Any
+    k: int = 3
+    mode: str = "vector"
+    reranker: Any = None
+    candidates: int = 30
+    timings: Any = None      # StageTimings，记录各阶段耗时
+    packer: Any = None       # ContextPacker，按 token 预算裁剪文档块
+
+    def _retrieve(
+        self,
+        query: str,
+        k: int,
+        search_filter: SearchFilter = None,
+        collection: str = None
+    ) -> List[Document]:
+        """按检索模式取回文档（附带分数）"""
+        manager = self.vector_store_manager.collection(collection)
+
+        if self.mode == "hybrid":
+            return [doc for doc, _ in manager.hybrid_search(query, k=k, search_filter=search_filter)]
+
+        if self.mode == "bm25":
+            results = manager.search_bm25(query, k=k, search_filter=search_filter)
+            score_key = "bm25_score"
+        else:
+            results = manager.search_with_score(query, k=k, search_filter=search_filter)
+            score_key = "score"
+
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, score_key: float(score)}
+            )
+            for doc, score in results
+        ]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """检索相关文档（附带分数），配置了重排序时再精排，最后按 token 预算打包"""
+        metadata = run_manager.metadata or {}
+        search_filter = SearchFilter.from_dict(metadata.get("search_filter"))
+
+        start = time.perf_counter()
+        documents = self._retrieve(
+            query,
+            max(self.k, self.candidates) if self.reranker else self.k,
+            search_filter,
+            metadata.get("collection")
+        )
+        if self.timings is not None:
+            self.timings.record("retrieve", (time.perf_counter() - start) * 1000)
+
+        if self.reranker and len(documents) > 1:
+            documents, stats = self.reranker.rerank(query, documents, self.k)
+            if self.timings is not None:
+                self.timings.record("rerank", stats["elapsed_ms"], truncated=stats["truncated"])
+        else:
+            documents = documents[:self.k]
+
+        if self.packer is not None:
+            documents = self.packer.pack_documents(query, documents)
+        return documents
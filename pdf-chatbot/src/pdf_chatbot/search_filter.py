@@ -0,0 +1,148 @@
+"""检索过滤模块（按来源、页码范围、导入批次限定检索范围）"""
+from typing import List, Optional, Union
+
+
+def _as_list(value: Union[str, List[str], None]) -> List[str]:
+    """单个值或列表统一为列表"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
+class SearchFilter:
+    """
+    检索过滤条件
+
+    各条件之间为「且」，同一条件的多个值之间为「或」:
+        - sources: 来源（PDF 路径，与来源显示一致）
+        - page_min / page_max: 页码范围（闭区间）；跨页文档块的页码区间
+          [page, page_end] 与范围有重叠即满足（没有 page_end 时按 page 单页计算）
+        - batch_ids: 导入批次（导入时写入 metadata["batch_id"]）
+
+    过滤条件下推到索引中执行（Chroma 的 where 条件、进程内索引的预建倒排表、
+    BM25 的倒排表），不是先检索再过滤，top-k 不会被无关文档占用。
+    """
+
+    def __init__(
+        self,
+        sources: Union[str, List[str], None] = None,
+        page_min: Optional[int] = None,
+        page_max: Optional[int] = None,
+        batch_ids: Union[str, List[str], None] = None
+    ):
+        """
+        参数:
+            sources: 来源（单个或列表）
+            page_min: 最小页码（含）
+            page_max: 最大页码（含）
+            batch_ids: 导入批次（单个或列表）
+
+        异常:
+            ValueError: 页码范围不合法
+        """
+        self.sources = _as_list(sources)
+        self.batch_ids = _as_list(batch_ids)
+        self.page_min = None if page_min is None else int(page_min)
+        self.page_max = None if page_max is None else int(page_max)
+
+        if self.page_min is not None and self.page_max is not None and self.page_min > self.page_max:
+            raise ValueError(f"页码范围不合法: {self.page_min} > {self.page_max}")
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["SearchFilter"]:
+        """
+        从字典创建（HTTP 请求参数）
+
+        参数:
+            data: {"source", "page_min", "page_max", "batch_id"}，均可省略
+
+        返回:
+            过滤条件（没有任何条件时返回 None）
+        """
+        if not data:
+            return None
+        search_filter = cls(
+            sources=data.get("source"),
+            page_min=data.get("page_min"),
+            page_max=data.get("page_max"),
+            batch_ids=data.get("batch_id")
+        )
+        return None if search_filter.is_empty() else search_filter
+
+    def is_empty(self) -> bool:
+        return not (self.sources or self.batch_ids or self.has_page_range())
+
+    def has_page_range(self) -> bool:
+        return self.page_min is not None or self.page_max is not None
+
+    def matches(self, metadata: dict) -> bool:
+        """文档块 metadata 是否满足条件"""
+        if self.sources and str(metadata.get("source", "")) not in self.sources:
+            return False
+        if self.batch_ids and str(metadata.get("batch_id", "")) not in self.batch_ids:
+            return False
+        if self.has_page_range():
+            page = metadata.get("page")
+            if not isinstance(page, int):
+                return False
+            page_end = metadata.get("page_end")
+            if not isinstance(page_end, int):
+                page_end = page
+            if self.page_min is not None and page_end < self.page_min:
+                return False
+            if self.page_max is not None and page > self.page_max:
+                return False
+        return True
+
+    def to_chroma_where(self) -> Optional[dict]:
+        """转换为 Chroma 的 where 条件（没有条件时返回 None）"""
+        clauses = []
+        if self.sources:
+            clauses.append({"source": {"$in": self.sources}})
+        if self.batch_ids:
+            clauses.append({"batch_id": {"$in": self.batch_ids}})
+        if self.page_min is not None:
+            # 跨页文档块按 page_end 判断；没有 page_end 的文档块不满足第一项，
+            # 按 page 判断（有 page_end 时 page >= page_min 蕴含 page_end >= page_min）
+            clauses.append({"$or": [
+                {"page_end": {"$gte": self.page_min}},
+                {"page": {"$gte": self.page_min}},
+            ]})
+        if self.page_max is not None:
+            clauses.append({"page": {"$lte": self.page_max}})
+
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def to_dict(self) -> dict:
+        """转换为字典（与 from_dict 对应）"""
+        data = {}
+        if self.sources:
+            data["source"] = self.sources
+        if self.page_min is not None:
+            data["page_min"] = self.page_min
+        if self.page_max is not None:
+            data["page_max"] = self.page_max
+        if self.batch_ids:
+            data["batch_id"] = self.batch_ids
+        return data
+
+    def describe(self) -> str:
+        """过滤条件的可读描述"""
+        parts = []
+        if self.sources:
+            parts.append(f"来源: {', '.join(self.sources)}")
+        if self.has_page_range():
+            low = "" if self.page_min is None else self.page_min
+            high = "" if self.page_max is None else self.page_max
+            parts.append(f"页码: {low}-{high}")
+        if self.batch_ids:
+            parts.append(f"批次: {', '.join(self.batch_ids)}")
+        return "，".join(parts)
+
+    def cache_key(self) -> str:
+        """用于缓存键的稳定字符串"""
+        return repr(sorted(self.to_dict().items()))
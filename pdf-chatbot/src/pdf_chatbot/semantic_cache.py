@@ -0,0 +1,148 @@
+"""语义缓存模块（相似问题直接复用答案，跳过 LLM 调用）"""
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    语义答案缓存
+
+    功能:
+        - 用问题向量的余弦相似度查找之前回答过的相似问题
+        - 缓存条目绑定向量数据库版本，数据库更新后旧答案自动失效
+        - 支持 TTL 过期和 LRU 淘汰
+        - 记录命中 / 未命中次数
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000
+    ):
+        """
+        初始化语义缓存
+
+        参数:
+            threshold: 余弦相似度阈值（达到该值才视为同一问题）
+            ttl_seconds: 条目有效期（秒），0 表示永不过期
+            max_entries: 最大条目数，超出后淘汰最久未使用的条目
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # 条目 ID -> 条目（按使用时间排序）
+        self._next_id = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """归一化向量（归一化后余弦相似度 = 点积）"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float):
+        """删除过期条目"""
+        if not self.ttl_seconds:
+            return
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if now - entry["created_at"] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def lookup(self, embedding: List[float], version) -> Optional[dict]:
+        """
+        查找相似问题的缓存答案
+
+        参数:
+            embedding: 问题向量
+            version: 当前向量数据库版本
+
+        返回:
+            命中时返回缓存条目 {"question", "answer", "source_documents", "similarity"}，
+            否则返回 None
+        """
+        query = self._normalize(embedding)
+
+        with self._lock:
+            self._expire(time.time())
+
+            candidates = [
+                (entry_id, entry) for entry_id, entry in self._entries.items()
+                if entry["version"] == version
+            ]
+            if candidates:
+                matrix = np.stack([entry["embedding"] for _, entry in candidates])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return {
+                        "question": entry["question"],
+                        "answer": entry["answer"],
+                        "source_documents": entry["source_documents"],
+                        "similarity": float(scores[best]),
+                    }
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        question: str,
+        embedding: List[float],
+        answer: str,
+        source_documents: list,
+        version
+    ):
+        """
+        写入缓存
+
+        参数:
+            question: 问题
+            embedding: 问题向量
+            answer: 答案
+            source_documents: 来源文档
+            version: 生成答案时的向量数据库版本
+        """
+        with self._lock:
+            self._entries[self._next_id] = {
+                "question": question,
+                "embedding": self._normalize(embedding),
+                "answer": answer,
+                "source_documents": source_documents,
+                "version": version,
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
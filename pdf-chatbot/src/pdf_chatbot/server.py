@@ -0,0 +1,507 @@
+"""HTTP 服务模块（一个进程服务多个客户端）"""
+import os
+import json
+import queue
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from .config import Config
+from .vector_store import VectorStoreManager
+from .qa_chain import QASystem, get_confidence_level
+from .ingest import ingest_pdfs
+from .document_loader import find_pdfs
+from .search_filter import SearchFilter
+
+
+# 请求体大小上限（字节）
+MAX_BODY_BYTES = 1024 * 1024
+
+# 导出格式对应的 Content-Type
+EXPORT_CONTENT_TYPES = {
+    "text": "text/plain; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "markdown": "text/markdown; charset=utf-8",
+    "md": "text/markdown; charset=utf-8",
+}
+
+
+# 流式回答结束标记
+_STREAM_END = object()
+
+
+class ServiceUnavailable(Exception):
+    """服务尚未就绪（向量数据库为空）"""
+
+
+def resolve_ingest_path(path: str, root: str) -> str:
+    """
+    把 /ingest 请求中的路径解析到导入根目录下
+
+    参数:
+        path: 请求中的文件、目录或 glob 模式（相对路径相对于导入根目录）
+        root: 导入根目录（Config.INGEST_ROOT）
+
+    返回:
+        规范化后的路径
+
+    异常:
+        PermissionError: 路径或匹配到的文件（解析符号链接后）不在导入根目录内
+        FileNotFoundError: 未找到任何 PDF 文件
+    """
+    root_path = Path(root).resolve()
+    resolved = os.path.normpath(os.path.join(root_path, path))
+    if not Path(resolved).is_relative_to(root_path):
+        raise PermissionError(f"路径不在导入目录内: {path}")
+
+    # glob 和目录展开后逐个检查，防止通过符号链接读取根目录以外的文件
+    for pdf_file in find_pdfs(resolved):
+        if not Path(pdf_file).resolve().is_relative_to(root_path):
+            raise PermissionError(f"路径不在导入目录内: {pdf_file}")
+    return resolved
+
+
+def serialize_sources(source_documents: list) -> list:
+    """
+    把来源文档转换为可 JSON 序列化的列表
+
+    参数:
+        source_documents: 问答链返回的来源文档（metadata 中带 score）
+
+    返回:
+        [{"source", "page", "page_end", "score", "bm25_score", "rrf_score", "rerank_score", "confidence", "content"}, ...]
+        （未命中的检索路对应分数为 None）
+    """
+    sources = []
+    for doc in source_documents or []:
+        score = doc.metadata.get("score")
+        sources.append({
+            "source": doc.metadata.get("source"),
+            "page": doc.metadata.get("page"),
+            "page_end": doc.metadata.get("page_end", doc.metadata.get("page")),
+            "score": score,
+            "bm25_score": doc.metadata.get("bm25_score"),
+            "rrf_score": doc.metadata.get("rrf_score"),
+            "rerank_score": doc.metadata.get("rerank_score"),
+            "confidence": get_confidence_level(score)[1] if score is not None else None,
+            "content": doc.page_content[:200],
+        })
+    return sources
+
+
+class ChatbotService:
+    """
+    HTTP 服务共享的问答资源
+
+    向量数据库、Embedding 模型和 LLM 客户端在启动时只加载一次，所有请求共享；
+    对话状态按 session_id 隔离（见 QASystem 的多会话支持）。
+
+    所有请求的异步问答都提交到同一个常驻事件循环线程上执行：共享的 LLM 客户端
+    （连接池）绑定在创建它的事件循环上，每个请求各自 asyncio.run 会在循环关闭后
+    复用失效的连接。
+    """
+
+    def __init__(
+        self,
+        vector_store_manager: Optional[VectorStoreManager] = None,
+        llm=None,
+        condense_llm=None,
+        export_dir: str = "./exports"
+    ):
+        """
+        初始化服务（加载向量数据库和问答系统）
+
+        参数:
+            vector_store_manager: 向量存储管理器（默认根据配置创建）
+            llm: 回答问题的 LLM（默认根据配置创建，测试时可传入模拟 LLM）
+            condense_llm: 改写追问的 LLM（默认根据配置创建，传入 llm 时必须同时传入）
+            export_dir: 导出文件目录
+        """
+        self.vector_store_manager = vector_store_manager or VectorStoreManager()
+        self.export_dir = export_dir
+
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="chatbot-event-loop", daemon=True
+        )
+        self._loop_thread.start()
+
+        # 导入会写向量数据库，同一时间只允许一个导入任务
+        self._ingest_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+        if self.vector_store_manager.vectorstore is None and self.vector_store_manager.exists():
+            self.vector_store_manager.load_vectorstore()
+
+        self.qa_system = QASystem(
+            self.vector_store_manager,
+            enable_memory=Config.ENABLE_MEMORY,
+            llm=llm,
+            condense_llm=condense_llm
+        )
+        self._ensure_initialized()
+
+    def _ensure_initialized(self) -> bool:
+        """向量数据库或命名集合可用时初始化问答链（首次导入前数据库可能为空）"""
+        with self._init_lock:
+            if self.qa_system.qa_chain is None and (
+                self.vector_store_manager.vectorstore is not None
+                or self.vector_store_manager.list_collections()
+            ):
+                self.qa_system.initialize()
+            return self.qa_system.qa_chain is not None
+
+    def _require_ready(self, collection: Optional[str] = None):
+        """确认问答系统可用，且要检索的向量数据库（默认数据库或指定集合）已存在"""
+        if not self._ensure_initialized():
+            raise ServiceUnavailable("向量数据库为空，请先调用 /ingest 导入文档")
+        if not self.vector_store_manager.collection(collection).exists():
+            if collection is None:
+                raise ServiceUnavailable("默认向量数据库为空，请先调用 /ingest 导入文档或指定 collection")
+            raise ServiceUnavailable(f"集合不存在: {collection}，请先调用 /ingest 导入文档")
+
+    def _run(self, coro):
+        """在常驻事件循环上执行协程，阻塞等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        """停止事件循环线程"""
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    def ingest(self, path: str, max_workers: int = None, collection: Optional[str] = None) -> dict:
+        """
+        导入 PDF（单个文件、目录或 glob 模式）
+
+        参数:
+            path: 相对于 Config.INGEST_ROOT 的路径（不允许访问导入根目录以外的文件）
+            collection: 导入到的集合（默认导入默认向量数据库）
+
+        返回:
+            导入统计 {"files", "succeeded", "failed", "chunks", "batch_id"}
+
+        异常:
+            PermissionError: 路径不在导入根目录内
+            FileNotFoundError: 未找到任何 PDF 文件
+        """
+        path = resolve_ingest_path(path, Config.INGEST_ROOT)
+        manager = self.vector_store_manager.collection(collection)
+        with self._ingest_lock:
+            stats = ingest_pdfs(path, manager, max_workers=max_workers)
+        self._ensure_initialized()
+        return stats
+
+    def ask(
+        self,
+        question: str,
+        session_id: str,
+        search_filter: Optional[SearchFilter] = None,
+        collection: Optional[str] = None
+    ) -> dict:
+        """
+        提问（一次性返回完整结果）
+
+        返回:
+            {"answer", "sources", "cached"}
+        """
+        self._require_ready(collection)
+        result = self._run(self.qa_system.aask(
+            question, session_id=session_id, search_filter=search_filter, collection=collection
+        ))
+        return {
+            "answer": self.qa_system._extract_answer(result),
+            "sources": serialize_sources(result.get("source_documents")),
+            "cached": bool(result.get("cached")),
+        }
+
+    def stream(
+        self,
+        question: str,
+        session_id: str,
+        on_token,
+        search_filter: Optional[SearchFilter] = None,
+        collection: Optional[str] = None
+    ) -> dict:
+        """
+        流式提问，每产生一个 token 调用一次 on_token
+
+        token 在事件循环线程中产生，经队列交给当前请求线程调用 on_token，
+        写响应（可能阻塞）不会占用事件循环。
+
+        返回:
+            {"answer", "sources", "cached"}
+        """
+        self._require_ready(collection)
+        holder = {}
+        tokens = queue.Queue()
+
+        async def produce():
+            try:
+                async for token in self.qa_system.astream(
+                    question, result_holder=holder, session_id=session_id,
+                    search_filter=search_filter, collection=collection
+                ):
+                    tokens.put(token)
+            finally:
+                tokens.put(_STREAM_END)
+
+        future = asyncio.run_coroutine_threadsafe(produce(), self._loop)
+        try:
+            while True:
+                token = tokens.get()
+                if token is _STREAM_END:
+                    break
+                on_token(token)
+        except BaseException:
+            # 客户端断开等情况下停止生成
+            future.cancel()
+            raise
+        future.result()
+        return {
+            "answer": self.qa_system._extract_answer(holder),
+            "sources": serialize_sources(holder.get("source_documents")),
+            "cached": bool(holder.get("cached")),
+        }
+
+    def history(self, session_id: str) -> list:
+        """获取会话的对话历史"""
+        return self.qa_system.get_chat_history(session_id)
+
+    def export(self, session_id: str, format_type: str) -> str:
+        """导出会话的对话历史，返回导出文件路径"""
+        return self.qa_system.export_history(format_type, self.export_dir, session_id=session_id)
+
+
+class ChatbotRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP 请求处理器
+
+    接口:
+        - GET  /health                                   服务状态
+        - POST /ingest   {"path", "workers", "collection"} 导入 PDF（path 相对于 INGEST_ROOT，
+                         workers 不超过 INGEST_WORKERS）
+        - POST /ask      {"question", "session_id", "stream", "filter", "collection"}
+                         stream=true 时以 Server-Sent Events 逐 token 返回
+                         filter 限定检索范围 {"source", "page_min", "page_max", "batch_id"}
+                         collection 指定命名集合（默认使用默认向量数据库）
+        - GET  /history?session_id=...                   对话历史
+        - GET  /export?session_id=...&format=json        导出对话记录
+    """
+
+    protocol_version = "HTTP/1.1"
+    service: ChatbotService = None
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {"error": message})
+
+    def _read_json(self) -> dict:
+        """读取 JSON 请求体"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"请求体过大: {length} 字节（上限 {MAX_BODY_BYTES} 字节）")
+        if not length:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length).decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("请求体不是合法的 JSON")
+        if not isinstance(data, dict):
+            raise ValueError("请求体必须是 JSON 对象")
+        return data
+
+    @staticmethod
+    def _read_collection(data: dict) -> Optional[str]:
+        """读取集合名称参数（名称是否合法由 VectorStoreManager 校验）"""
+        collection = data.get("collection")
+        if collection is not None and not isinstance(collection, str):
+            raise ValueError("collection 必须是字符串")
+        return collection or None
+
+    @staticmethod
+    def _read_workers(data: dict) -> Optional[int]:
+        """读取解析进程数参数，限制在 [1, Config.INGEST_WORKERS] 内（客户端不能让服务启动更多进程）"""
+        workers = data.get("workers")
+        if workers is None:
+            return None
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            raise ValueError(f"workers 必须是整数: {workers!r}")
+        return max(1, min(workers, Config.INGEST_WORKERS))
+
+    def _dispatch(self, routes: dict):
+        """根据路径分发请求，并把异常转换为 HTTP 错误"""
+        url = urlparse(self.path)
+        handler = routes.get(url.path)
+        if handler is None:
+            self._send_error(404, f"接口不存在: {url.path}")
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            handler(query)
+        except ServiceUnavailable as e:
+            self._send_error(503, str(e))
+        except PermissionError as e:
+            self._send_error(403, str(e))
+        except (ValueError, FileNotFoundError) as e:
+            self._send_error(400, str(e))
+        except Exception as e:
+            self._send_error(500, str(e))
+
+    def do_GET(self):
+        self._dispatch({
+            "/health": self._handle_health,
+            "/history": self._handle_history,
+            "/export": self._handle_export,
+        })
+
+    def do_POST(self):
+        self._dispatch({
+            "/ingest": self._handle_ingest,
+            "/ask": self._handle_ask,
+        })
+
+    def _handle_health(self, query: dict):
+        qa_system = self.service.qa_system
+        self._send_json(200, {
+            "status": "ok" if qa_system.qa_chain is not None else "empty",
+            "sessions": len(qa_system.sessions),
+            "index_version": self.service.vector_store_manager.index_version,
+            "retrieval": qa_system.get_retrieval_stats(),
+            "llm_calls": qa_system.get_llm_call_stats(),
+            "collections": {
+                "available": self.service.vector_store_manager.list_collections(),
+                "open": self.service.vector_store_manager.open_collections(),
+            },
+        })
+
+    def _handle_ingest(self, query: dict):
+        data = self._read_json()
+        path = data.get("path")
+        if not path:
+            raise ValueError("缺少参数: path")
+        stats = self.service.ingest(
+            path, max_workers=self._read_workers(data), collection=self._read_collection(data)
+        )
+        self._send_json(200, stats)
+
+    def _handle_ask(self, query: dict):
+        data = self._read_json()
+        question = data.get("question", "")
+        session_id = str(data.get("session_id") or QASystem.DEFAULT_SESSION)
+
+        filter_data = data.get("filter")
+        if filter_data is not None and not isinstance(filter_data, dict):
+            raise ValueError("filter 必须是 JSON 对象")
+        search_filter = SearchFilter.from_dict(filter_data)
+        collection = self._read_collection(data)
+
+        if not data.get("stream"):
+            self._send_json(200, self.service.ask(question, session_id, search_filter, collection))
+            return
+
+        # 先做参数和状态检查，出错时仍可返回普通 JSON 错误
+        if not question or not question.strip():
+            raise ValueError("问题不能为空")
+        self.service._require_ready(collection)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(event: str, data):
+            payload = json.dumps(data, ensure_ascii=False)
+            self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            result = self.service.stream(
+                question, session_id, lambda token: send_event("token", {"token": token}),
+                search_filter, collection
+            )
+            send_event("done", result)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已断开
+            pass
+        except Exception as e:
+            # 响应头已发送，只能通过事件通知错误
+            send_event("error", {"error": str(e)})
+
+    def _handle_history(self, query: dict):
+        session_id = query.get("session_id", QASystem.DEFAULT_SESSION)
+        self._send_json(200, {
+            "session_id": session_id,
+            "history": self.service.history(session_id),
+        })
+
+    def _handle_export(self, query: dict):
+        session_id = query.get("session_id", QASystem.DEFAULT_SESSION)
+        format_type = query.get("format", "text").lower()
+        if format_type not in EXPORT_CONTENT_TYPES:
+            raise ValueError(f"不支持的导出格式: {format_type}")
+
+        filepath = self.service.export(session_id, format_type)
+        body = Path(filepath).read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", EXPORT_CONTENT_TYPES[format_type])
+        self.send_header("Content-Disposition", f'attachment; filename="{Path(filepath).name}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(service: ChatbotService, host: str = None, port: int = None) -> ThreadingHTTPServer:
+    """
+    创建 HTTP 服务（每个请求一个线程）
+
+    参数:
+        service: 共享的问答资源
+        host: 监听地址（默认读取 Config.SERVER_HOST）
+        port: 监听端口（默认读取 Config.SERVER_PORT，0 表示随机端口）
+
+    返回:
+        HTTP 服务对象（调用 serve_forever() 开始处理请求）
+    """
+    handler = type("BoundChatbotRequestHandler", (ChatbotRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer(
+        (host or Config.SERVER_HOST, Config.SERVER_PORT if port is None else port),
+        handler
+    )
+    server.daemon_threads = True
+    return server
+
+
+def serve(host: str = None, port: int = None):
+    """加载模型并启动 HTTP 服务（阻塞直到 Ctrl+C）"""
+    service = ChatbotService()
+    server = create_server(service, host, port)
+    address, bound_port = server.server_address[:2]
+    print(f"🚀 HTTP 服务已启动: http://{address}:{bound_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务已停止")
+    finally:
+        server.server_close()
+        service.close()
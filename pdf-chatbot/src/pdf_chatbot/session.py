@@ -0,0 +1,148 @@
+"""会话管理模块（多用户共享一个问答系统）"""
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain.memory import ConversationBufferMemory
+
+
+class ChatSession:
+    """
+    单个会话的状态
+
+    只保存与用户相关的轻量状态（对话记忆、历史记录、流式处理器、追问改写缓存），
+    LLM、检索器和 Embedding 模型由所有会话共享。
+    """
+
+    # 每个会话缓存的追问改写结果数量
+    REWRITE_CACHE_SIZE = 32
+
+    def __init__(self, session_id: str, enable_memory: bool, streaming_handler=None, memory=None):
+        """
+        参数:
+            session_id: 会话 ID
+            enable_memory: 是否启用对话记忆
+            streaming_handler: 该会话的流式输出回调处理器（可选）
+            memory: 对话记忆对象（可选，默认使用 ConversationBufferMemory）
+        """
+        self.session_id = session_id
+        if enable_memory and memory is None:
+            memory = ConversationBufferMemory(
+                memory_key="chat_history",
+                return_messages=True,
+                output_key="answer"  # 指定输出键
+            )
+        self.memory = memory if enable_memory else None
+        self.chat_history = []  # 存储对话历史（用于显示）
+        self.streaming_handler = streaming_handler
+        self.rewrite_cache = OrderedDict()  # 改写缓存键 -> 改写后的独立问题
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+    def touch(self):
+        """刷新最近活跃时间"""
+        self.last_active = time.time()
+
+    def get_rewrite(self, key: str) -> Optional[str]:
+        """读取缓存的追问改写结果"""
+        question = self.rewrite_cache.get(key)
+        if question is not None:
+            self.rewrite_cache.move_to_end(key)
+        return question
+
+    def put_rewrite(self, key: str, question: str):
+        """缓存追问改写结果"""
+        self.rewrite_cache[key] = question
+        self.rewrite_cache.move_to_end(key)
+        while len(self.rewrite_cache) > self.REWRITE_CACHE_SIZE:
+            self.rewrite_cache.popitem(last=False)
+
+    def clear(self):
+        """清空对话历史、记忆和改写缓存"""
+        self.chat_history = []
+        self.rewrite_cache.clear()
+        if self.memory:
+            self.memory.clear()
+
+
+class SessionManager:
+    """
+    会话管理器
+
+    功能:
+        - 按会话 ID 创建和获取会话
+        - 超过 ttl_seconds 未活跃的会话自动淘汰
+        - 会话数超过 max_sessions 时淘汰最久未活跃的会话
+    """
+
+    def __init__(self, session_factory, max_sessions: int = 100, ttl_seconds: float = 1800):
+        """
+        参数:
+            session_factory: 创建会话的函数，参数为会话 ID
+            max_sessions: 最大会话数
+            ttl_seconds: 会话空闲超时（秒），0 表示不过期
+        """
+        self.session_factory = session_factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # 会话 ID -> 会话（按活跃时间排序）
+
+    def _evict(self, now: float):
+        """淘汰过期和超出数量上限的会话"""
+        if self.ttl_seconds:
+            expired = [
+                session_id for session_id, session in self._sessions.items()
+                if now - session.last_active > self.ttl_seconds
+            ]
+            for session_id in expired:
+                del self._sessions[session_id]
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> ChatSession:
+        """
+        获取会话（不存在时自动创建）
+
+        参数:
+            session_id: 会话 ID
+
+        返回:
+            会话对象
+        """
+        with self._lock:
+            now = time.time()
+            session = self._sessions.get(session_id)
+            if session is not None and self.ttl_seconds and now - session.last_active > self.ttl_seconds:
+                session = None
+
+            if session is None:
+                session = self.session_factory(session_id)
+                self._sessions[session_id] = session
+
+            session.touch()
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+            return session
+
+    def remove(self, session_id: str) -> bool:
+        """
+        关闭会话
+
+        返回:
+            会话是否存在
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def list_ids(self) -> List[str]:
+        """当前存活的会话 ID 列表"""
+        with self._lock:
+            self._evict(time.time())
+            return list(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
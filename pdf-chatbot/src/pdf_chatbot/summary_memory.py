@@ -0,0 +1,156 @@
+"""滚动摘要记忆模块（最近几轮原文 + 更早对话的摘要）"""
+import threading
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+from .text_utils import estimate_tokens
+from .context_packer import truncate_to_tokens
+
+
+SUMMARY_PROMPT = """请把下面的新对话合并进已有的对话摘要。
+保留用户关心的主题、关键事实、数字和结论，省略寒暄，摘要不超过 {max_tokens} 个字。
+
+已有摘要:
+{summary}
+
+新的对话:
+{dialogue}
+
+更新后的摘要:"""
+
+
+class RollingSummaryMemory:
+    """
+    滚动摘要记忆
+
+    功能:
+        - 最近 window_turns 轮对话保留原文
+        - 更早的轮次在后台线程中合并进摘要（不占用回答路径）
+        - 摘要尚未更新时，待合并的轮次仍以原文提供，上下文不会丢失
+
+    与 ConversationBufferMemory 的用法一致：
+    load_memory_variables / save_context / clear。
+    """
+
+    def __init__(
+        self,
+        llm,
+        executor: Executor,
+        window_turns: int = 4,
+        max_summary_tokens: int = 300,
+        pack_history: Optional[Callable[[list], list]] = None
+    ):
+        """
+        参数:
+            llm: 生成摘要的 LLM（非流式）
+            executor: 运行摘要任务的线程池（多个会话共享）
+            window_turns: 保留原文的最近轮数
+            max_summary_tokens: 摘要的 token 上限
+            pack_history: 可选，按 token 预算裁剪原文消息的函数
+        """
+        self.llm = llm
+        self.executor = executor
+        self.window_turns = window_turns
+        self.max_summary_tokens = max_summary_tokens
+        self.pack_history = pack_history
+
+        self.summary = ""
+        self._recent = []      # 最近几轮原文（问、答交替）
+        self._pending = []     # 等待合并进摘要的旧轮次
+        self._future = None
+        self._lock = threading.Lock()
+
+    def load_memory_variables(self, inputs: dict) -> dict:
+        """
+        读取对话记忆
+
+        返回:
+            {"chat_history": 消息列表}，摘要作为第一条系统消息
+        """
+        with self._lock:
+            summary = self.summary
+            messages = self._pending + self._recent
+
+        if self.pack_history is not None:
+            messages = self.pack_history(messages)
+        if summary:
+            messages = [SystemMessage(content=f"此前对话摘要: {summary}")] + messages
+        return {"chat_history": messages}
+
+    def save_context(self, inputs: dict, outputs: dict):
+        """
+        保存一轮对话，超出窗口的旧轮次交给后台合并进摘要
+
+        参数:
+            inputs: {"question": 问题}
+            outputs: {"answer": 答案}
+        """
+        with self._lock:
+            self._recent.extend([
+                HumanMessage(content=inputs["question"]),
+                AIMessage(content=outputs["answer"]),
+            ])
+            overflow = len(self._recent) - self.window_turns * 2
+            if overflow > 0:
+                self._pending.extend(self._recent[:overflow])
+                del self._recent[:overflow]
+            self._schedule()
+
+    def _schedule(self):
+        """有待合并的轮次且没有进行中的任务时，提交摘要任务（需持有锁）"""
+        if self._pending and (self._future is None or self._future.done()):
+            self._future = self.executor.submit(self._summarize)
+
+    def _summarize(self):
+        """后台任务：把待合并的轮次写入摘要"""
+        with self._lock:
+            summary = self.summary
+            batch = list(self._pending)
+
+        dialogue = "\n".join(
+            f"{'用户' if isinstance(message, HumanMessage) else '助手'}: {message.content}"
+            for message in batch
+        )
+        prompt = SUMMARY_PROMPT.format(
+            max_tokens=self.max_summary_tokens,
+            summary=summary or "（无）",
+            dialogue=dialogue
+        )
+
+        try:
+            new_summary = self.llm.predict(prompt).strip()
+        except Exception as e:
+            # 失败的轮次留在待合并列表中，下一轮再试
+            print(f"⚠️  对话摘要更新失败: {str(e)}")
+            return
+
+        if estimate_tokens(new_summary) > self.max_summary_tokens:
+            new_summary = truncate_to_tokens(new_summary, self.max_summary_tokens)
+
+        with self._lock:
+            # 只有这批轮次仍在队首时才更新（期间可能被 clear）
+            if self._pending[:len(batch)] == batch:
+                self.summary = new_summary
+                del self._pending[:len(batch)]
+            # 摘要期间又有轮次溢出时继续合并
+            self._future = None
+            self._schedule()
+
+    def wait(self, timeout: float = None):
+        """等待进行中的摘要任务完成（包括期间追加的任务）"""
+        while True:
+            future = self._future
+            if future is None:
+                return
+            future.result(timeout=timeout)
+            if self._future is future:
+                return
+
+    def clear(self):
+        """清空记忆和摘要"""
+        with self._lock:
+            self.summary = ""
+            self._recent = []
+            self._pending = []
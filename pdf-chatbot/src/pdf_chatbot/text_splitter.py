@@ -0,0 +1,415 @@
+"""文本切分模块（基于位置区间的单遍切分、跨页按句切分）"""
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain.schema import Document
+
+
+# 分隔符优先级：段落 → 换行 → 中文句末标点 → 空格 → 单个字符
+CHUNK_SEPARATORS = ["\n\n", "\n", "。", "！", "？", " ", ""]
+
+
+class TextSpan(NamedTuple):
+    """文档块在页面文本中的位置（page 为页面在输入列表中的下标）"""
+    page: int
+    offset: int
+    length: int
+
+
+class SpanTextSplitter:
+    """
+    基于位置区间的递归字符切分
+
+    与 RecursiveCharacterTextSplitter（keep_separator=True、strip_whitespace=True、
+    按字符数计算长度）的切分边界完全一致，但:
+        - 递归和合并只在 (起始, 结束) 位置上计算：在原文的区间内用 str.find 查找分隔符，
+          不再对每一段反复执行正则搜索、切分成子串再拼接
+        - 只按单个字符切分的长段（没有任何分隔符）直接按窗口计算边界
+        - 切分结果是 (页, 偏移, 长度) 区间，物化为 Document 时才截取字符串
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: Optional[Sequence[str]] = None
+    ):
+        """
+        参数:
+            chunk_size: 文档块最大字符数
+            chunk_overlap: 相邻文档块重叠字符数
+            separators: 分隔符（按优先级排列，普通字符串，默认 CHUNK_SEPARATORS）
+
+        异常:
+            ValueError: 重叠大于文档块大小
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"CHUNK_OVERLAP ({chunk_overlap}) 不能大于 CHUNK_SIZE ({chunk_size})")
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(CHUNK_SEPARATORS if separators is None else separators)
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        切分文本
+
+        参数:
+            text: 文本
+
+        返回:
+            文档块区间列表 [(起始, 结束)]
+        """
+        chunks: List[Tuple[int, int]] = []
+        self._split(text, 0, len(text), 0, chunks)
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """切分文本，返回文档块字符串"""
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_document_spans(self, documents: List[Document]) -> List[TextSpan]:
+        """
+        切分文档（不截取字符串）
+
+        参数:
+            documents: 页面文档列表
+
+        返回:
+            文档块区间列表
+        """
+        spans = []
+        for page, document in enumerate(documents):
+            spans.extend(
+                TextSpan(page, start, end - start)
+                for start, end in self.split_spans(document.page_content)
+            )
+        return spans
+
+    @staticmethod
+    def materialize(documents: List[Document], spans: List[TextSpan]) -> List[Document]:
+        """
+        按区间生成文档块
+
+        参数:
+            documents: split_document_spans 的输入文档
+            spans: 文档块区间
+
+        返回:
+            文档块列表（metadata 复制自所在页面）
+        """
+        # 字段类型已确定，跳过 pydantic 校验（构造耗时减半）
+        return [
+            Document.construct(
+                page_content=documents[span.page].page_content[span.offset:span.offset + span.length],
+                metadata=dict(documents[span.page].metadata)
+            )
+            for span in spans
+        ]
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """切分文档（与 RecursiveCharacterTextSplitter.split_documents 结果一致）"""
+        return self.materialize(documents, self.split_document_spans(documents))
+
+    @staticmethod
+    def _pieces(text: str, separator: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """
+        按分隔符切分 [start, end)，分隔符保留在后一段开头
+
+        与 re.split 一致：从 start 开始从左到右取不重叠的匹配，丢弃空段。
+        """
+        pieces = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _strip(self, text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+        """去掉区间首尾空白（与 str.strip 一致），为空时返回 None"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return (start, end) if start < end else None
+
+    def _split(self, text: str, start: int, end: int, level: int, chunks: List[Tuple[int, int]]):
+        """切分 [start, end)，从第 level 个分隔符开始尝试（对应 _split_text 的一层递归）"""
+        separators = self.separators[level:]
+        separator = separators[-1]
+        next_level = None
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                if i + 1 < len(separators):
+                    next_level = level + i + 1
+                break
+
+        if separator == "":
+            if self.chunk_size > 1:
+                # 每段一个字符，全部短于 chunk_size，合并结果就是固定步长的窗口
+                self._merge_characters(text, start, end, chunks)
+            else:
+                chunks.extend((i, i + 1) for i in range(start, end))
+            return
+
+        good: List[Tuple[int, int]] = []
+        for piece in self._pieces(text, separator, start, end):
+            if piece[1] - piece[0] < self.chunk_size:
+                good.append(piece)
+                continue
+            if good:
+                self._merge(text, good, chunks)
+                good = []
+            if next_level is None:
+                chunks.append(piece)
+            else:
+                self._split(text, piece[0], piece[1], next_level, chunks)
+        if good:
+            self._merge(text, good, chunks)
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int]], chunks: List[Tuple[int, int]]):
+        """
+        合并相邻的短段（对应 _merge_splits，分隔符已保留在段中，拼接时不再插入）
+
+        当前文档块始终是 pieces 中连续的一段，用首尾下标表示。
+        """
+        first = 0
+        total = 0
+        for i, (piece_start, piece_end) in enumerate(pieces):
+            length = piece_end - piece_start
+            if total + length > self.chunk_size and i > first:
+                span = self._strip(text, pieces[first][0], pieces[i - 1][1])
+                if span is not None:
+                    chunks.append(span)
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= pieces[first][1] - pieces[first][0]
+                    first += 1
+            total += length
+        if first < len(pieces):
+            span = self._strip(text, pieces[first][0], pieces[-1][1])
+            if span is not None:
+                chunks.append(span)
+
+    def _merge_characters(self, text: str, start: int, end: int, chunks: List[Tuple[int, int]]):
+        """逐字符合并的等价计算：长度 chunk_size 的窗口，步长 chunk_size - 重叠（至少 1）"""
+        step = self.chunk_size - min(self.chunk_overlap, self.chunk_size - 1)
+        window_start = start
+        while window_start + self.chunk_size < end:
+            span = self._strip(text, window_start, window_start + self.chunk_size)
+            if span is not None:
+                chunks.append(span)
+            window_start += step
+        span = self._strip(text, window_start, end)
+        if span is not None:
+            chunks.append(span)
+
+
+# 句子结束：中英文句末标点（英文句点后须为空白，避开小数和网址），
+# 可带右引号 / 右括号，连同其后的空白一起归入本句；空行也结束一个句子（段落边界）
+_SENTENCE_END_PATTERN = re.compile(
+    r"(?:[。！？；…]+|[!?;]+|\.(?=\s))[”’」』）)\"']*\s*"
+    r"|\n[ \t\u3000]*\n\s*"
+)
+
+
+class SentenceChunker:
+    """
+    跨页按句切分
+
+    把同一来源的页面文本视为连续的文本流（页与页之间以换行连接），先切成句子，
+    再把相邻句子装入不超过 chunk_size 的文档块:
+        - 文档块只在句子边界处断开，跨页的段落不再被页边界切成碎片
+        - 当前文档块已达到 chunk_size 的 70% 时，在段落边界（空行）处提前断开，不再重叠
+        - 在段落内断开的相邻文档块重叠不超过 chunk_overlap 的完整句子
+        - 超过 chunk_size 的长句用 SpanTextSplitter 继续切分
+
+    文档块 metadata 复制自起始页，page 为起始页，page_end 为结束页。
+    边读页面边产出文档块，内存只保留尚未产出的文本。
+    """
+
+    # 当前文档块达到 chunk_size 的该比例后，遇到段落边界就断开
+    PARAGRAPH_BREAK_RATIO = 0.7
+
+    # 未结束的句子超过 chunk_size 的该倍数时，在最后一个换行处强制断开
+    MAX_PENDING_RATIO = 4
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: Optional[Sequence[str]] = None):
+        """
+        参数:
+            chunk_size: 文档块最大字符数
+            chunk_overlap: 相邻文档块最多重叠的字符数（按完整句子计算）
+            separators: 长句继续切分时使用的分隔符（默认 CHUNK_SEPARATORS）
+
+        异常:
+            ValueError: 重叠大于文档块大小
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.long_sentence_splitter = SpanTextSplitter(chunk_size, chunk_overlap, separators)
+
+    def iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """
+        切分页面流
+
+        参数:
+            pages: 页面文档（按页序排列；来源变化时前一个来源的文本先全部产出）
+
+        返回:
+            文档块迭代器
+        """
+        stream = None
+        for page in pages:
+            source = page.metadata.get("source")
+            if stream is not None and stream.source != source:
+                yield from stream.finish()
+                stream = None
+            if stream is None:
+                stream = _SentenceStream(self, source)
+            yield from stream.feed(page)
+        if stream is not None:
+            yield from stream.finish()
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """切分文档（与 iter_chunks 相同，返回列表）"""
+        return list(self.iter_chunks(documents))
+
+
+class _SentenceStream:
+    """
+    单个来源的文本流
+
+    文本保存在 text 中，base 是 text[0] 在整个流中的位置；句子和文档块都用流中的绝对位置表示，
+    已产出且不再需要（不在重叠范围内）的文本会从 text 头部丢弃。
+    """
+
+    def __init__(self, chunker: SentenceChunker, source):
+        self.chunker = chunker
+        self.source = source
+        self.text = ""
+        self.base = 0
+        self.scanned = 0                        # 已切成句子的位置
+        self.page_starts: List[int] = []        # 每页在流中的起始位置
+        self.page_docs: List[Document] = []
+        self.page_numbers: List[int] = []       # 页码（metadata 中没有 page 时按读取顺序编号）
+        self.page_count = 0
+        self.sentences: List[Tuple[int, int]] = []   # 当前文档块的句子 (起始, 结束)
+        self.size = 0
+        self.paragraph_start = True
+
+    def feed(self, page: Document) -> Iterator[Document]:
+        if self.text and not self.text.endswith("\n"):
+            self.text += "\n"
+        self.page_starts.append(self.base + len(self.text))
+        self.page_docs.append(page)
+        self.page_numbers.append(page.metadata.get("page", self.page_count))
+        self.page_count += 1
+        self.text += page.page_content
+        return self._consume(final=False)
+
+    def finish(self) -> Iterator[Document]:
+        yield from self._consume(final=True)
+        if self.sentences:
+            yield from self._emit(self.sentences[0][0], self.sentences[-1][1])
+
+    def _consume(self, final: bool) -> Iterator[Document]:
+        """把已完整的句子装入文档块（未结束的句子留到下一页）"""
+        end = self.base + len(self.text)
+        for match in _SENTENCE_END_PATTERN.finditer(self.text, self.scanned - self.base):
+            # 匹配到文本末尾时，句末空白可能延续到下一页，等下一页再判断
+            if match.end() == len(self.text) and not final:
+                break
+            yield from self._add_sentence(self.scanned, self.base + match.end())
+            self.paragraph_start = match.group().count("\n") >= 2
+        if final and self.scanned < end:
+            yield from self._add_sentence(self.scanned, end)
+        elif end - self.scanned > self.chunker.chunk_size * self.chunker.MAX_PENDING_RATIO:
+            # 长时间没有句末标点（表格、代码等），在最后一个换行处断开，避免文本无限累积
+            cut = self.text.rfind("\n", self.scanned - self.base)
+            cut = self.base + cut + 1 if cut > self.scanned - self.base else end
+            yield from self._add_sentence(self.scanned, cut)
+        self._trim()
+
+    def _add_sentence(self, start: int, end: int) -> Iterator[Document]:
+        chunker = self.chunker
+        self.scanned = end
+        length = end - start
+        if not self._text(start, end).strip():
+            return
+
+        if length > chunker.chunk_size:
+            # 长句：先产出当前文档块，长句单独切分，不与前后句重叠
+            if self.sentences:
+                yield from self._emit(self.sentences[0][0], self.sentences[-1][1])
+            self.sentences = []
+            self.size = 0
+            for piece_start, piece_end in chunker.long_sentence_splitter.split_spans(self._text(start, end)):
+                yield from self._emit(start + piece_start, start + piece_end)
+            return
+
+        paragraph_break = (
+            self.paragraph_start
+            and self.size >= chunker.chunk_size * chunker.PARAGRAPH_BREAK_RATIO
+        )
+        if self.sentences and (self.size + length > chunker.chunk_size or paragraph_break):
+            yield from self._emit(self.sentences[0][0], self.sentences[-1][1])
+            # 保留末尾不超过 chunk_overlap 的完整句子作为重叠（段落边界处不重叠）
+            kept = []
+            overlap = 0
+            if not paragraph_break:
+                for sentence in reversed(self.sentences):
+                    sentence_length = sentence[1] - sentence[0]
+                    if overlap + sentence_length > chunker.chunk_overlap:
+                        break
+                    kept.append(sentence)
+                    overlap += sentence_length
+            kept.reverse()
+            while kept and overlap + length > chunker.chunk_size:
+                overlap -= kept[0][1] - kept[0][0]
+                kept.pop(0)
+            self.sentences = kept
+            self.size = overlap
+
+        self.sentences.append((start, end))
+        self.size += length
+
+    def _emit(self, start: int, end: int) -> Iterator[Document]:
+        """产出 [start, end) 的文档块（去掉首尾空白）"""
+        text = self._text(start, end)
+        stripped = text.strip()
+        if not stripped:
+            return
+        start += len(text) - len(text.lstrip())
+        end = start + len(stripped)
+
+        first = bisect_right(self.page_starts, start) - 1
+        last = bisect_right(self.page_starts, end - 1) - 1
+        metadata = dict(self.page_docs[first].metadata)
+        metadata["page"] = self.page_numbers[first]
+        metadata["page_end"] = self.page_numbers[last]
+        yield Document(page_content=stripped, metadata=metadata)
+
+    def _text(self, start: int, end: int) -> str:
+        return self.text[start - self.base:end - self.base]
+
+    def _trim(self):
+        """丢弃不再需要的文本和页面（当前文档块的第一个句子之前）"""
+        keep_from = self.sentences[0][0] if self.sentences else self.scanned
+        if keep_from > self.base:
+            self.text = self.text[keep_from - self.base:]
+            self.base = keep_from
+        # 保留 keep_from 所在的页
+        first = max(0, bisect_right(self.page_starts, keep_from) - 1)
+        if first:
+            del self.page_starts[:first]
+            del self.page_docs[:first]
+            del self.page_numbers[:first]
@@ -0,0 +1,27 @@
+"""文本工具模块"""
+import re
+
+# 中日韩字符及全角标点
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数（不依赖 tiktoken）
+
+    规则:
+        - 中日韩字符：每个字符约 1 个 token
+        - 其他字符：约 4 个字符 1 个 token
+
+    参数:
+        text: 文本
+
+    返回:
+        估算的 token 数
+    """
+    if not text:
+        return 0
+
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + 3) // 4
@@ -1,51 +1,209 @@
 """向量存储模块"""
 import os
-import time
-from typing import List
-from langchain.vectorstores import Chroma
-from langchain.embeddings import OpenAIEmbeddings, HuggingFaceEmbeddings
+import re
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Iterable, Optional
 from langchain.schema import Document
+from langchain.embeddings.base import Embeddings
 
 from .config import Config
+from .embedding_engine import BatchedEmbeddings
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .local_embeddings import create_local_embeddings, cache_model_name
+from .bm25_index import BM25Index, reciprocal_rank_fusion
+from .index_backend import VectorIndex, create_vector_index
+from .search_filter import SearchFilter
+
+
+def compute_chunk_id(document: Document) -> str:
+    """
+    计算文档块的稳定 ID
+
+    ID 由来源、页码和内容哈希共同决定：内容不变的文档块在重新导入时
+    得到相同的 ID，因此可以直接跳过向量化。
+
+    参数:
+        document: 文档块
+
+    返回:
+        文档块 ID（十六进制字符串）
+    """
+    source = str(document.metadata.get("source", ""))
+    page = str(document.metadata.get("page", ""))
+    content_hash = hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+    key = f"{source}\x00{page}\x00{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def new_batch_id() -> str:
+    """生成导入批次 ID（时间 + 随机后缀，如 20240501-153000-a1b2c3）"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def stamp_batch_id(documents: List[Document], batch_id: str):
+    """给文档块写入导入批次（已有批次的文档块保持不变）"""
+    for doc in documents:
+        doc.metadata.setdefault("batch_id", batch_id)
+
+
+# 集合名称：字母、数字、下划线和连字符（同时用作目录名）
+COLLECTION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 
 class VectorStoreManager:
-    """向量数据库管理类"""
+    """
+    向量数据库管理类
+
+    默认管理 Config.CHROMA_PERSIST_DIR 中的向量数据库；命名集合（每个产品线 / 租户一个）
+    通过 collection(name) 获取，保存在 Config.COLLECTIONS_DIR/<名称>：
+        - 所有集合共享同一个 Embedding 模型实例和问题向量缓存
+        - 集合在第一次检索时才打开
+        - 同时打开的集合超过 Config.MAX_OPEN_COLLECTIONS 时，关闭最久未使用的集合
+    """
+
+    def __init__(self, embeddings: Embeddings = None, collection: Optional[str] = None):
+        """
+        初始化向量数据库管理器
+
+        参数:
+            embeddings: Embedding 模型（默认根据配置创建，可传入已有实例或测试用的模拟模型）
+            collection: 集合名称（默认管理 Config.CHROMA_PERSIST_DIR 中的向量数据库）
+
+        异常:
+            ValueError: 集合名称不合法
+        """
+        self.collection_name = collection
+        self.persist_dir = self.collection_dir(collection)
+
+        # 批量导入期间才启动工作进程的本地 Embedding（EMBEDDING_WORKERS > 0，见 embedding_pool）
+        self._pooled_embeddings = None
 
-    def __init__(self):
         try:
             # 根据配置选择 Embedding 模型
-            if Config.EMBEDDING_PROVIDER == "openai":
+            if embeddings is not None:
+                self.embeddings = embeddings
+            elif Config.EMBEDDING_PROVIDER == "openai":
+                # 只导入所选提供商的客户端
+                from langchain.embeddings import OpenAIEmbeddings
+
                 print(f"🔧 使用 OpenAI Embedding: {Config.EMBEDDING_MODEL}")
-                self.embeddings = OpenAIEmbeddings(
-                    model=Config.EMBEDDING_MODEL,
-                    openai_api_key=Config.OPENAI_API_KEY
+                openai_kwargs = {}
+                if Config.OPENAI_API_BASE:
+                    openai_kwargs["openai_api_base"] = Config.OPENAI_API_BASE
+                # 重试由 BatchedEmbeddings 按批处理，底层客户端不再整体重试
+                self.embeddings = BatchedEmbeddings(
+                    OpenAIEmbeddings(
+                        model=Config.EMBEDDING_MODEL,
+                        openai_api_key=Config.OPENAI_API_KEY,
+                        max_retries=0,
+                        **openai_kwargs
+                    )
                 )
             elif Config.EMBEDDING_PROVIDER == "local":
-                print(f"🔧 使用本地 Embedding: {Config.LOCAL_EMBEDDING_MODEL}")
-                print("📥 首次使用会自动下载模型（约 100MB），请稍候...")
-                self.embeddings = HuggingFaceEmbeddings(
-                    model_name=Config.LOCAL_EMBEDDING_MODEL,
-                    model_kwargs={'device': 'cpu'},  # 使用 CPU（无需 GPU）
-                    encode_kwargs={'normalize_embeddings': True}  # 归一化向量
-                )
-                print("✅ 本地 Embedding 模型加载完成")
+                # 推理后端（torch / onnx）、批大小、线程数和启动预热见 local_embeddings
+                if Config.EMBEDDING_WORKERS > 0:
+                    from .embedding_pool import IngestPoolEmbeddings
+
+                    self._pooled_embeddings = IngestPoolEmbeddings(Config.EMBEDDING_WORKERS)
+                    self.embeddings = self._pooled_embeddings
+                else:
+                    self.embeddings = create_local_embeddings()
             else:
                 raise ValueError(f"不支持的 Embedding 提供商: {Config.EMBEDDING_PROVIDER}")
 
+            # 磁盘缓存：重复导入和重复提问不再重新向量化
+            if Config.EMBEDDING_CACHE and embeddings is None:
+                model_name = (
+                    Config.EMBEDDING_MODEL if Config.EMBEDDING_PROVIDER == "openai"
+                    else cache_model_name()
+                )
+                self.embeddings = CachedEmbeddings(
+                    self.embeddings,
+                    EmbeddingCache(
+                        Config.EMBEDDING_CACHE_DIR,
+                        model_name,
+                        Config.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+                    )
+                )
+                print(f"💾 Embedding 缓存已开启: {Config.EMBEDDING_CACHE_DIR}")
+
+            # 向量索引后端（VECTOR_BACKEND：chroma / local）
             self.vectorstore = None
+
+            # BM25 关键词索引（与向量数据库使用相同的文档块和 ID）
+            self.bm25_index = None
+            # 加载后是否已检查 BM25 索引与向量数据库一致
+            self._bm25_synced = False
+
+            # 向量数据库版本：每次写入后递增，用于让依赖检索结果的缓存失效
+            self.index_version = 0
+
+            # 最近问题的向量（同一问题在缓存查找和检索中只向量化一次）
+            self._query_embeddings = OrderedDict()
+            self._query_lock = threading.Lock()
+
+            # 命名集合的管理器：每个集合只创建一个，关闭后再次使用时由同一个管理器重新打开，
+            # 同一目录不会同时被两个管理器写入；集合记录所属的父管理器
+            self._collection_managers: Dict[str, "VectorStoreManager"] = {}
+            self._parent: Optional["VectorStoreManager"] = None
+            # 已打开（或正在使用）的命名集合（按最近使用排序）
+            self._collections = OrderedDict()
+            self._collections_lock = threading.Lock()
+
+            # 正在使用向量索引的检索 / 写入数量（关闭集合时等待它们结束）
+            self._users = 0
+            self._users_changed = threading.Condition(threading.RLock())
+            # 已移出父管理器的已打开列表，最后一个使用者结束时关闭
+            self._retired = False
+            # 批量导入时推迟保存的嵌套层数（见 deferred_save）
+            self._save_deferred = 0
         except Exception as e:
             raise Exception(f"初始化 Embedding 模型失败: {str(e)}")
 
-    def create_vectorstore(self, documents: List[Document]) -> Chroma:
+    # 单次写入向量索引的最大文档块数量
+    INDEX_BATCH_SIZE = 500
+
+    # BM25 索引文件名（保存在向量数据库目录中）
+    BM25_INDEX_FILENAME = "bm25_index.json"
+
+    def _open_bm25_index(self):
+        """打开 BM25 索引（未开启 BM25_INDEX 时返回 None）"""
+        if Config.BM25_INDEX and self.bm25_index is None:
+            self.bm25_index = BM25Index(
+                os.path.join(self.persist_dir, self.BM25_INDEX_FILENAME),
+                tokenizer=Config.BM25_TOKENIZER
+            )
+        return self.bm25_index
+
+    def _open_vectorstore(self) -> VectorIndex:
+        """打开（或创建）配置的向量索引后端"""
+        if self.vectorstore is None:
+            self.vectorstore = create_vector_index(
+                Config.VECTOR_BACKEND, self.persist_dir, self.embeddings
+            )
+        return self.vectorstore
+
+    def create_vectorstore(
+        self,
+        documents: List[Document],
+        incremental: bool = None,
+        batch_id: Optional[str] = None
+    ) -> VectorIndex:
         """
         创建向量数据库
 
         参数:
             documents: 文档列表
+            incremental: 是否使用增量索引（默认读取 Config.INCREMENTAL_INDEX）
+            batch_id: 导入批次（写入每个文档块的 metadata["batch_id"]，默认新生成）
 
         返回:
-            向量数据库对象
+            向量索引后端
 
         异常:
             ValueError: 文档列表为空
@@ -54,6 +212,16 @@ class VectorStoreManager:
         if not documents:
             raise ValueError("文档列表为空，无法创建向量数据库")
 
+        if incremental is None:
+            incremental = Config.INCREMENTAL_INDEX
+
+        batch_id = batch_id or new_batch_id()
+        stamp_batch_id(documents, batch_id)
+
+        if incremental:
+            self.index_documents(documents, batch_id=batch_id)
+            return self.vectorstore
+
         print(f"🔄 正在向量化 {len(documents)} 个文档块...")
 
         # 根据 Embedding 提供商显示不同的时间估计
@@ -62,117 +230,586 @@ class VectorStoreManager:
         else:
             print(f"⏱️  预计需要 {len(documents) * 0.1:.0f} 秒（本地处理）")
 
-        max_retries = 3
-        retry_delay = 2
+        # 分批写入：某一批失败时，之前已写入的批次会保留在数据库中
+        try:
+            with self._in_use():
+                self._open_vectorstore()
 
-        for attempt in range(max_retries):
-            try:
-                self.vectorstore = Chroma.from_documents(
-                    documents=documents,
-                    embedding=self.embeddings,
-                    persist_directory=Config.CHROMA_PERSIST_DIR
-                )
+                bm25_index = self._open_bm25_index()
+
+                for start in range(0, len(documents), self.INDEX_BATCH_SIZE):
+                    batch = documents[start:start + self.INDEX_BATCH_SIZE]
+                    self.vectorstore.add_documents(batch)
+                    if bm25_index is not None:
+                        bm25_index.add_documents([compute_chunk_id(doc) for doc in batch], batch)
 
                 # 持久化保存
-                self.vectorstore.persist()
-                print(f"✅ 向量数据库创建完成，已保存到 {Config.CHROMA_PERSIST_DIR}")
+                self._persist_vectorstore()
+                self._save_bm25_index()
+                self.index_version += 1
+                print(f"✅ 向量数据库创建完成，已保存到 {self.persist_dir}")
 
                 return self.vectorstore
 
+        except Exception as e:
+            error_msg = str(e)
+
+            # 检测常见错误类型（仅 OpenAI，限流和超时已在 BatchedEmbeddings 中按批重试）
+            if Config.EMBEDDING_PROVIDER == "openai":
+                if "api key" in error_msg.lower() or "authentication" in error_msg.lower():
+                    raise ValueError("OpenAI API Key 无效或已过期，请检查 .env 配置")
+                elif "rate limit" in error_msg.lower():
+                    raise Exception("API 调用频率限制，请稍后再试")
+                elif "timeout" in error_msg.lower() or "connection" in error_msg.lower():
+                    raise Exception("网络连接失败，请检查网络连接")
+
+            # 通用错误处理
+            raise Exception(f"创建向量数据库失败: {error_msg}")
+
+    def index_documents(self, documents: List[Document], batch_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        增量索引文档块
+
+        每个文档块使用 compute_chunk_id 生成稳定 ID：
+            - 已存在的文档块直接跳过（不重新向量化）
+            - 新的文档块向量化后写入
+            - 同一来源中已不存在的旧文档块从集合中删除
+
+        参数:
+            documents: 文档块列表（通常是一个或多个 PDF 的全部文档块）
+            batch_id: 导入批次（默认新生成）
+
+        返回:
+            统计字典 {"added": 新增数, "skipped": 跳过数, "deleted": 删除数, "batch_id": 导入批次}
+
+        异常:
+            ValueError: 文档列表为空
+            Exception: 向量化或保存失败
+        """
+        if not documents:
+            raise ValueError("文档列表为空，无法创建向量数据库")
+
+        return self.index_batches([documents], batch_id=batch_id)
+
+    def index_batches(self, batches: Iterable[List[Document]], batch_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        增量索引文档块批次（流式）
+
+        与 index_documents 相同的增量规则，但按批消费文档块：每批新文档块
+        立即向量化写入，整个过程只在内存中保留文档块 ID。所有批次处理完后，
+        再删除涉及来源中未再出现的过期文档块。
+
+        参数:
+            batches: 文档块批次迭代器（如 DocumentProcessor.iter_chunk_batches）
+            batch_id: 导入批次（新增的文档块写入 metadata["batch_id"]，默认新生成；
+                      内容未变化而跳过的文档块保留原来的批次）
+
+        返回:
+            统计字典 {"added": 新增数, "skipped": 跳过数, "deleted": 删除数, "batch_id": 导入批次}
+
+        异常:
+            ValueError: 没有任何文档块
+            Exception: 向量化或保存失败
+        """
+        with self._in_use():
+            self._open_vectorstore()
+
+            bm25_index = self._open_bm25_index()
+
+            existing_ids = set()   # 涉及来源在集合中已有的文档块
+            seen_sources = set()
+            seen_ids = set()       # 本次导入产生的文档块
+            added = 0
+            skipped = 0
+
+            batch_id = batch_id or new_batch_id()
+
+            for batch in batches:
+                stamp_batch_id(batch, batch_id)
+
+                # 首次遇到的来源，查询其已有的文档块 ID
+                sources = {str(doc.metadata.get("source", "")) for doc in batch} - seen_sources
+                try:
+                    for source in sources:
+                        existing_ids.update(self.vectorstore.get_ids({"source": source}))
+                except Exception as e:
+                    raise Exception(f"读取向量数据库失败: {str(e)}")
+                seen_sources.update(sources)
+
+                # 计算 ID，同一页内容完全相同的文档块只保留一份
+                new_chunks = {}
+                for doc in batch:
+                    chunk_id = compute_chunk_id(doc)
+                    if chunk_id in seen_ids:
+                        continue
+                    seen_ids.add(chunk_id)
+                    if chunk_id in existing_ids:
+                        skipped += 1
+                        # 补齐 BM25 索引中缺失的文档块（如之前未开启 BM25_INDEX）
+                        if bm25_index is not None and chunk_id not in bm25_index:
+                            bm25_index.add(chunk_id, doc)
+                    else:
+                        new_chunks[chunk_id] = doc
+
+                try:
+                    new_ids = list(new_chunks)
+                    for start in range(0, len(new_ids), self.INDEX_BATCH_SIZE):
+                        batch_ids = new_ids[start:start + self.INDEX_BATCH_SIZE]
+                        batch_docs = [new_chunks[chunk_id] for chunk_id in batch_ids]
+                        self.vectorstore.add_documents(batch_docs, ids=batch_ids)
+                        if bm25_index is not None:
+                            bm25_index.add_documents(batch_ids, batch_docs)
+                except Exception as e:
+                    raise Exception(f"增量索引失败: {str(e)}")
+                added += len(new_chunks)
+
+            if not seen_ids:
+                raise ValueError("文档列表为空，无法创建向量数据库")
+
+            stale_ids = list(existing_ids - seen_ids)
+
+            try:
+                for start in range(0, len(stale_ids), self.INDEX_BATCH_SIZE):
+                    self.vectorstore.delete(stale_ids[start:start + self.INDEX_BATCH_SIZE])
+
+                self._persist_vectorstore()
+                if bm25_index is not None:
+                    bm25_index.remove(stale_ids)
+                self._save_bm25_index()
             except Exception as e:
-                error_msg = str(e)
-
-                # 检测常见错误类型（仅 OpenAI）
-                if Config.EMBEDDING_PROVIDER == "openai":
-                    if "api key" in error_msg.lower() or "authentication" in error_msg.lower():
-                        raise ValueError("OpenAI API Key 无效或已过期，请检查 .env 配置")
-                    elif "rate limit" in error_msg.lower():
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (attempt + 1)
-                            print(f"⚠️  API 调用频率限制，{wait_time} 秒后重试...")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception("API 调用频率限制，请稍后再试")
-                    elif "timeout" in error_msg.lower() or "connection" in error_msg.lower():
-                        if attempt < max_retries - 1:
-                            print(f"⚠️  网络超时，正在重试（{attempt + 1}/{max_retries}）...")
-                            time.sleep(retry_delay)
-                            continue
-                        else:
-                            raise Exception("网络连接失败，请检查网络连接")
-
-                # 通用错误处理
-                raise Exception(f"创建向量数据库失败: {error_msg}")
-
-    def load_vectorstore(self) -> Chroma:
+                raise Exception(f"增量索引失败: {str(e)}")
+
+            if added or stale_ids:
+                self.index_version += 1
+
+            print(f"🔄 增量索引: 新增 {added} 个，跳过 {skipped} 个未变化，"
+                  f"删除 {len(stale_ids)} 个过期文档块")
+            print(f"✅ 向量数据库已更新，已保存到 {self.persist_dir}")
+
+            return {"added": added, "skipped": skipped, "deleted": len(stale_ids), "batch_id": batch_id}
+
+    def load_vectorstore(self) -> VectorIndex:
         """
         加载已存在的向量数据库
 
         返回:
-            向量数据库对象
+            向量索引后端
 
         异常:
             FileNotFoundError: 向量数据库不存在
             Exception: 加载失败
         """
-        if not os.path.exists(Config.CHROMA_PERSIST_DIR):
+        if not self.exists():
             raise FileNotFoundError(
-                f"向量数据库不存在: {Config.CHROMA_PERSIST_DIR}\n"
+                f"向量数据库不存在: {self.persist_dir}\n"
                 "请先加载 PDF 文件创建向量数据库"
             )
 
         print(f"📂 正在加载向量数据库...")
 
         try:
-            self.vectorstore = Chroma(
-                persist_directory=Config.CHROMA_PERSIST_DIR,
-                embedding_function=self.embeddings
-            )
+            self.vectorstore = None
+            self._open_vectorstore()
 
             # 验证数据库是否可用
-            collection_count = self.vectorstore._collection.count()
+            collection_count = self.vectorstore.count()
             if collection_count == 0:
                 raise ValueError("向量数据库为空，请重新创建")
 
-            print(f"✅ 向量数据库加载完成（包含 {collection_count} 个文档块）")
+            print(f"✅ 向量数据库加载完成（{self.vectorstore.name}，包含 {collection_count} 个文档块）")
+
+            # 检索模式用到 BM25 时立即补齐索引，否则推迟到第一次关键词检索
+            self._bm25_synced = False
+            if Config.RETRIEVAL_MODE in ("bm25", "hybrid"):
+                self._ensure_bm25_synced()
             return self.vectorstore
 
         except Exception as e:
             raise Exception(f"加载向量数据库失败: {str(e)}")
 
-    def search(self, query: str, k: int = 3) -> List[Document]:
+    @contextmanager
+    def embedding_pool(self):
         """
-        搜索相关文档
+        批量导入期间用多进程向量化文档块
+
+        EMBEDDING_WORKERS > 0 且使用本地 Embedding 时，进入时启动工作进程，最外层退出时关闭；
+        其他情况不做任何事。查询始终在当前进程中向量化。
+
+        异常:
+            Exception: 工作进程加载模型失败
+        """
+        if self._pooled_embeddings is None:
+            yield
+            return
+        with self._pooled_embeddings.ingest_pool():
+            yield
+
+    @contextmanager
+    def deferred_save(self):
+        """
+        批量导入期间推迟保存向量索引和 BM25 索引
+
+        bm25_index.json 和进程内索引的 local_index.json 每次保存都会重写整个文件；
+        多文件导入时每个文件都保存一次，写入量随文件数平方增长。
+        在此上下文中的写入只更新内存中的索引（进程内索引的向量和文档块照常追加到磁盘），
+        退出时（包括出错时）保存一次。可以嵌套，最外层退出时保存。
+        """
+        with self._in_use():
+            with self._users_changed:
+                self._save_deferred += 1
+            try:
+                yield
+            finally:
+                with self._users_changed:
+                    self._save_deferred -= 1
+                    if not self._save_deferred:
+                        self._persist_vectorstore()
+                        self._save_bm25_index()
+
+    def _persist_vectorstore(self):
+        """保存向量索引（处于 deferred_save 中时推迟到退出时）"""
+        if self._save_deferred or self.vectorstore is None:
+            return
+        self.vectorstore.persist()
+
+    def _save_bm25_index(self):
+        """保存 BM25 索引（处于 deferred_save 中时推迟到退出时）"""
+        if self._save_deferred or self.bm25_index is None:
+            return
+        self.bm25_index.save()
+
+    def _ensure_bm25_synced(self):
+        """每次加载向量数据库后，在第一次用到 BM25 索引时检查一次是否需要重建"""
+        with self._users_changed:
+            if not self._bm25_synced:
+                self._sync_bm25_index(self.vectorstore.count())
+                self._bm25_synced = True
+
+    def _sync_bm25_index(self, collection_count: int):
+        """
+        加载 BM25 索引，与向量数据库数量不一致时从向量数据库重建
+
+        旧版本创建的数据库没有 BM25 索引，首次加载时自动补建。
+        """
+        bm25_index = self._open_bm25_index()
+        if bm25_index is None or len(bm25_index) == collection_count:
+            return
+
+        print(f"🔄 正在从向量数据库重建 BM25 索引（{collection_count} 个文档块）...")
+        bm25_index.clear()
+        for offset in range(0, collection_count, self.INDEX_BATCH_SIZE):
+            for document in self.vectorstore.get_documents(self.INDEX_BATCH_SIZE, offset):
+                bm25_index.add(compute_chunk_id(document), document)
+        bm25_index.save()
+        print(f"✅ BM25 索引重建完成（包含 {len(bm25_index)} 个文档块）")
+
+    @staticmethod
+    def collection_dir(name: Optional[str]) -> str:
+        """
+        集合的数据库目录
 
         参数:
-            query: 查询问题
-            k: 返回结果数量
+            name: 集合名称（None 表示默认向量数据库 Config.CHROMA_PERSIST_DIR）
 
         返回:
-            相关文档列表
+            数据库目录
+
+        异常:
+            ValueError: 集合名称不合法
+        """
+        if name is None:
+            return Config.CHROMA_PERSIST_DIR
+        if not COLLECTION_NAME_PATTERN.match(name):
+            raise ValueError(f"集合名称不合法: {name}（只能包含字母、数字、下划线和连字符）")
+        return os.path.join(Config.COLLECTIONS_DIR, name)
+
+    def exists(self) -> bool:
+        """向量数据库目录是否存在"""
+        return os.path.exists(self.persist_dir)
+
+    @contextmanager
+    def _in_use(self):
+        """
+        标记正在使用向量索引（close 会等待使用结束）
+
+        命名集合先计数再登记到父管理器的已打开列表：已被关闭的集合再次使用时重新登记，
+        重新打开的索引仍受 MAX_OPEN_COLLECTIONS 管理；使用期间被移出列表的集合
+        由最后一个使用者关闭。
         """
+        with self._users_changed:
+            self._users += 1
+        try:
+            if self._parent is not None:
+                self._parent._touch_collection(self)
+            yield
+        finally:
+            with self._users_changed:
+                self._users -= 1
+                if not self._users and self._retired:
+                    self._close_index()
+                self._users_changed.notify_all()
+
+    def _ensure_loaded(self):
+        """向量索引未打开且数据库已存在时打开（集合在第一次检索时才加载）"""
+        with self._users_changed:
+            if self.vectorstore is None and self.exists():
+                self.load_vectorstore()
         if not self.vectorstore:
             raise ValueError("向量数据库未初始化！请先创建或加载向量数据库")
 
-        results = self.vectorstore.similarity_search(query, k=k)
-        return results
+    def close(self):
+        """
+        关闭向量索引，释放内存和文件句柄
+
+        等待正在进行的检索和写入结束后关闭；之后再检索时重新打开。
+        同时关闭已打开的命名集合。
+        """
+        with self._collections_lock:
+            collections = list(self._collections.values())
+            self._collections.clear()
+        for manager in collections:
+            manager.close()
+
+        with self._users_changed:
+            while self._users:
+                self._users_changed.wait()
+            self._close_index()
+
+    def _close_index(self):
+        """释放向量索引和 BM25 索引（需持有 _users_changed）"""
+        if self.vectorstore is not None:
+            self.vectorstore.close()
+        self.vectorstore = None
+        self.bm25_index = None
+
+    def collection(self, name: Optional[str]) -> "VectorStoreManager":
+        """
+        获取命名集合
+
+        返回的管理器与当前管理器共享 Embedding 模型和问题向量缓存，
+        向量索引在第一次检索时才打开。集合数量超过 Config.MAX_OPEN_COLLECTIONS 时，
+        关闭最久未使用的集合；同一集合始终返回同一个管理器，已关闭的集合再次使用时
+        自动重新打开并重新计入打开数量。
+
+        参数:
+            name: 集合名称（None 表示默认向量数据库，即当前管理器）
+
+        返回:
+            该集合的向量存储管理器
+
+        异常:
+            ValueError: 集合名称不合法
+        """
+        if name is None or name == self.collection_name:
+            return self
+
+        with self._collections_lock:
+            manager = self._collection_managers.get(name)
+            if manager is None:
+                manager = VectorStoreManager(embeddings=self.embeddings, collection=name)
+                manager._query_embeddings = self._query_embeddings
+                manager._query_lock = self._query_lock
+                manager._pooled_embeddings = self._pooled_embeddings
+                manager._parent = self
+                self._collection_managers[name] = manager
+
+        self._touch_collection(manager)
+        return manager
+
+    def _touch_collection(self, manager: "VectorStoreManager"):
+        """
+        把集合标记为最近使用，超过 Config.MAX_OPEN_COLLECTIONS 时关闭最久未使用的集合
+
+        被移出的集合不在这里等待：空闲的立即关闭，正在使用的由最后一个使用者关闭
+        （两个线程互相移出对方正在使用的集合时不会互相等待）。
+        """
+        name = manager.collection_name
+        evicted = []
+        with self._collections_lock:
+            with manager._users_changed:
+                manager._retired = False
+            self._collections[name] = manager
+            self._collections.move_to_end(name)
+
+            while len(self._collections) > Config.MAX_OPEN_COLLECTIONS:
+                evicted_name, evicted_manager = self._collections.popitem(last=False)
+                with evicted_manager._users_changed:
+                    evicted_manager._retired = True
+                evicted.append((evicted_name, evicted_manager))
+
+        # 在锁外关闭
+        for evicted_name, evicted_manager in evicted:
+            with evicted_manager._users_changed:
+                if evicted_manager._users or not evicted_manager._retired:
+                    continue
+                if evicted_manager.vectorstore is not None:
+                    print(f"📦 关闭最久未使用的集合: {evicted_name}")
+                evicted_manager._close_index()
+
+    def open_collections(self) -> List[str]:
+        """当前已打开向量索引的命名集合（按最近使用排序）"""
+        with self._collections_lock:
+            return [
+                name for name, manager in self._collections.items()
+                if manager.vectorstore is not None
+            ]
+
+    @staticmethod
+    def list_collections() -> List[str]:
+        """Config.COLLECTIONS_DIR 中已有的命名集合"""
+        if not os.path.isdir(Config.COLLECTIONS_DIR):
+            return []
+        return sorted(
+            name for name in os.listdir(Config.COLLECTIONS_DIR)
+            if COLLECTION_NAME_PATTERN.match(name)
+            and os.path.isdir(os.path.join(Config.COLLECTIONS_DIR, name))
+        )
+
+    # 内存中保留的最近问题向量数量
+    QUERY_EMBEDDING_CACHE_SIZE = 256
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        向量化查询问题（最近的问题在内存中复用）
+
+        参数:
+            query: 查询问题
+
+        返回:
+            问题向量
+        """
+        with self._query_lock:
+            if query in self._query_embeddings:
+                self._query_embeddings.move_to_end(query)
+                return self._query_embeddings[query]
+
+        embedding = self.embeddings.embed_query(query)
+
+        with self._query_lock:
+            self._query_embeddings[query] = embedding
+            while len(self._query_embeddings) > self.QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+
+        return embedding
+
+    def search(self, query: str, k: int = 3, search_filter: Optional[SearchFilter] = None) -> List[Document]:
+        """
+        搜索相关文档
+
+        参数:
+            query: 查询问题
+            k: 返回结果数量
+            search_filter: 过滤条件（来源、页码范围、导入批次）
 
-    def search_with_score(self, query: str, k: int = 3) -> List[tuple]:
+        返回:
+            相关文档列表
+        """
+        return [doc for doc, _ in self.search_with_score(query, k=k, search_filter=search_filter)]
+
+    def search_with_score(
+        self,
+        query: str,
+        k: int = 3,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[tuple]:
         """
         搜索相关文档（包含相似度分数）
 
+        过滤条件在向量索引内执行，只在满足条件的文档块中取前 k 个。
+
         参数:
             query: 查询问题
             k: 返回结果数量
+            search_filter: 过滤条件（来源、页码范围、导入批次）
 
         返回:
             (Document, score) 元组列表
             - Document: 文档对象
             - score: 相似度分数（距离，越小越相似）
         """
-        if not self.vectorstore:
-            raise ValueError("向量数据库未初始化！请先创建或加载向量数据库")
+        embedding = self.embed_query(query)
+        with self._in_use():
+            self._ensure_loaded()
+            return self.vectorstore.search_by_vector(embedding, k=k, search_filter=search_filter)
+
+    def search_bm25(
+        self,
+        query: str,
+        k: int = 3,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[tuple]:
+        """
+        BM25 关键词检索
+
+        参数:
+            query: 查询问题
+            k: 返回结果数量
+            search_filter: 过滤条件（不满足条件的文档块不参与打分）
+
+        返回:
+            (Document, score) 元组列表（BM25 分数，越大越相关）
+        """
+        if not Config.BM25_INDEX:
+            raise ValueError("BM25 索引未开启！请在 .env 中设置 BM25_INDEX=true")
+
+        with self._in_use():
+            self._ensure_loaded()
+            self._ensure_bm25_synced()
+            return self._open_bm25_index().search(
+                query, k=k, where=search_filter.matches if search_filter else None
+            )
 
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 3,
+        candidates: int = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[tuple]:
+        """
+        混合检索（向量 + BM25，倒数排名融合）
+
+        两路各取 candidates 个候选，按 RRF 融合后取前 k 个。
+        返回文档的 metadata 中保留各路分数：
+            - score: 向量距离（仅向量检索命中时存在，越小越相似）
+            - bm25_score: BM25 分数（仅关键词检索命中时存在）
+            - rrf_score: 融合分数
+
+        参数:
+            query: 查询问题
+            k: 返回结果数量
+            candidates: 每路候选数量（默认读取 Config.HYBRID_CANDIDATES）
+            search_filter: 过滤条件（两路检索都在满足条件的文档块中进行）
+
+        返回:
+            (Document, rrf_score) 元组列表
+        """
+        candidates = max(k, candidates or Config.HYBRID_CANDIDATES)
+
+        dense = self.search_with_score(query, k=candidates, search_filter=search_filter)
+        # 没有 BM25 索引时只融合向量检索一路（等价于向量检索）
+        lexical = self.search_bm25(query, k=candidates, search_filter=search_filter) if Config.BM25_INDEX else []
+
+        documents = {}
+        dense_ids = []
+        for doc, distance in dense:
+            chunk_id = compute_chunk_id(doc)
+            documents[chunk_id] = Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "score": float(distance)}
+            )
+            dense_ids.append(chunk_id)
+
+        lexical_ids = []
+        for doc, bm25_score in lexical:
+            chunk_id = compute_chunk_id(doc)
+            documents.setdefault(chunk_id, doc).metadata["bm25_score"] = float(bm25_score)
+            lexical_ids.append(chunk_id)
+
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids], k=Config.RRF_K)[:k]
+        results = []
+        for chunk_id, rrf_score in fused:
+            document = documents[chunk_id]
+            document.metadata["rrf_score"] = rrf_score
+            results.append((document, rrf_score))
         return results
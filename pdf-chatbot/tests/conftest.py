@@ -0,0 +1,26 @@
+"""测试共用的 fixture"""
+import hashlib
+
+import pytest
+from langchain.embeddings.base import Embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """按文本哈希生成的确定性单位向量（16 维，不需要模型和 API Key）"""
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        vector = [b / 255 for b in digest[:16]]
+        norm = sum(x * x for x in vector) ** 0.5
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def fake_embeddings():
+    return FakeEmbeddings()
@@ -0,0 +1,42 @@
+"""文档加载测试"""
+import pypdf
+from langchain_community.document_loaders import PyPDFLoader
+
+from pdf_chatbot.document_loader import DocumentProcessor
+
+
+def write_pdf(path, pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_iter_pages_extracts_one_page_at_a_time(tmp_path, monkeypatch):
+    path = write_pdf(tmp_path / "doc.pdf", 5)
+    extracted = []
+    original = pypdf.PageObject.extract_text
+
+    def extract_text(page, *args, **kwargs):
+        extracted.append(page)
+        return original(page, *args, **kwargs)
+
+    monkeypatch.setattr(pypdf.PageObject, "extract_text", extract_text)
+
+    pages = DocumentProcessor().iter_pages(path)
+    first = next(pages)
+    assert len(extracted) == 1
+    assert first.metadata == {"source": path, "page": 0}
+
+    rest = list(pages)
+    assert len(extracted) == 5
+    assert [page.metadata["page"] for page in rest] == [1, 2, 3, 4]
+
+
+def test_iter_pages_matches_pypdf_loader(tmp_path):
+    path = write_pdf(tmp_path / "doc.pdf", 3)
+    expected = PyPDFLoader(path).load()
+    actual = list(DocumentProcessor().iter_pages(path))
+    assert [(d.page_content, d.metadata) for d in actual] == [(d.page_content, d.metadata) for d in expected]
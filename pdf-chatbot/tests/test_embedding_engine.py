@@ -0,0 +1,154 @@
+"""分批向量化引擎测试（本地 HTTP 桩服务模拟 Embedding 接口限流）"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+from langchain.embeddings.base import Embeddings
+
+from pdf_chatbot.embedding_engine import BatchedEmbeddings, is_retryable_error
+
+FAIL_MARKER = "限流批次"
+BAD_MARKER = "参数错误"
+
+
+class _StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []          # 每次请求的输入文本
+        self.failed = set()         # 已返回过 429 的批次（首条文本）
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+def _vector(text):
+    return [float(len(text)), float(sum(map(ord, text)) % 997)]
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            texts = json.loads(self.rfile.read(length))["input"]
+            with state.lock:
+                state.requests.append(list(texts))
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                fail = FAIL_MARKER in texts[0] and texts[0] not in state.failed
+                if fail:
+                    state.failed.add(texts[0])
+            try:
+                if BAD_MARKER in texts[0]:
+                    self._reply(400, {"error": {"message": "input 429 is invalid", "type": "invalid_request"}})
+                    return
+                # 让并发请求在服务端重叠，才能观察到同时在途的请求数
+                time.sleep(0.05)
+                if fail:
+                    self._reply(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}})
+                    return
+                self._reply(200, {
+                    "object": "list",
+                    "model": "stub",
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": _vector(text)}
+                        for i, text in enumerate(texts)
+                    ],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                })
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+class _ClientEmbeddings(Embeddings):
+    """直接调用 openai 客户端的最小 Embedding（客户端自身不重试，重试全部由引擎负责）"""
+
+    def __init__(self, base_url):
+        self.client = openai.OpenAI(base_url=base_url, api_key="test", max_retries=0)
+
+    def embed_documents(self, texts):
+        response = self.client.embeddings.create(model="stub", input=list(texts))
+        return [item.embedding for item in response.data]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def stub():
+    state = _StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield state, f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_only_failing_batch_is_retried(stub):
+    state, base_url = stub
+    texts = [f"文本{i}" for i in range(12)]
+    texts[4] = FAIL_MARKER
+    engine = BatchedEmbeddings(
+        _ClientEmbeddings(base_url),
+        batch_size=2,
+        max_batch_tokens=10_000,
+        max_concurrency=2,
+        max_retries=2,
+        retry_base_delay=0.01,
+    )
+
+    vectors = engine.embed_documents(texts)
+
+    # 结果完整且与输入顺序一致
+    assert vectors == [_vector(text) for text in texts]
+
+    # 6 批各请求一次，只有限流的那一批多请求一次
+    batches = [tuple(request) for request in state.requests]
+    assert len(batches) == 7
+    assert batches.count((FAIL_MARKER, texts[5])) == 2
+    assert all(batches.count(batch) == 1 for batch in batches if FAIL_MARKER not in batch)
+
+    assert 1 < state.max_in_flight <= 2
+
+
+def test_non_retryable_error_fails_without_retry(stub):
+    state, base_url = stub
+    engine = BatchedEmbeddings(_ClientEmbeddings(base_url), max_retries=3, retry_base_delay=0.01)
+
+    with pytest.raises(Exception, match="第 1 批向量化失败"):
+        engine.embed_documents([BAD_MARKER])
+
+    # 错误信息里出现 "429" 也不重试
+    assert len(state.requests) == 1
+
+
+class _StatusError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_is_retryable_error_uses_status_code():
+    assert is_retryable_error(_StatusError("rate limited", 429))
+    assert is_retryable_error(_StatusError("bad gateway", 502))
+    assert not is_retryable_error(_StatusError("input 429 tokens too long", 400))
+    assert not is_retryable_error(Exception("HTTP 500 mentioned in a plain error"))
+    assert is_retryable_error(TimeoutError("timed out"))
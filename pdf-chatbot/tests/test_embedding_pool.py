@@ -0,0 +1,95 @@
+"""多进程 Embedding 测试（CPU 核分配、工作进程往返、只在导入期间启动工作进程）"""
+from multiprocessing import shared_memory
+
+import pytest
+from langchain.embeddings.base import Embeddings
+
+from pdf_chatbot import embedding_pool
+from pdf_chatbot.embedding_pool import EmbeddingPool, IngestPoolEmbeddings, split_cores
+
+
+class StubEmbeddings(Embeddings):
+    """按文本长度和字符编码生成向量的模拟模型（不需要加载模型）"""
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), float(sum(map(ord, text)) % 997), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def create_stub_embeddings():
+    """工作进程中创建模拟模型（模块级函数，可以传给 spawn 启动的进程）"""
+    return StubEmbeddings()
+
+
+TEXTS = [f"第 {i} 段" + "文本" * (i * 7 % 13) for i in range(25)]
+
+
+def test_split_cores():
+    assert split_cores(2, [0, 1, 2, 3]) == [[0, 1], [2, 3]]
+    assert split_cores(2, [0, 1, 2, 3, 4]) == [[0, 1], [2, 3]]
+    # 核数少于进程数时共用核
+    assert split_cores(3, [4, 5]) == [[4], [5], [4]]
+
+
+def test_embed_documents_round_trip(monkeypatch):
+    names = []
+    original = shared_memory.SharedMemory
+
+    def record(*args, **kwargs):
+        shm = original(*args, **kwargs)
+        if kwargs.get("create"):
+            names.append(shm.name)
+        return shm
+
+    monkeypatch.setattr(embedding_pool.shared_memory, "SharedMemory", record)
+
+    pool = EmbeddingPool(2, pin_cpus=False, factory=create_stub_embeddings)
+    try:
+        assert pool.embed_documents(TEXTS) == StubEmbeddings().embed_documents(TEXTS)
+        assert pool.embed_query("查询") == StubEmbeddings().embed_query("查询")
+    finally:
+        pool.close()
+
+    # 结果矩阵所在的共享内存在返回后已释放
+    assert len(names) == 1
+    with pytest.raises(FileNotFoundError):
+        original(name=names[0])
+
+
+def test_pool_only_runs_during_ingest():
+    embeddings = IngestPoolEmbeddings(2, factory=create_stub_embeddings)
+    try:
+        # 导入之外的查询和写入在当前进程中向量化，不启动工作进程
+        assert embeddings.embed_query("查询") == StubEmbeddings().embed_query("查询")
+        assert embeddings.embed_documents(TEXTS[:3]) == StubEmbeddings().embed_documents(TEXTS[:3])
+        assert embeddings._pool is None
+
+        with embeddings.ingest_pool():
+            with embeddings.ingest_pool():
+                pool = embeddings._pool
+                assert pool is not None
+            assert embeddings._pool is pool
+            assert embeddings.embed_documents(TEXTS) == StubEmbeddings().embed_documents(TEXTS)
+        assert embeddings._pool is None
+        assert not any(process.is_alive() for process in pool._processes)
+    finally:
+        embeddings.close()
+
+
+def test_manager_does_not_start_pool_outside_ingest(tmp_path, monkeypatch):
+    from pdf_chatbot.config import Config
+    from pdf_chatbot.vector_store import VectorStoreManager
+
+    monkeypatch.setattr(Config, "CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(Config, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    monkeypatch.setattr(Config, "EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr(Config, "EMBEDDING_WORKERS", 2)
+    monkeypatch.setattr(Config, "EMBEDDING_CACHE", False)
+
+    manager = VectorStoreManager()
+    pooled = manager._pooled_embeddings
+    assert isinstance(pooled, IngestPoolEmbeddings)
+    assert pooled._pool is None
+    assert manager.collection("acme")._pooled_embeddings is pooled
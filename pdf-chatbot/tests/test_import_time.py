@@ -0,0 +1,45 @@
+"""启动耗时测试：import pdf_chatbot 和命令行入口不加载 LangChain、Chroma 等重依赖"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# 子进程导入的耗时上限（秒），含解释器启动；只导入包本身时约 0.1 秒
+IMPORT_BUDGET_SECONDS = 1.0
+
+HEAVY_MODULES = ("langchain", "langchain.chains", "langchain_core", "chromadb", "openai")
+
+
+def run_import(statement):
+    """在新的解释器中执行导入语句，返回 (耗时, 已加载的重依赖)"""
+    code = (
+        f"import sys\n{statement}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60)
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0, result.stderr
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return elapsed, loaded
+
+
+@pytest.mark.parametrize("statement", [
+    "import pdf_chatbot",
+    "import pdf_chatbot.main\nfrom pdf_chatbot import Config, SearchFilter",
+])
+def test_import_stays_light(statement):
+    # 取多次中的最小值，排除机器偶发抖动
+    timings = []
+    for _ in range(3):
+        elapsed, loaded = run_import(statement)
+        assert loaded == []
+        timings.append(elapsed)
+
+    assert min(timings) < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,167 @@
+"""本地向量索引测试"""
+import json
+
+import numpy as np
+import pytest
+from langchain.embeddings.base import Embeddings
+from langchain_core.documents import Document
+
+from pdf_chatbot.index_backend import LocalVectorIndex
+from pdf_chatbot.quantization import ProductQuantizer
+
+pytest.importorskip("hnswlib")
+
+
+def test_hnsw_ignores_deletes_made_while_graph_unloaded(tmp_path, fake_embeddings):
+    embeddings = fake_embeddings
+    ids = [f"id{i}" for i in range(40)]
+    docs = [Document(page_content=f"doc {i}", metadata={"source": "a.pdf", "page": i}) for i in range(40)]
+    query = embeddings.embed_query("doc 3")
+
+    index = LocalVectorIndex(str(tmp_path), embeddings, index_type="hnsw")
+    index.add_documents(docs, ids=ids)
+    index.search_by_vector(query, k=4)
+    index.persist()
+    index.close()
+
+    # 重新打开后未检索就删除：HNSW 图尚未加载
+    index = LocalVectorIndex(str(tmp_path), embeddings, index_type="hnsw")
+    index.delete(ids[:4])
+    index.persist()
+    index.close()
+
+    index = LocalVectorIndex(str(tmp_path), embeddings, index_type="hnsw")
+    results = index.search_by_vector(query, k=16)
+    assert len(results) == 16
+    assert not {f"doc {i}" for i in range(4)} & {doc.page_content for doc, _ in results}
+
+    # 图已加载时的删除照常生效，保存后再打开时不会重复标记出错
+    index.delete(ids[4:6])
+    index.persist()
+    index.close()
+    index = LocalVectorIndex(str(tmp_path), embeddings, index_type="hnsw")
+    results = index.search_by_vector(query, k=34)
+    assert len(results) == 34
+    assert not {f"doc {i}" for i in range(6)} & {doc.page_content for doc, _ in results}
+
+
+def test_documents_are_appended_and_read_lazily(tmp_path, fake_embeddings):
+    docs = [
+        Document(page_content=f"doc {i}", metadata={"source": f"{'ab'[i % 2]}.pdf", "page": i})
+        for i in range(20)
+    ]
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    index.add_documents(docs[:10], ids=[f"id{i}" for i in range(10)])
+    index.persist()
+    index.close()
+
+    # 重新打开只读入 ID 和偏移，检索结果按偏移读取内容和 metadata
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    assert index._metadatas is None
+    (doc, _), = index.search_by_vector(fake_embeddings.embed_query("doc 3"), k=1)
+    assert doc.page_content == "doc 3"
+    assert doc.metadata == {"source": "b.pdf", "page": 3}
+    assert index._metadatas is None
+
+    # 追加写入的文档块与已有的一起参与过滤（倒排表此时才构建）
+    index.add_documents(docs[10:], ids=[f"id{i}" for i in range(10, 20)])
+    assert sorted(index.get_ids({"source": "a.pdf"})) == sorted(f"id{i}" for i in range(0, 20, 2))
+    index.persist()
+    index.close()
+
+    # 删除超过一半后保存时压缩，偏移重新计算
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    index.delete([f"id{i}" for i in range(12)])
+    index.persist()
+    index.close()
+
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    documents = index.get_documents(limit=20)
+    assert [doc.page_content for doc in documents] == [f"doc {i}" for i in range(12, 20)]
+    assert [doc.metadata["page"] for doc in documents] == list(range(12, 20))
+    assert sorted(index.get_ids({"source": "b.pdf"})) == [f"id{i}" for i in (13, 15, 17, 19)]
+
+
+def test_unsaved_documents_are_truncated_on_load(tmp_path, fake_embeddings):
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    index.add_documents([Document(page_content="saved", metadata={"source": "a.pdf"})], ids=["saved"])
+    index.persist()
+    # 写入后未保存（进程退出）：向量和文档块已追加到磁盘，但未登记
+    index.add_documents([Document(page_content="unsaved", metadata={"source": "a.pdf"})], ids=["unsaved"])
+    index._close_docs_file()
+
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    assert index.count() == 1
+    index.add_documents([Document(page_content="later", metadata={"source": "b.pdf"})], ids=["later"])
+    assert [doc.page_content for doc in index.get_documents(limit=10)] == ["saved", "later"]
+
+
+def test_loads_index_saved_in_previous_format(tmp_path, fake_embeddings):
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    index.add_documents(
+        [Document(page_content=f"doc {i}", metadata={"source": "a.pdf", "page": i}) for i in range(4)],
+        ids=["id0", "id1", "id2", "id3"]
+    )
+    index.delete(["id1"])
+    index.persist()
+    index.close()
+
+    # 改写成旧格式：内容和 metadata 保存在 local_index.json 中
+    meta_path = tmp_path / LocalVectorIndex.META_FILENAME
+    data = json.loads(meta_path.read_text(encoding="utf-8"))
+    del data["docs_size"]
+    data["format"] = 1
+    data["contents"] = ["doc 0", None, "doc 2", "doc 3"]
+    data["metadatas"] = [{"source": "a.pdf", "page": i} if i != 1 else None for i in range(4)]
+    meta_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    (tmp_path / LocalVectorIndex.DOCS_FILENAME).unlink()
+    (tmp_path / LocalVectorIndex.OFFSETS_FILENAME).unlink()
+
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    assert [doc.page_content for doc in index.get_documents(limit=10)] == ["doc 0", "doc 2", "doc 3"]
+    index.persist()
+    index.close()
+
+    data = json.loads(meta_path.read_text(encoding="utf-8"))
+    assert data["format"] == LocalVectorIndex.FORMAT_VERSION
+    assert "contents" not in data
+    index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    assert sorted(index.get_ids({"source": "a.pdf"})) == ["id0", "id2", "id3"]
+
+
+class ArrayEmbeddings(Embeddings):
+    """文本「vec i」映射到给定矩阵的第 i 行"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(text.split()[1])].tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_pq_recall_and_codes_survive_reopen(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32)) * 4
+    vectors = (centers[rng.integers(0, 20, size=2000)] + rng.normal(size=(2000, 32))).astype(np.float32)
+    queries = (centers[rng.integers(0, 20, size=50)] + rng.normal(size=(50, 32))).tolist()
+    embeddings = ArrayEmbeddings(vectors)
+
+    index = LocalVectorIndex(str(tmp_path), embeddings, index_type="pq", pq_rerank=100)
+    index.add_documents(
+        [Document(page_content=f"vec {i}", metadata={"source": "a.pdf"}) for i in range(len(vectors))],
+        ids=[f"id{i}" for i in range(len(vectors))]
+    )
+    recall = index.measure_recall(queries, k=10)
+    assert recall >= 0.9
+    codes = index._pq_codes.copy()
+    index.persist()
+    index.close()
+
+    # 重新打开时直接加载中心和编码，不重新训练
+    monkeypatch.setattr(ProductQuantizer, "train", lambda *args: pytest.fail("PQ 被重新训练"))
+    index = LocalVectorIndex(str(tmp_path), embeddings, index_type="pq", pq_rerank=100)
+    assert index.measure_recall(queries, k=10) == recall
+    assert np.array_equal(index._pq_codes, codes)
@@ -0,0 +1,59 @@
+"""问答链测试（每次提问的 LLM 调用次数：独立问题跳过改写，重复追问命中改写缓存）"""
+import pytest
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_core.documents import Document
+
+from pdf_chatbot.config import Config
+from pdf_chatbot.qa_chain import QASystem
+from pdf_chatbot.vector_store import VectorStoreManager
+
+
+@pytest.fixture
+def qa_system(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.setattr(Config, "CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(Config, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+
+    manager = VectorStoreManager(embeddings=fake_embeddings)
+    manager.create_vectorstore([
+        Document(page_content=f"第 {i} 节介绍重试策略和限流处理。", metadata={"source": "guide.pdf", "page": i})
+        for i in range(1, 6)
+    ])
+
+    qa = QASystem(
+        manager,
+        enable_streaming=False,
+        enable_semantic_cache=False,
+        llm=FakeListChatModel(responses=[f"answer number {i}" for i in range(100)]),
+        condense_llm=FakeListChatModel(responses=[f"rewritten question {i}" for i in range(100)]),
+        memory_mode="buffer",
+    )
+    qa.initialize(rerank=False)
+    return qa
+
+
+def test_llm_calls_per_ask(qa_system):
+    # 首轮提问：没有对话历史，不改写
+    result = qa_system.ask("How does the retry strategy handle rate limits?", show_source=False)
+    assert result["llm_calls"] == 1
+
+    # 独立的追问：本地规则判断不依赖上下文，跳过改写
+    result = qa_system.ask("What is the default timeout for embedding requests?", show_source=False)
+    assert result["llm_calls"] == 1
+
+    # 含指代词的追问：先改写再回答
+    messages = list(qa_system.get_session().memory.chat_memory.messages)
+    result = qa_system.ask("Why does it wait longer after each failure?", show_source=False)
+    assert result["llm_calls"] == 2
+    assert result["generated_question"] == "rewritten question 0"
+
+    # 在相同的对话历史下重复追问（如重新生成答案）：命中改写缓存
+    qa_system.get_session().memory.chat_memory.messages = messages
+    result = qa_system.ask("Why does it wait longer after each failure?", show_source=False)
+    assert result["llm_calls"] == 1
+
+    stats = qa_system.get_llm_call_stats()
+    assert stats["asks"] == 4
+    assert stats["llm_calls"] == 5
+    assert stats["rewrites"] == 1
+    assert stats["rewrites_skipped"] == 1
+    assert stats["rewrite_cache_hits"] == 1
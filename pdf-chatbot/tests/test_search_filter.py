@@ -0,0 +1,48 @@
+"""检索过滤测试（跨页文档块按页码区间重叠匹配）"""
+import pytest
+from langchain_core.documents import Document
+
+from pdf_chatbot.index_backend import ChromaIndex, LocalVectorIndex
+from pdf_chatbot.search_filter import SearchFilter
+
+
+DOCUMENTS = [
+    Document(page_content="单页 2", metadata={"source": "a.pdf", "page": 2}),
+    Document(page_content="跨页 4-6", metadata={"source": "a.pdf", "page": 4, "page_end": 6}),
+    Document(page_content="单页 7", metadata={"source": "a.pdf", "page": 7}),
+    Document(page_content="跨页 8-9", metadata={"source": "a.pdf", "page": 8, "page_end": 9}),
+]
+
+# (page_min, page_max) -> 应命中的文档块
+CASES = [
+    ((5, 5), {"跨页 4-6"}),
+    ((6, 7), {"跨页 4-6", "单页 7"}),
+    ((3, None), {"跨页 4-6", "单页 7", "跨页 8-9"}),
+    ((None, 4), {"单页 2", "跨页 4-6"}),
+    ((9, 12), {"跨页 8-9"}),
+    ((10, None), set()),
+]
+
+
+@pytest.mark.parametrize("page_range,expected", CASES)
+def test_matches_on_page_range_overlap(page_range, expected):
+    search_filter = SearchFilter(page_min=page_range[0], page_max=page_range[1])
+    assert {doc.page_content for doc in DOCUMENTS if search_filter.matches(doc.metadata)} == expected
+
+
+@pytest.fixture(params=["chroma", "local"])
+def index(request, tmp_path, fake_embeddings):
+    if request.param == "chroma":
+        index = ChromaIndex(str(tmp_path), fake_embeddings)
+    else:
+        index = LocalVectorIndex(str(tmp_path), fake_embeddings, index_type="flat")
+    index.add_documents(DOCUMENTS, ids=[f"id{i}" for i in range(len(DOCUMENTS))])
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize("page_range,expected", CASES)
+def test_index_filters_on_page_range_overlap(index, page_range, expected, fake_embeddings):
+    search_filter = SearchFilter(page_min=page_range[0], page_max=page_range[1])
+    results = index.search_by_vector(fake_embeddings.embed_query("跨页"), k=10, search_filter=search_filter)
+    assert {doc.page_content for doc, _ in results} == expected
@@ -0,0 +1,172 @@
+"""HTTP 服务测试（模拟 LLM 和 Embedding，不需要 API Key）"""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_core.documents import Document
+
+from pdf_chatbot.config import Config
+from pdf_chatbot.qa_chain import QASystem
+from pdf_chatbot.server import ChatbotRequestHandler, ChatbotService, create_server
+from pdf_chatbot.vector_store import VectorStoreManager
+
+
+class StreamingFakeLLM(FakeListChatModel):
+    """逐词回调 on_llm_new_token 的模拟 LLM"""
+
+    streaming: bool = True
+
+    async def _acall(self, messages, stop=None, run_manager=None, **kwargs):
+        response = super()._call(messages, stop, None, **kwargs)
+        if run_manager:
+            for word in response.split(" "):
+                await run_manager.on_llm_new_token(word + " ")
+        return response
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.setattr(Config, "CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(Config, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    monkeypatch.setattr(Config, "INGEST_ROOT", str(tmp_path / "docs"))
+    monkeypatch.setattr(Config, "SEMANTIC_CACHE", False)
+    (tmp_path / "docs").mkdir()
+
+    manager = VectorStoreManager(embeddings=fake_embeddings)
+    manager.create_vectorstore([
+        Document(page_content=f"第 {i} 节介绍重试策略和限流处理。", metadata={"source": "guide.pdf", "page": i})
+        for i in range(1, 6)
+    ])
+
+    service = ChatbotService(
+        manager,
+        llm=StreamingFakeLLM(responses=[f"answer number {i}" for i in range(100)]),
+        condense_llm=FakeListChatModel(responses=[f"rewritten question {i}" for i in range(100)]),
+        export_dir=str(tmp_path / "exports"),
+    )
+    httpd = create_server(service, "127.0.0.1", 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        service.close()
+
+
+def request(base, path, data=None):
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    req = urllib.request.Request(base + path, data=body, method="POST" if data is not None else "GET")
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, resp.headers.get("Content-Type"), resp.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("Content-Type"), e.read().decode("utf-8")
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ask_json(server):
+    status, content_type, body = request(server, "/ask", {"question": "重试策略是什么？", "session_id": "alice"})
+
+    assert status == 200
+    assert content_type.startswith("application/json")
+    result = json.loads(body)
+    assert result["answer"].startswith("answer number")
+    assert result["cached"] is False
+    assert result["sources"] and result["sources"][0]["source"] == "guide.pdf"
+
+
+def test_ask_stream_and_history(server):
+    answers = []
+    for question in ["重试策略是什么？", "限流时怎么处理？"]:
+        status, content_type, body = request(
+            server, "/ask", {"question": question, "session_id": "bob", "stream": True}
+        )
+        assert status == 200
+        assert content_type.startswith("text/event-stream")
+
+        events = parse_events(body)
+        assert events[-1][0] == "done"
+        tokens = "".join(data["token"] for event, data in events if event == "token")
+        done = events[-1][1]
+        # 第二轮会改写追问，改写结果不能混入答案 token
+        assert "rewritten" not in tokens
+        assert tokens.strip() == done["answer"].strip()
+        answers.append(done["answer"])
+
+    status, _, body = request(server, "/history?session_id=bob")
+    assert status == 200
+    history = json.loads(body)
+    assert history["session_id"] == "bob"
+    assert [turn["answer"] for turn in history["history"]] == answers
+
+    # 会话之间互相隔离
+    _, _, body = request(server, "/history?session_id=nobody")
+    assert json.loads(body)["history"] == []
+
+
+def test_concurrent_requests_share_event_loop(server):
+    statuses = [None] * 6
+
+    def ask(i):
+        statuses[i] = request(server, "/ask", {"question": f"问题 {i}", "session_id": f"s{i}"})[0]
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(statuses))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * len(statuses)
+
+
+@pytest.mark.parametrize("path", ["../outside", "/etc", "docs/../../outside"])
+def test_ingest_rejects_paths_outside_root(server, path):
+    status, _, body = request(server, "/ingest", {"path": path})
+
+    assert status == 403
+    assert "导入目录" in json.loads(body)["error"]
+
+
+def test_llm_requires_condense_llm(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.setattr(Config, "CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    manager = VectorStoreManager(embeddings=fake_embeddings)
+
+    with pytest.raises(ValueError, match="condense_llm"):
+        QASystem(manager, llm=StreamingFakeLLM(responses=["a"]))
+
+
+def test_ingest_resolves_relative_to_root(server):
+    status, _, body = request(server, "/ingest", {"path": "manuals/"})
+
+    # 根目录内的路径通过检查，只是没有 PDF
+    assert status == 400
+    assert "未找到 PDF 文件" in json.loads(body)["error"]
+
+
+@pytest.mark.parametrize("workers", ["abc", [2], {"n": 2}])
+def test_ingest_rejects_invalid_workers(server, workers):
+    status, _, body = request(server, "/ingest", {"path": "manuals/", "workers": workers})
+
+    assert status == 400
+    assert "workers" in json.loads(body)["error"]
+
+
+def test_ingest_workers_clamped_to_config(monkeypatch):
+    monkeypatch.setattr(Config, "INGEST_WORKERS", 4)
+
+    assert ChatbotRequestHandler._read_workers({}) is None
+    assert ChatbotRequestHandler._read_workers({"workers": "2"}) == 2
+    assert ChatbotRequestHandler._read_workers({"workers": 1000}) == 4
+    assert ChatbotRequestHandler._read_workers({"workers": -3}) == 1
@@ -0,0 +1,160 @@
+"""SpanTextSplitter 与 RecursiveCharacterTextSplitter 的切分一致性测试，SentenceChunker 跨页按句切分测试"""
+import random
+import re
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from pdf_chatbot.text_splitter import CHUNK_SEPARATORS, SentenceChunker, SpanTextSplitter, _SentenceStream
+
+# (chunk_size, chunk_overlap)
+SIZE_PAIRS = [(20, 0), (50, 10), (100, 30), (200, 50), (1000, 200), (40, 40)]
+
+WORDS = ["重试", "限流", "错误码", "E1024", "策略", "timeout", "配置", "文档", "a", "bc"]
+
+
+def random_text(rng, length):
+    """由词、空白和各级分隔符组成的随机文本（偶尔夹带没有分隔符的长串）"""
+    parts = []
+    while sum(map(len, parts)) < length:
+        roll = rng.random()
+        if roll < 0.55:
+            parts.append(rng.choice(WORDS))
+        elif roll < 0.9:
+            parts.append(rng.choice([s for s in CHUNK_SEPARATORS if s]))
+        elif roll < 0.97:
+            parts.append(rng.choice(["  ", " \n", "\n \n", "\t"]))
+        else:
+            parts.append("x" * rng.randint(30, 300))
+    return "".join(parts)
+
+
+def reference(chunk_size, chunk_overlap, separators=CHUNK_SEPARATORS):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=list(separators)
+    )
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", SIZE_PAIRS)
+def test_split_text_matches_langchain_on_random_texts(chunk_size, chunk_overlap):
+    rng = random.Random(chunk_size * 1000 + chunk_overlap)
+    expected_splitter = reference(chunk_size, chunk_overlap)
+    splitter = SpanTextSplitter(chunk_size, chunk_overlap, CHUNK_SEPARATORS)
+
+    for _ in range(60):
+        text = random_text(rng, rng.randint(0, 3000))
+        assert splitter.split_text(text) == expected_splitter.split_text(text), text
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", SIZE_PAIRS)
+def test_split_documents_matches_langchain(chunk_size, chunk_overlap):
+    rng = random.Random(chunk_size + chunk_overlap)
+    documents = [
+        Document(page_content=random_text(rng, rng.randint(0, 2000)), metadata={"source": "a.pdf", "page": page})
+        for page in range(1, 11)
+    ]
+
+    expected = reference(chunk_size, chunk_overlap).split_documents(documents)
+    actual = SpanTextSplitter(chunk_size, chunk_overlap, CHUNK_SEPARATORS).split_documents(documents)
+
+    assert [(d.page_content, d.metadata) for d in actual] == [(d.page_content, d.metadata) for d in expected]
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "   ",
+    " \n\n \t\n ",
+    "x" * 537,
+    "没有任何分隔符的一段很长的中文文本" * 20,
+    "。！？" * 50,
+])
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(10, 0), (50, 10), (40, 40)])
+def test_edge_cases_match_langchain(text, chunk_size, chunk_overlap):
+    splitter = SpanTextSplitter(chunk_size, chunk_overlap, CHUNK_SEPARATORS)
+    assert splitter.split_text(text) == reference(chunk_size, chunk_overlap).split_text(text)
+
+
+@pytest.mark.parametrize("separators", [[""], ["\n", ""], ["|", ""]])
+def test_custom_separators_match_langchain(separators):
+    rng = random.Random(7)
+    splitter = SpanTextSplitter(30, 5, separators)
+    expected_splitter = reference(30, 5, separators)
+    for _ in range(30):
+        text = random_text(rng, rng.randint(0, 800)).replace("。", "|")
+        assert splitter.split_text(text) == expected_splitter.split_text(text)
+
+
+def test_overlap_larger_than_size_is_rejected():
+    with pytest.raises(ValueError):
+        SpanTextSplitter(10, 11)
+
+
+def page(text, number):
+    return Document(page_content=text, metadata={"source": "a.pdf", "page": number})
+
+
+def test_paragraph_across_page_break_stays_in_one_chunk():
+    pages = [
+        page("第一段开始。这一句没有写完，", 3),
+        page("到了下一页才结束。\n\n第二段。", 4),
+    ]
+    chunks = SentenceChunker(200, 20).split_documents(pages)
+
+    chunk, = [c for c in chunks if "这一句没有写完" in c.page_content]
+    assert "这一句没有写完，\n到了下一页才结束。" in chunk.page_content
+    assert (chunk.metadata["page"], chunk.metadata["page_end"]) == (3, 4)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(30, 0), (50, 15), (120, 40)])
+def test_chunks_never_exceed_chunk_size(chunk_size, chunk_overlap):
+    rng = random.Random(chunk_size)
+    pages = [page(random_text(rng, rng.randint(0, 1500)), number) for number in range(20)]
+    chunks = SentenceChunker(chunk_size, chunk_overlap).split_documents(pages)
+
+    assert chunks
+    assert max(len(c.page_content) for c in chunks) <= chunk_size
+
+
+def test_overlap_is_whole_sentences():
+    sentences = [f"第{i}句" + "内容" * (i % 4) + "。" for i in range(40)]
+    chunks = SentenceChunker(40, 15).split_documents([page("".join(sentences), 1)])
+
+    previous = None
+    for chunk in chunks:
+        # 每个文档块都由连续的完整句子组成
+        first = next(i for i, sentence in enumerate(sentences) if chunk.page_content.startswith(sentence))
+        last = first
+        while "".join(sentences[first:last + 1]) != chunk.page_content:
+            last += 1
+            assert last < len(sentences), chunk.page_content
+        if previous is not None:
+            # 与上一块重叠的部分是上一块末尾的完整句子，且不超过 chunk_overlap
+            assert previous[0] < first <= previous[1] + 1
+            assert len("".join(sentences[first:previous[1] + 1])) <= 15
+        previous = (first, last)
+    assert previous[1] == len(sentences) - 1
+
+
+def test_decimal_point_does_not_end_sentence():
+    text = "The value is 3.14 today. The rate is 2.5 percent. 圆周率约为3.14，很常用。"
+    chunks = SentenceChunker(25, 0).split_documents([page(text, 1)])
+    assert [c.page_content for c in chunks] == [
+        "The value is 3.14 today.", "The rate is 2.5 percent.", "圆周率约为3.14，很常用。"
+    ]
+
+
+def test_page_numbers_after_earlier_pages_are_trimmed():
+    chunker = SentenceChunker(40, 12)
+    stream = _SentenceStream(chunker, "a.pdf")
+    chunks = []
+    for number in range(10, 40):
+        chunks.extend(stream.feed(page("".join(f"第{number}页第{i}句。" for i in range(3)), number)))
+        # 已产出的页面从流中丢弃，只保留当前文档块所在的页
+        assert len(stream.page_docs) <= 2
+    chunks.extend(stream.finish())
+
+    assert chunks[-1].metadata["page_end"] == 39
+    for chunk in chunks:
+        numbers = [int(n) for n in re.findall(r"第(\d+)页", chunk.page_content)]
+        assert (chunk.metadata["page"], chunk.metadata["page_end"]) == (numbers[0], numbers[-1])
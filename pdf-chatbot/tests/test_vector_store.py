@@ -0,0 +1,99 @@
+"""向量存储管理器测试（命名集合的 LRU 关闭与重新打开、批量导入推迟保存索引）"""
+import os
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from pdf_chatbot.config import Config
+from pdf_chatbot.vector_store import VectorStoreManager
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.setattr(Config, "CHROMA_PERSIST_DIR", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(Config, "COLLECTIONS_DIR", str(tmp_path / "collections"))
+    monkeypatch.setattr(Config, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(Config, "LOCAL_INDEX_TYPE", "flat")
+    monkeypatch.setattr(Config, "MAX_OPEN_COLLECTIONS", 1)
+
+    manager = VectorStoreManager(embeddings=fake_embeddings)
+    for name in ("acme", "globex"):
+        manager.collection(name).create_vectorstore([
+            Document(page_content=f"{name} 文档 {i}", metadata={"source": f"{name}.pdf", "page": i})
+            for i in range(5)
+        ])
+    yield manager
+    manager.close()
+
+
+def test_evicted_collection_is_reopened_by_same_manager(root):
+    acme = root.collection("acme")
+    acme.search("文档", k=1)
+    version = acme.index_version
+
+    globex = root.collection("globex")
+    globex.search("文档", k=1)
+    assert root.open_collections() == ["globex"]
+    assert acme.vectorstore is None
+
+    # 仍持有已关闭集合的调用方再次检索：由同一个管理器重新打开并重新计入打开数量
+    assert acme.search("文档", k=1)[0].metadata["source"] == "acme.pdf"
+    assert root.collection("acme") is acme
+    assert acme.index_version == version
+    assert root.open_collections() == ["acme"]
+    assert globex.vectorstore is None
+
+
+def test_concurrent_use_does_not_deadlock(root):
+    errors = []
+    managers = [root.collection("acme"), root.collection("globex")]
+
+    def worker(i):
+        try:
+            for n in range(30):
+                manager = managers[(i + n) % 2]
+                source = manager.search("文档", k=1)[0].metadata["source"]
+                assert source == f"{manager.collection_name}.pdf"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert not errors
+    assert len(root.open_collections()) <= 1
+
+
+def test_deferred_save_persists_indexes_once(root, monkeypatch):
+    from pdf_chatbot.bm25_index import BM25Index
+    from pdf_chatbot.index_backend import LocalVectorIndex
+
+    saves = []
+    original = BM25Index.save
+    monkeypatch.setattr(BM25Index, "save", lambda index: (saves.append(len(index)), original(index)))
+    persists = []
+    original_persist = LocalVectorIndex.persist
+    monkeypatch.setattr(
+        LocalVectorIndex, "persist",
+        lambda index: (persists.append((index.persist_dir, index.count())), original_persist(index))
+    )
+
+    manager = root.collection("initech")
+    with manager.deferred_save():
+        for name in ("a", "b", "c"):
+            manager.create_vectorstore([
+                Document(page_content=f"{name} 文档 {i}", metadata={"source": f"{name}.pdf", "page": i})
+                for i in range(3)
+            ])
+        assert saves == []
+        assert [count for path, count in persists if path == manager.persist_dir] == []
+
+    assert saves == [9]
+    assert [count for path, count in persists if path == manager.persist_dir] == [9]
+    assert len(BM25Index(os.path.join(manager.persist_dir, VectorStoreManager.BM25_INDEX_FILENAME))) == 9
+    assert LocalVectorIndex(manager.persist_dir, manager.embeddings).count() == 9